@@ -0,0 +1,361 @@
+# benchmarks/filing.py
+# Copyright (C) 2013 the Descatter authors and contributers <see AUTHORS file>
+#
+# This module is part of Descatter.
+#
+# Descatter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Descatter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measures directive evaluation and filing throughput on a generated tree of files.
+
+A tree of files with random names, extensions, and sizes is generated in a tmpfs ('/dev/shm' if available), and each directive is run against it in
+a new interpreter, so its peak memory is measured on its own. Two stages are measured for each directive:
+
+    destination  Planning the tree with :meth:`.Filer.plan`, which scans it and determines the destination of every file without touching the
+                 destination.
+    filing       Filing the tree with :meth:`.Filer.file_folder` into an empty destination.
+
+The shipped 'default', 'year-month-day', and 'content-type' directives are run, along with a generated directive with 1,000 rules that do not match
+followed by a default rule. Its rules cycle through 'equals', 'glob', and 'matches' conditions, so it measures the cost of a large directive as it is
+compiled: the 'equals' rules are one dictionary lookup, and the 'glob' and 'matches' rules are one combined regular expression match per variable,
+rather than 1,000 rules evaluated in turn. Files/s, bytes/s, and peak RSS are reported, and syscalls per file if 'strace' is installed. The syscalls
+are counted for the whole worker interpreter, so they include its start-up and the destination stage. A directive whose files do not all file is
+reported as an error. Run it from the root folder of the repository:
+
+    python benchmarks/filing.py [--files FILES] [--folders FOLDERS] [--sizes SIZES] [--rules RULES] [--jobs JOBS] [--json PATH]
+
+Sizes are given as 'fixed:BYTES', 'uniform:MIN:MAX', or 'lognormal:MU:SIGMA', where a log-normal size is 'e' to the power of a normally distributed
+number with mean MU and standard deviation SIGMA, capped at '--max-size'.
+
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT_FOLDER_PATH)
+
+from descatter import organize
+
+# The shipped directives that are run
+DIRECTIVE_FILE_NAMES = ['default.xml', 'year-month-day.xml', 'content_type.xml']
+
+# The extensions of the generated files, weighted towards the extensions with rules in the 'content-type' directive
+EXTENSIONS = ['jpg', 'jpg', 'jpg', 'png', 'pdf', 'txt', 'txt', 'docx', 'xlsx', 'mp3', 'html', 'csv', 'md', 'avi', 'bin', 'dat']
+
+# The defaults of the generated tree
+FILES = 2000
+FOLDERS = 50
+SIZES = 'lognormal:8:2'
+MAX_SIZE = 16 * 1024 * 1024
+RULES = 1000
+SEED = 0
+
+# The name of the generated directive
+GENERATED_DIRECTIVE_NAME = 'generated-rules'
+
+# The number of times the destinations are evaluated, of which the fastest is reported
+DESTINATION_REPEATS = 3
+
+def get_size_generator(sizes, max_size, rng):
+    """Gets a function that returns a random file size from a size distribution.
+
+    :param sizes: A String. 'fixed:BYTES', 'uniform:MIN:MAX', or 'lognormal:MU:SIGMA'.
+    :param max_size: An integer. The largest size returned.
+    :param rng: A 'random.Random'.
+
+    """
+
+    kind, *values = sizes.split(':')
+
+    try:
+        if kind == 'fixed':
+            size = int(values[0])
+            return lambda: size
+        elif kind == 'uniform':
+            low, high = int(values[0]), int(values[1])
+            return lambda: rng.randint(low, high)
+        elif kind == 'lognormal':
+            mu, sigma = float(values[0]), float(values[1])
+            return lambda: min(max_size, int(rng.lognormvariate(mu, sigma)))
+    except (IndexError, ValueError):
+        pass
+
+    raise ValueError("The size distribution: '{}' is not 'fixed:BYTES', 'uniform:MIN:MAX', or 'lognormal:MU:SIGMA'".format(sizes))
+
+def generate_tree(folder_path, files, folders, sizes, max_size, seed):
+    """Generates a tree of files and returns the total number of bytes.
+
+    The files are spread over a two-level tree of folders. Content is random only at the start of each file, which is enough to make the content of
+    files differ without spending the setup time on random numbers.
+
+    :param folder_path: A path. The root of the tree, which must exist.
+    :param files: An integer. The number of files.
+    :param folders: An integer. The number of folders the files are spread over.
+    :param sizes: A String. The size distribution, see :func:`.get_size_generator`.
+    :param max_size: An integer. The largest file size.
+    :param seed: An integer. The seed of the random names and sizes, so a tree can be generated again.
+
+    """
+
+    rng = random.Random(seed)
+    get_size = get_size_generator(sizes, max_size, rng)
+    folder_paths = []
+
+    for index in range(max(1, folders)):
+        parent_path = os.path.join(folder_path, 'group {}'.format(index % 8))
+        folder_paths.append(os.path.join(parent_path, 'folder {}'.format(index)))
+        os.makedirs(folder_paths[-1], exist_ok=True)
+
+    block = bytes(rng.getrandbits(8) for index in range(65536))
+    total_size = 0
+
+    for index in range(files):
+        name = '{} file {}.{}'.format(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for letter in range(8)), index, rng.choice(EXTENSIONS))
+        size = get_size()
+
+        with open(os.path.join(rng.choice(folder_paths), name), 'wb') as generated_file:
+            generated_file.write(os.urandom(min(size, 64)))
+            remaining = size - min(size, 64)
+
+            while remaining > 0:
+                written = generated_file.write(block[:remaining])
+                remaining = remaining - written
+
+        total_size = total_size + size
+
+    return total_size
+
+def generate_directive(file_path, rules):
+    """Writes a directive with a number of rules that do not match the generated files, followed by a default rule.
+
+    The rules cycle through 'equals', 'glob', and 'matches' conditions on the file name and extension, so they cannot all be resolved by one index.
+
+    :param file_path: A path. The directive file to write.
+    :param rules: An integer. The number of rules before the default rule.
+
+    """
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<directive xmlns="{}" name="{}">'.format(organize.Directive.NAMESPACE, GENERATED_DIRECTIVE_NAME),
+             '\t<macros>',
+             '\t\t<macro name="original-name">',
+             '\t\t\t<text variable="file-name" replace-spaces-with="_" case="title"/>',
+             '\t\t\t<text variable="file-extension" prefix="." case="lower"/>',
+             '\t\t</macro>',
+             '\t</macros>',
+             '\t<paths>']
+
+    for index in range(10):
+        lines.extend(['\t\t<path name="path-{}">'.format(index),
+                      '\t\t\t<folder value="Folder {}">'.format(index),
+                      '\t\t\t\t<folder variable="file-extension">',
+                      '\t\t\t\t\t<file macro="original-name"/>',
+                      '\t\t\t\t</folder>',
+                      '\t\t\t</folder>',
+                      '\t\t</path>'])
+
+    lines.extend(['\t</paths>', '\t<rules>'])
+    conditions = ['<condition type="equals" variable="file-extension" value="ext{}" case-sensitive="false"/>',
+                  '<condition type="glob" variable="file-name" value="name{}-*"/>',
+                  '<condition type="matches" variable="file-name" value="^n{}_[0-9]+$"/>']
+
+    for index in range(rules):
+        lines.extend(['\t\t<rule name="rule-{}" path="path-{}">'.format(index, index % 10),
+                      '\t\t\t<conditions match="all">',
+                      '\t\t\t\t' + conditions[index % len(conditions)].format(index),
+                      '\t\t\t</conditions>',
+                      '\t\t</rule>'])
+
+    lines.extend(['\t\t<rule name="default" path="path-0">',
+                  '\t\t\t<conditions match="all">',
+                  '\t\t\t\t<condition type="equals" variable="file-extension" value="*"/>',
+                  '\t\t\t</conditions>',
+                  '\t\t</rule>',
+                  '\t</rules>',
+                  '</directive>'])
+
+    with open(file_path, 'w') as directive_file:
+        directive_file.write('\n'.join(lines) + '\n')
+
+def run_worker(directive_path, source, destination, jobs, strategy):
+    """Measures one directive in this process and returns a dictionary of the results.
+
+    :param directive_path: A path. The directive file.
+    :param source: A path. The root of the generated tree.
+    :param destination: A path. The folder to file into, which is created, and removed afterwards.
+    :param jobs: An integer. The number of files copied concurrently.
+    :param strategy: A String. How files are copied, see :class:`.Filer`.
+
+    """
+
+    directive = organize.Directive(directive_path)
+    filer = organize.Filer(directive, jobs, strategy=strategy)
+    files = 0
+    destination_seconds = None
+
+    for repeat in range(DESTINATION_REPEATS):  # @UnusedVariable
+        start = time.perf_counter()
+        files = sum(1 for planned in filer.plan(source, destination, True))
+        seconds = time.perf_counter() - start
+        destination_seconds = seconds if destination_seconds is None else min(destination_seconds, seconds)
+
+    os.makedirs(destination, exist_ok=True)
+    start = time.perf_counter()
+    filer.file_folder(source, destination, True)
+    filing_seconds = time.perf_counter() - start
+    shutil.rmtree(destination, ignore_errors=True)
+
+    statistics = filer.get_statistics()
+
+    return {'directive': directive.get_name(),
+            'files': files,
+            'filed': statistics.get(organize.Filer.FILED_STATISTIC, 0),
+            'failed': statistics.get(organize.Filer.FAILED_STATISTIC, 0),
+            'destination_seconds': destination_seconds,
+            'filing_seconds': filing_seconds,
+            'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def run_directive(directive_path, source, destination, jobs, strategy):
+    """Measures one directive in a new interpreter, under 'strace' if it is installed, and returns a dictionary of the results.
+
+    :param directive_path: A path. The directive file.
+    :param source: A path. The root of the generated tree.
+    :param destination: A path. The folder to file into.
+    :param jobs: An integer. The number of files copied concurrently.
+    :param strategy: A String. How files are copied, see :class:`.Filer`.
+
+    """
+
+    command = [sys.executable, os.path.abspath(__file__), '--worker', directive_path, '--source', source, '--destination', destination,
+               '--jobs', str(jobs), '--strategy', strategy]
+    strace_path = shutil.which('strace')
+    strace_output_path = destination + '.strace'
+
+    if strace_path is not None:
+        command = [strace_path, '-f', '-c', '-o', strace_output_path] + command
+
+    output = subprocess.check_output(command, cwd=ROOT_FOLDER_PATH, universal_newlines=True)
+    result = json.loads(output.splitlines()[-1])
+    result['syscalls'] = None
+
+    if strace_path is not None:
+        # The summary ends with a line of the total seconds, calls, and errors; it covers the whole process, including the destination stage.
+        with open(strace_output_path) as strace_file:
+            for line in strace_file:
+                fields = line.split()
+
+                if fields and fields[-1] == 'total':
+                    result['syscalls'] = int(fields[3])
+
+        os.remove(strace_output_path)
+
+    return result
+
+def print_results(results, total_size):
+    """Prints a table of the results.
+
+    :param results: A list. The dictionaries returned by :func:`.run_directive`.
+    :param total_size: An integer. The bytes in the generated tree.
+
+    """
+
+    print("{:<20} {:>7} {:>14} {:>12} {:>12} {:>14} {:>12}".format('Directive', 'Files', 'Destination/s', 'Filing/s', 'Filing MB/s',
+                                                                     'Syscalls/file', 'Peak RSS MiB'))
+
+    for result in results:
+        files = max(1, result['files'])
+
+        if result['syscalls'] is not None:
+            syscalls = "{:.1f}".format(result['syscalls'] / files)
+        else:
+            syscalls = '-'
+
+        print("{:<20} {:>7} {:>14.0f} {:>12.0f} {:>12.1f} {:>14} {:>12.1f}".format(result['directive'],
+                                                                                     result['files'],
+                                                                                     result['files'] / result['destination_seconds'],
+                                                                                     result['files'] / result['filing_seconds'],
+                                                                                     total_size / result['filing_seconds'] / 1048576,
+                                                                                     syscalls,
+                                                                                     result['peak_rss_kib'] / 1024))
+
+def main(argv=None):
+    """Runs the benchmark and returns the exit status."""
+
+    parser = argparse.ArgumentParser(description="Measures directive evaluation and filing throughput on a generated tree of files.")
+    parser.add_argument('-f', '--files', type=int, default=FILES, help="The number of generated files")
+    parser.add_argument('-d', '--folders', type=int, default=FOLDERS, help="The number of folders the files are spread over")
+    parser.add_argument('-s', '--sizes', default=SIZES, help="The file size distribution: 'fixed:BYTES', 'uniform:MIN:MAX', or 'lognormal:MU:SIGMA'")
+    parser.add_argument('-m', '--max-size', type=int, default=MAX_SIZE, help="The largest generated file size in bytes")
+    parser.add_argument('-r', '--rules', type=int, default=RULES, help="The number of rules in the generated directive")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="The number of files copied concurrently")
+    parser.add_argument('-t', '--strategy', default=organize.Filer.STRATEGY_COPY, help="How files are copied: 'copy', 'link', 'reflink', or 'kernel'")
+    parser.add_argument('--seed', type=int, default=SEED, help="The seed of the generated names and sizes")
+    parser.add_argument('--root', default=None, help="The folder the tree is generated in; defaults to '/dev/shm' if available")
+    parser.add_argument('--json', default=None, help="Also write the results to this file as JSON")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--source', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--destination', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(args.worker, args.source, args.destination, args.jobs, args.strategy)))
+        return 0
+
+    root = args.root
+
+    if root is None and os.path.isdir('/dev/shm'):
+        root = '/dev/shm'
+
+    work_folder_path = tempfile.mkdtemp(prefix='descatter_benchmark_', dir=root)
+
+    try:
+        source = os.path.join(work_folder_path, 'source')
+        os.mkdir(source)
+        total_size = generate_tree(source, args.files, args.folders, args.sizes, args.max_size, args.seed)
+        directive_paths = [os.path.join(ROOT_FOLDER_PATH, 'directives', file_name) for file_name in DIRECTIVE_FILE_NAMES]
+        directive_paths.append(os.path.join(work_folder_path, GENERATED_DIRECTIVE_NAME + '.xml'))
+        generate_directive(directive_paths[-1], args.rules)
+
+        print("{} files, {:.1f} MiB in {}".format(args.files, total_size / 1048576, work_folder_path))
+
+        results = []
+
+        for directive_path in directive_paths:
+            results.append(run_directive(directive_path, source, os.path.join(work_folder_path, 'destination'), args.jobs, args.strategy))
+
+        print_results(results, total_size)
+        failed = [result['directive'] for result in results if result['filed'] != result['files']]
+
+        if failed:
+            print("Not every file was filed with: {}".format(', '.join(failed)), file=sys.stderr)
+
+        if args.json is not None:
+            with open(args.json, 'w') as json_file:
+                json.dump({'files': args.files, 'bytes': total_size, 'sizes': args.sizes, 'results': results}, json_file, indent=2)
+    finally:
+        shutil.rmtree(work_folder_path, ignore_errors=True)
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
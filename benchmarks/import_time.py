@@ -0,0 +1,98 @@
+# benchmarks/import_time.py
+# Copyright (C) 2013 the Descatter authors and contributers <see AUTHORS file>
+#
+# This module is part of Descatter.
+#
+# Descatter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Descatter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measures the time to import the modules loaded by the entry points, each in a new interpreter.
+
+The benchmark fails if a module that is only needed on some code paths, such as 'lxml' or 'prettytable', is imported with an entry point, or if
+the median import time of a module exceeds the limit. Run it from the root folder of the repository:
+
+    python benchmarks/import_time.py [--runs RUNS] [--limit MILLISECONDS]
+
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# The modules imported by the entry points
+MODULES = ['descatter.organize', 'descatter.interface', 'descatter.application']
+
+# The modules that must only be imported on the code path that needs them
+DEFERRED_MODULES = ['lxml', 'prettytable', 'sqlite3', 'concurrent.futures', 'descatter.watch']
+
+# The default number of interpreters started for each module
+RUNS = 10
+
+# Imports a module and prints the seconds it took and the deferred modules that were imported with it
+PROBE = """
+import sys
+import time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds)
+print(' '.join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+def measure(module, runs=RUNS):
+    """Imports a module in new interpreters and returns a tuple of the import times in seconds and the deferred modules that were imported.
+
+    :param module: A String. The name of the module.
+    :param runs: Optional integer. The number of interpreters started.
+
+    """
+
+    root_folder_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-c', PROBE.format(module=module, deferred=DEFERRED_MODULES)]
+    times = []
+    imported = set()
+
+    for run in range(runs):  # @UnusedVariable
+        output = subprocess.check_output(command, cwd=root_folder_path, universal_newlines=True)
+        lines = output.splitlines()
+        times.append(float(lines[0]))
+        imported.update(lines[1].split() if len(lines) > 1 else [])
+
+    return times, sorted(imported)
+
+def main(argv=None):
+    """Runs the benchmark and returns the exit status."""
+
+    parser = argparse.ArgumentParser(description="Measures the import time of the descatter entry point modules.")
+    parser.add_argument('-r', '--runs', type=int, default=RUNS, help="The number of interpreters started for each module")
+    parser.add_argument('-l', '--limit', type=float, default=None, help="Fail if the median import time of a module exceeds this many milliseconds")
+    args = parser.parse_args(argv)
+    failed = False
+
+    print("{:<24} {:>10} {:>10} {:>10}  {}".format('Module', 'Median ms', 'Min ms', 'Max ms', 'Deferred modules imported'))
+
+    for module in MODULES:
+        times, imported = measure(module, args.runs)
+        median = statistics.median(times) * 1000
+
+        print("{:<24} {:>10.1f} {:>10.1f} {:>10.1f}  {}".format(module, median, min(times) * 1000, max(times) * 1000, ', '.join(imported) or '-'))
+
+        if imported or (args.limit is not None and median > args.limit):
+            failed = True
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
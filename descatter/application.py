@@ -45,27 +45,23 @@ def get_file_path(*args):
     
     return os.path.join(get_root_folder(), *args) 
 
-def load_directives():
-    """Loads all directives in a folder defined in the configuration file (descatter.ini) for the application."""
+def load_directives(directive_cache=None):
+    """Indexes all directives in a folder defined in the configuration file (descatter.ini) for the application.
+    
+    Only the name of each directive is read; a directive is parsed when it is first used. See :class:`.DirectiveIndex`.
+    
+    :param directive_cache: Optional :class:`.DirectiveCache`. Parses and keeps the directives, and can be shared with the interface.
+    
+    """
     
     root_folder_path = get_root_folder()
     directives_folder_path = os.path.join(root_folder_path, config['Application']['DirectivesFolderPath'])
     directives_folder_path = os.path.abspath(directives_folder_path)
     
-    loaded = {}
-    for root, subfolder_names, file_names in os.walk(directives_folder_path):  # @UnusedVariable
-        for file_name in file_names:
-            directive_file_path = os.path.join(root, file_name)
-            directive = organize.Directive(directive_file_path)
-            loaded[directive.get_name()] = directive
-
-    return loaded   
+    return organize.DirectiveIndex(directives_folder_path, directive_cache)
     
 # TODO: Load directives in the history folder
 # TODO: Add user directives folder and load directives there as well
-
-loaded = load_directives()
-default = loaded[config['Application']['DefaultDirectiveName']]
     
 def cmd():
     """Starts the descatter application.
@@ -74,10 +70,15 @@ def cmd():
     start file is either the executable: 'descatter.exe' or the python script: 'descatter.py'.
     
     """
-     
-    cli = interface.CommandLine(loaded, default)
+    
+    directive_cache = organize.DirectiveCache(compiled_cache=organize.CompiledDirectiveCache())
+    loaded = load_directives(directive_cache)
+    cli = interface.CommandLine(loaded, config['Application']['DefaultDirectiveName'], directive_cache)
     cli.parse()
     
 def console():
-
-    interface.Console(loaded, default).cmdloop()
\ No newline at end of file
+    """Starts the descatter interactive console."""
+    
+    directive_cache = organize.DirectiveCache(compiled_cache=organize.CompiledDirectiveCache())
+    loaded = load_directives(directive_cache)
+    interface.Console(loaded, config['Application']['DefaultDirectiveName'], directive_cache).cmdloop()
\ No newline at end of file
@@ -25,10 +25,13 @@ These interactions include a command line interface (CLI), an interactive consol
 
 import argparse
 import cmd
+import collections
+import csv
+import json
 import os
+import sys
 
 from descatter import organize
-from prettytable import PrettyTable
 
 ARGUMENT_PREFIX = '-'
 SOURCE_ARGUMENT_NAME = 'source' 
@@ -40,13 +43,27 @@ RECURSIVE_ARGUMENT_NAME = 'recursive'
 VERBOSE_ARGUMENT_NAME = 'verbose'
 ABSOLUTE_ARGUMENT_NAME = 'absolute'
 FILE_ARGUMENT_NAME = 'file'
+WATCH_ARGUMENT_NAME = 'watch'
 CONSOLE_ARGUMENT_NAME = 'interactive'
+JOBS_ARGUMENT_NAME = 'jobs'
+STREAM_ARGUMENT_NAME = 'stream'
+DEDUP_ARGUMENT_NAME = 'dedup'
+INCREMENTAL_ARGUMENT_NAME = 'incremental'
+STRATEGY_ARGUMENT_NAME = 'strategy'
+LINK_ARGUMENT_NAME = 'link'
+REFLINK_ARGUMENT_NAME = 'reflink'
+KERNEL_COPY_ARGUMENT_NAME = 'kernel-copy'
+STATS_ARGUMENT_NAME = 'stats'
+DRY_RUN_ARGUMENT_NAME = 'dry-run'
+PLAN_FORMAT_ARGUMENT_NAME = 'plan-format'
+CSV_PLAN_FORMAT = 'csv'
+JSONL_PLAN_FORMAT = 'jsonl'
 HELP_ARGUMENT_NAME = 'help'
 
 # TODO: Add 'import' command to console, such that a path to a directive is given and copied to a '.descatter' folder in the home directory of the user and loaded each time descatter is started.
 
-def file(source, destination, directive, recursive, move, verbose, absolute):
-    """Files a file.
+def file(source, destination, directive, recursive, move, verbose, absolute, jobs=1, stream=False, dedup=None, incremental=False, strategy=organize.Filer.STRATEGY_COPY, stats=False):
+    """Files a file and returns the :class:`.FilingTimings` of the filing.
     
     :param source: A path or list. The path to a file, the path to a folder, or a list of paths to copy or move.
     :param destination: A path. The folder where the source will be copied or moved.
@@ -55,15 +72,147 @@ def file(source, destination, directive, recursive, move, verbose, absolute):
     :param move: A boolean value. 'True' the source is copied to the destination and then deleted at the source. 'False' the source is only copied.
     :param verbose: A boolean value. 'True' additional information is displayed during the filing.
     :param absolute: A boolean value. 'True' all paths are displayed as absolute paths. 'False' all paths are displayed as relative or abbreviated paths.
+    :param jobs: An integer. The number of files copied or moved concurrently.
+    :param stream: A boolean value. 'True' a folder is filed while it is scanned instead of after all of its files have been found.
+    :param dedup: A string or 'None'. Either 'skip' or 'link' to avoid filing files whose content is already at the destination, see :class:`.Filer`.
+    :param incremental: A boolean value. 'True' files that have not changed since they were last filed to the destination are skipped, see :class:`.Filer`.
+    :param strategy: A string. How files are copied, either 'copy', 'link', 'reflink', or 'kernel', see :class:`.Filer`.
+    :param stats: A boolean value. 'True' the time spent in each stage of the filing is displayed after the filing, see :func:`.print_timings`.
     
     """
                   
-    filer = organize.Filer(directive)    
+    filer = organize.Filer(directive, jobs, dedup, incremental, strategy)    
               
     if verbose:
         filer.subscribe(FilerListener(absolute))
                     
-    filer.file(source, destination, recursive, move)
+    filer.file(source, destination, recursive, move, stream)
+    
+    if verbose:
+        statistics = filer.get_statistics()
+        print("Filed: {} files, Failed: {} files, Duplicates: {} files, Unchanged: {} files, Folders created: {}, Folders reused: {}".format(statistics.get(organize.Filer.FILED_STATISTIC, 0),
+                                                                                                                                             statistics.get(organize.Filer.FAILED_STATISTIC, 0),
+                                                                                                                                             statistics.get(organize.Filer.DUPLICATES_STATISTIC, 0),
+                                                                                                                                             statistics.get(organize.Filer.UNCHANGED_STATISTIC, 0),
+                                                                                                                                             statistics.get(organize.Filer.FOLDER_CACHE_MISSES_STATISTIC, 0),
+                                                                                                                                             statistics.get(organize.Filer.FOLDER_CACHE_HITS_STATISTIC, 0)))
+    
+    if stats:
+        print_timings(filer.get_timings())
+    
+    return filer.get_timings()
+
+def print_timings(timings):
+    """Prints an ASCII table of the time spent in each stage of a filing, followed by the totals of the filing.
+    
+    :param timings: A :class:`.FilingTimings` object.
+    
+    """
+    
+    from prettytable import PrettyTable
+    
+    timings_table = PrettyTable(['Stage', 'Count', 'Total (s)', 'p50 (ms)', 'p99 (ms)', 'Max (ms)'])
+    timings_table.align['Stage'] = 'l'
+    
+    for stage in organize.FilingTimings.STAGES:
+        count = timings.get_count(stage)
+        
+        if count:
+            timings_table.add_row([stage, 
+                                   count, 
+                                   "{:.3f}".format(timings.get_total(stage)), 
+                                   "{:.3f}".format(timings.get_percentile(stage, 50) * 1000), 
+                                   "{:.3f}".format(timings.get_percentile(stage, 99) * 1000), 
+                                   "{:.3f}".format(timings.get_maximum(stage) * 1000)])
+    
+    print(timings_table)
+    print("Files: {}, Bytes: {}, Elapsed: {:.3f} s, Files/s: {:.1f}, MB/s: {:.1f}".format(timings.files,
+                                                                                         timings.bytes,
+                                                                                         timings.get_elapsed(),
+                                                                                         timings.get_files_per_second(),
+                                                                                         timings.get_bytes_per_second() / 1e6))
+
+def watch_folder(source, destination, directive, recursive, move, verbose, absolute, jobs=1, dedup=None, incremental=False, strategy=organize.Filer.STRATEGY_COPY):
+    """Files new files in a folder as they are written until interrupted.
+    
+    :param source: A path. The folder to watch.
+    :param destination: A path. The folder where new files will be copied or moved.
+    :param directive: An :class:`.Directive' object. The directive to control the copy or move of new files to the destination.
+    :param recursive: A boolean value. 'True' new files in every subfolder of the source are filed as well.
+    :param move: A boolean value. 'True' new files are copied to the destination and then deleted at the source. 'False' new files are only copied.
+    :param verbose: A boolean value. 'True' additional information is displayed during the filing.
+    :param absolute: A boolean value. 'True' all paths are displayed as absolute paths. 'False' all paths are displayed as relative or abbreviated paths.
+    :param jobs: An integer. The number of files copied or moved concurrently.
+    :param dedup: A string or 'None'. Either 'skip' or 'link' to avoid filing files whose content is already at the destination, see :class:`.Filer`.
+    :param incremental: A boolean value. 'True' files that have not changed since they were last filed to the destination are skipped, see :class:`.Filer`.
+    :param strategy: A string. How files are copied, either 'copy', 'link', 'reflink', or 'kernel', see :class:`.Filer`.
+    
+    """
+    
+    from descatter import watch
+    
+    filer = organize.Filer(directive, jobs, dedup, incremental, strategy)
+    
+    if verbose:
+        filer.subscribe(FilerListener(absolute))
+    
+    watcher = watch.Watcher(filer, source, destination, recursive, move)
+    
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+def plan(source, destination, directive, recursive, plan_format=CSV_PLAN_FORMAT, output=None):
+    """Writes where a source would be filed without filing it.
+    
+    A line is written for every file as soon as its destination is determined, with the source path, the destination file path, and the name of the matching rule.
+    The destination and rule are empty, or 'null', if the destination could not be determined. See :meth:`.Filer.plan`.
+    
+    :param source: A path or list. The path to a file, the path to a folder, or a list of paths that would be copied or moved.
+    :param destination: A path. The folder where the source would be copied or moved.
+    :param directive: An :class:`.Directive' object. The directive to control the copy or move of the source to the destination.
+    :param recursive: A boolean value. 'True' if the source is a path to a folder, all files in the folder and subfolders are planned.
+    :param plan_format: Optional string. Either 'csv' for comma-separated values with a header line or 'jsonl' for a JSON object on each line.
+    :param output: Optional file object. Where the plan is written. If 'None', the plan is written to standard output.
+    
+    """
+    
+    if output is None:
+        output = sys.stdout
+    
+    filer = organize.Filer(directive)
+    
+    if plan_format == CSV_PLAN_FORMAT:
+        writer = csv.writer(output)
+        writer.writerow(['source', 'destination', 'rule'])
+        
+        for source_path, destination_file_path, rule_name in filer.plan(source, destination, recursive):
+            writer.writerow([source_path, destination_file_path, rule_name])
+    elif plan_format == JSONL_PLAN_FORMAT:
+        for source_path, destination_file_path, rule_name in filer.plan(source, destination, recursive):
+            output.write(json.dumps({'source': source_path, 'destination': destination_file_path, 'rule': rule_name}) + '\n')
+    else:
+        raise organize.FilerError("The plan format: '{}' is not supported".format(plan_format))
+
+def positive_integer(text):
+    """Converts a command line argument to an integer of at least one, such as the number of jobs.
+    
+    An 'argparse.ArgumentTypeError' is raised if the text is not a positive integer, so it is reported as a usage error.
+    
+    :param text: A String.
+    
+    """
+    
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    
+    if value < 1:
+        raise argparse.ArgumentTypeError("'{}' is not a positive integer".format(text))
+    
+    return value
 
 class ConsoleError(Exception): 
     """Raised when the interactive console interface encounters an error."""
@@ -76,16 +225,21 @@ class CommandLineError(Exception):
 class CommandLine(object):
     """The command line interface."""
         
-    def __init__(self, loaded, default):
+    def __init__(self, loaded, default, directive_cache=None):
         """Constructor for the :class:`.CommandLine`.
         
         :param loaded: A dictionary of :class:`.Directive` objects.
-        :param default: A :class:`.Directive` object. The default directive to use if the '-d' argument is not specified.
+        :param default: A String. The name of the loaded directive to use if the '-d' argument is not specified. It is only parsed when it is used.
+        :param directive_cache: Optional :class:`.DirectiveCache`. The cache of directives loaded from paths, which is shared with the console.
         
         """
         
+        if directive_cache is None:
+            directive_cache = organize.DirectiveCache()
+        
         self._loaded = loaded       
         self._default = default
+        self._directive_cache = directive_cache
         self._parser = argparse.ArgumentParser()
         self._parser.add_argument(ARGUMENT_PREFIX + 'i',
                                  ARGUMENT_PREFIX + ARGUMENT_PREFIX + CONSOLE_ARGUMENT_NAME,
@@ -95,6 +249,10 @@ class CommandLine(object):
                                  ARGUMENT_PREFIX + ARGUMENT_PREFIX + FILE_ARGUMENT_NAME,
                                  nargs=2,
                                  help='Files a source to a destination based on a directive')
+        self._parser.add_argument(ARGUMENT_PREFIX + 'w',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + WATCH_ARGUMENT_NAME,
+                                 nargs=2,
+                                 help='Files new files in a source folder to a destination as they are written, until interrupted')
         self._parser.add_argument(ARGUMENT_PREFIX + 't',
                                  ARGUMENT_PREFIX + ARGUMENT_PREFIX + TAG_ARGUMENT_NAME,
                                  nargs=2,
@@ -118,6 +276,57 @@ class CommandLine(object):
                                  ARGUMENT_PREFIX + ARGUMENT_PREFIX + ABSOLUTE_ARGUMENT_NAME,
                                  action='store_true',
                                  help='Displays all paths as absolute paths')
+        self._parser.add_argument(ARGUMENT_PREFIX + 'j',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + JOBS_ARGUMENT_NAME,
+                                 type=positive_integer,
+                                 default=1,
+                                 help='Copies or moves this number of files concurrently')
+        self._parser.add_argument(ARGUMENT_PREFIX + 's',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + STREAM_ARGUMENT_NAME,
+                                 action='store_true',
+                                 help='Files a folder while it is scanned instead of after all of its files have been found')
+        self._parser.add_argument(ARGUMENT_PREFIX + 'u',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + DEDUP_ARGUMENT_NAME,
+                                 choices=[organize.Filer.DEDUP_SKIP, organize.Filer.DEDUP_LINK],
+                                 help='Skips, or hard links, files whose content is already at the destination instead of copying or moving them again')
+        self._parser.add_argument(ARGUMENT_PREFIX + 'c',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + INCREMENTAL_ARGUMENT_NAME,
+                                 action='store_true',
+                                 help='Skips files that have not changed since they were last filed to the destination')
+        strategy_group = self._parser.add_mutually_exclusive_group()
+        strategy_group.add_argument(ARGUMENT_PREFIX + 'l',
+                                    ARGUMENT_PREFIX + ARGUMENT_PREFIX + LINK_ARGUMENT_NAME,
+                                    dest=STRATEGY_ARGUMENT_NAME,
+                                    action='store_const',
+                                    const=organize.Filer.STRATEGY_LINK,
+                                    default=organize.Filer.STRATEGY_COPY,
+                                    help='Files hard links to the source files instead of copies, falling back to copies across file systems')
+        strategy_group.add_argument(ARGUMENT_PREFIX + 'e',
+                                    ARGUMENT_PREFIX + ARGUMENT_PREFIX + REFLINK_ARGUMENT_NAME,
+                                    dest=STRATEGY_ARGUMENT_NAME,
+                                    action='store_const',
+                                    const=organize.Filer.STRATEGY_REFLINK,
+                                    help='Files copy-on-write clones of the source files on file systems that support them, such as Btrfs and XFS')
+        strategy_group.add_argument(ARGUMENT_PREFIX + 'k',
+                                    ARGUMENT_PREFIX + ARGUMENT_PREFIX + KERNEL_COPY_ARGUMENT_NAME,
+                                    dest=STRATEGY_ARGUMENT_NAME,
+                                    action='store_const',
+                                    const=organize.Filer.STRATEGY_KERNEL,
+                                    help='Copies the source files inside the kernel with copy_file_range')
+        self._parser.add_argument(ARGUMENT_PREFIX + ARGUMENT_PREFIX + STATS_ARGUMENT_NAME,
+                                 action='store_true',
+                                 help='Displays the time spent in each stage of the filing, the bytes filed, and the files filed per second')
+        self._parser.add_argument(ARGUMENT_PREFIX + 'n',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + DRY_RUN_ARGUMENT_NAME,
+                                 dest=DRY_RUN_ARGUMENT_NAME,
+                                 action='store_true',
+                                 help='Writes where each file would be filed and the matching rule without copying or moving anything')
+        self._parser.add_argument(ARGUMENT_PREFIX + 'p',
+                                 ARGUMENT_PREFIX + ARGUMENT_PREFIX + PLAN_FORMAT_ARGUMENT_NAME,
+                                 dest=PLAN_FORMAT_ARGUMENT_NAME,
+                                 choices=[CSV_PLAN_FORMAT, JSONL_PLAN_FORMAT],
+                                 default=CSV_PLAN_FORMAT,
+                                 help='The format of the plan written by a dry run')
         
     def parse(self, param_args=None):
         """Parses the arguments supplied from the shell."""
@@ -128,25 +337,53 @@ class CommandLine(object):
             self._do_console(args)
         elif args[FILE_ARGUMENT_NAME]:
             self._do_file(args)
+        elif args[WATCH_ARGUMENT_NAME]:
+            self._do_watch(args)
         else:
             print("Nothing to do!")
     
     def _do_console(self, args):
         """Run the interfacetive console."""
         
-        Console(self._loaded, self._default).cmdloop()
+        Console(self._loaded, self._default, self._directive_cache).cmdloop()
     
     def _do_file(self, args):
         """Run the file command."""
         
-        source = args[self.file_arg][0]
-        destination = args[self.file_arg][1]
-        directive = self._get_directive(args[self.DIRECTIVE_ARGUMENT_NAME])
-        recursive = args[self.recursive_arg]
-        move = args[self.move_arg]
-        verbose = args[self.verbose_arg]
-        absolute = args[self.absolute_arg]       
-        file(source, destination, directive, recursive, move, verbose, absolute)
+        source = args[FILE_ARGUMENT_NAME][0]
+        destination = args[FILE_ARGUMENT_NAME][1]
+        directive = self._get_directive(args[DIRECTIVE_ARGUMENT_NAME])
+        recursive = args[RECURSIVE_ARGUMENT_NAME]
+        move = args[MOVE_ARGUMENT_NAME]
+        verbose = args[VERBOSE_ARGUMENT_NAME]
+        absolute = args[ABSOLUTE_ARGUMENT_NAME]
+        jobs = args[JOBS_ARGUMENT_NAME]
+        stream = args[STREAM_ARGUMENT_NAME]
+        dedup = args[DEDUP_ARGUMENT_NAME]
+        incremental = args[INCREMENTAL_ARGUMENT_NAME]
+        strategy = args[STRATEGY_ARGUMENT_NAME]
+        stats = args[STATS_ARGUMENT_NAME]
+        
+        if args[DRY_RUN_ARGUMENT_NAME]:
+            plan(source, destination, directive, recursive, args[PLAN_FORMAT_ARGUMENT_NAME])
+        else:
+            file(source, destination, directive, recursive, move, verbose, absolute, jobs, stream, dedup, incremental, strategy, stats)
+    
+    def _do_watch(self, args):
+        """Run the watch command."""
+        
+        from descatter import watch
+        
+        source = args[WATCH_ARGUMENT_NAME][0]
+        destination = args[WATCH_ARGUMENT_NAME][1]
+        directive = self._get_directive(args[DIRECTIVE_ARGUMENT_NAME])
+        
+        try:
+            watch_folder(source, destination, directive, args[RECURSIVE_ARGUMENT_NAME], args[MOVE_ARGUMENT_NAME], args[VERBOSE_ARGUMENT_NAME], 
+                         args[ABSOLUTE_ARGUMENT_NAME], args[JOBS_ARGUMENT_NAME], args[DEDUP_ARGUMENT_NAME], args[INCREMENTAL_ARGUMENT_NAME], 
+                         args[STRATEGY_ARGUMENT_NAME])
+        except watch.WatchError as error:
+            raise CommandLineError(str(error))
     
     def _get_directive(self, source):
         """Get the directive.
@@ -156,11 +393,12 @@ class CommandLine(object):
         """
         
         if source is None:
-            return self._default
-        elif source in self._loaded:
+            source = self._default
+        
+        if source in self._loaded:
             return self._loaded[source]
         elif os.path.isfile(source):
-            return organize.Directive(source)
+            return self._directive_cache.get(source)
         else:
             raise CommandLineError("A directive could not be determined!")          
 
@@ -170,28 +408,46 @@ class Console(cmd.Cmd):
     intro = 'Welcome to the descatter interactive console!'
     prompt = 'descatter: '
     
-    def __init__(self, loaded, default):
+    # The most directives kept in the history
+    HISTORY_SIZE = 32
+    
+    def __init__(self, loaded, default, directive_cache=None):
         """Constructor for the :class:`.Console`.
         
         :param loaded: A dictionary of :class:`.Directive` objects. The directives loaded during application start.
-        :param default: A :class:`.Directive` object. The default directive to use if no directive is specified.
+        :param default: A String. The name of the loaded directive to use if no directive is specified and none has been used. It is only parsed when 
+            it is used.
+        :param directive_cache: Optional :class:`.DirectiveCache`. The cache of directives loaded from paths.
         
         """
         
+        if directive_cache is None:
+            directive_cache = organize.DirectiveCache()
+        
         self._loaded = loaded
-        self._history = {}
-        self._most_recent = default
+        self._history = collections.OrderedDict()
+        self._default = default
+        self._most_recent = None
+        self._directive_cache = directive_cache
+        self._timings = None
         super(Console, self).__init__()               
 
     def _add_to_history(self, directive):
         """Adds a directive to the history of used directives.
         
+        The history is ordered from the least to the most recently used directive, and the least recently used directive is dropped once the history 
+        holds more than :attr:`.HISTORY_SIZE` directives.
+        
         :param directive: A :class:`.Directive` object.
                 
         """
         
         self._most_recent = directive
+        self._history.pop(directive.get_name(), None)
         self._history[directive.get_name()] = directive
+        
+        while len(self._history) > self.HISTORY_SIZE:
+            self._history.popitem(last=False)
 
     def _get_directive(self, source):
         """Returns a directive to use for the 'file' command. 
@@ -205,11 +461,11 @@ class Console(cmd.Cmd):
         elif source in self._loaded:
             return self._loaded[source]
         elif os.path.isfile(source):
-            return organize.Directive(source)
-        elif not source:
-            return self._most_recent
-        elif source is None:
+            return self._directive_cache.get(source)
+        elif not source and self._most_recent is not None:
             return self._most_recent
+        elif not source and self._default in self._loaded:
+            return self._loaded[self._default]
         else:
             raise ConsoleError("A directive could not be determined!") 
     
@@ -222,6 +478,8 @@ class Console(cmd.Cmd):
         
         """
 
+        from prettytable import PrettyTable
+
         if verbose:
             directive_table = PrettyTable(['Name', 'File', 'Path'])
             directive_table.align['Path'] = 'l'
@@ -252,6 +510,8 @@ class Console(cmd.Cmd):
         
         """
         
+        from prettytable import PrettyTable
+        
         entities_table = PrettyTable(['Entities', 'Tags'])
         entities_table.align['Entities'] = 'l'
         entities_table.align['Tags'] = 'l'
@@ -301,7 +561,58 @@ class Console(cmd.Cmd):
         parser.add_argument(ARGUMENT_PREFIX + 'a',
                             ARGUMENT_PREFIX + ARGUMENT_PREFIX + ABSOLUTE_ARGUMENT_NAME,
                             action='store_true',
-                            help='Displays all paths as absolute paths.')    
+                            help='Displays all paths as absolute paths.')
+        parser.add_argument(ARGUMENT_PREFIX + 'j',
+                            ARGUMENT_PREFIX + ARGUMENT_PREFIX + JOBS_ARGUMENT_NAME,
+                            type=positive_integer,
+                            default=1,
+                            help='Copies or moves this number of files concurrently.')
+        parser.add_argument(ARGUMENT_PREFIX + 's',
+                            ARGUMENT_PREFIX + ARGUMENT_PREFIX + STREAM_ARGUMENT_NAME,
+                            action='store_true',
+                            help='Files a folder while it is scanned instead of after all of its files have been found.')
+        parser.add_argument(ARGUMENT_PREFIX + 'u',
+                            ARGUMENT_PREFIX + ARGUMENT_PREFIX + DEDUP_ARGUMENT_NAME,
+                            choices=[organize.Filer.DEDUP_SKIP, organize.Filer.DEDUP_LINK],
+                            help='Skips, or hard links, files whose content is already at the destination instead of copying or moving them again.')
+        parser.add_argument(ARGUMENT_PREFIX + 'c',
+                            ARGUMENT_PREFIX + ARGUMENT_PREFIX + INCREMENTAL_ARGUMENT_NAME,
+                            action='store_true',
+                            help='Skips files that have not changed since they were last filed to the destination.')
+        strategy_group = parser.add_mutually_exclusive_group()
+        strategy_group.add_argument(ARGUMENT_PREFIX + 'l',
+                                    ARGUMENT_PREFIX + ARGUMENT_PREFIX + LINK_ARGUMENT_NAME,
+                                    dest=STRATEGY_ARGUMENT_NAME,
+                                    action='store_const',
+                                    const=organize.Filer.STRATEGY_LINK,
+                                    default=organize.Filer.STRATEGY_COPY,
+                                    help='Files hard links to the source files instead of copies, falling back to copies across file systems.')
+        strategy_group.add_argument(ARGUMENT_PREFIX + 'e',
+                                    ARGUMENT_PREFIX + ARGUMENT_PREFIX + REFLINK_ARGUMENT_NAME,
+                                    dest=STRATEGY_ARGUMENT_NAME,
+                                    action='store_const',
+                                    const=organize.Filer.STRATEGY_REFLINK,
+                                    help='Files copy-on-write clones of the source files on file systems that support them, such as Btrfs and XFS.')
+        strategy_group.add_argument(ARGUMENT_PREFIX + 'k',
+                                    ARGUMENT_PREFIX + ARGUMENT_PREFIX + KERNEL_COPY_ARGUMENT_NAME,
+                                    dest=STRATEGY_ARGUMENT_NAME,
+                                    action='store_const',
+                                    const=organize.Filer.STRATEGY_KERNEL,
+                                    help='Copies the source files inside the kernel with copy_file_range.')
+        parser.add_argument(ARGUMENT_PREFIX + ARGUMENT_PREFIX + STATS_ARGUMENT_NAME,
+                            action='store_true',
+                            help="Displays the time spent in each stage of the filing, the bytes filed, and the files filed per second. The 'stats' command displays them again later.")
+        parser.add_argument(ARGUMENT_PREFIX + 'n',
+                            ARGUMENT_PREFIX + ARGUMENT_PREFIX + DRY_RUN_ARGUMENT_NAME,
+                            dest=DRY_RUN_ARGUMENT_NAME,
+                            action='store_true',
+                            help='Displays where each file would be filed and the matching rule without copying or moving anything.')
+        parser.add_argument(ARGUMENT_PREFIX + 'p',
+                            ARGUMENT_PREFIX + ARGUMENT_PREFIX + PLAN_FORMAT_ARGUMENT_NAME,
+                            dest=PLAN_FORMAT_ARGUMENT_NAME,
+                            choices=[CSV_PLAN_FORMAT, JSONL_PLAN_FORMAT],
+                            default=CSV_PLAN_FORMAT,
+                            help='The format of the plan displayed by a dry run.')
         args = parser.parse_line(line)
         
         if args:
@@ -313,11 +624,23 @@ class Console(cmd.Cmd):
                 move = args[MOVE_ARGUMENT_NAME]
                 verbose = args[VERBOSE_ARGUMENT_NAME]
                 absolute = args[ABSOLUTE_ARGUMENT_NAME]
-                file(source, destination, directive, recursive, move, verbose, absolute)
-                self._add_to_history(directive)
-                print("Filing has successfully completed!")
+                jobs = args[JOBS_ARGUMENT_NAME]
+                stream = args[STREAM_ARGUMENT_NAME]
+                dedup = args[DEDUP_ARGUMENT_NAME]
+                incremental = args[INCREMENTAL_ARGUMENT_NAME]
+                strategy = args[STRATEGY_ARGUMENT_NAME]
+                stats = args[STATS_ARGUMENT_NAME]
+                
+                if args[DRY_RUN_ARGUMENT_NAME]:
+                    plan(source, destination, directive, recursive, args[PLAN_FORMAT_ARGUMENT_NAME])
+                else:
+                    self._timings = file(source, destination, directive, recursive, move, verbose, absolute, jobs, stream, dedup, incremental, strategy, stats)
+                    self._add_to_history(directive)
+                    print("Filing has successfully completed!")
             except organize.FilerError as error:
                 print(error)
+            except organize.DirectiveError as error:
+                print(error)
             except ConsoleError as error:
                 print(error)
             except KeyboardInterrupt:
@@ -358,7 +681,10 @@ class Console(cmd.Cmd):
         args = parser.parse_line(line)
         
         if args:
-            self._print_directive_table((self._most_recent,), args[VERBOSE_ARGUMENT_NAME], args[ABSOLUTE_ARGUMENT_NAME])
+            try:
+                self._print_directive_table((self._get_directive(''),), args[VERBOSE_ARGUMENT_NAME], args[ABSOLUTE_ARGUMENT_NAME])
+            except ConsoleError as error:
+                print(error)
 
     def do_loaded(self, line):
         """Displays the directives loaded at the start of the application."""
@@ -378,6 +704,19 @@ class Console(cmd.Cmd):
         if args:
             self._print_directive_table(self._loaded.values(), args[VERBOSE_ARGUMENT_NAME], args[ABSOLUTE_ARGUMENT_NAME]) 
             
+    def do_stats(self, line):
+        """Displays the time spent in each stage of the most recent filing."""
+        
+        parser = ConsoleParser(prog='stats',
+                               description="Displays the time spent in each stage of the most recent filing by the 'file' command, the bytes filed, and the files filed per second")
+        args = parser.parse_line(line)
+        
+        if args:
+            if self._timings is None:
+                print("Nothing has been filed!")
+            else:
+                print_timings(self._timings)
+            
     def do_exit(self, line):
         """Safely exits the console."""
         
@@ -23,13 +23,31 @@
 # TODO: Add macro for tagging files as they are filed
 # TODO: Test conditions involving datetime, i.e. created, modified, accessed properties.
 
+import base64
+import collections
+import collections.abc
+import errno
+import hashlib
+import operator
 import os
-import tempfile
+import pickle
+import random
+import re
+import stat
+import string
+import sys
+import threading
+import time
 import shutil
+import xml.parsers.expat
 
-from lxml import etree
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 class DirectiveError(Exception): pass
 class FilerError(Exception): pass
 
@@ -41,9 +59,96 @@ class Filer(object):
     :param directive: a :class:'.Directive' object. Determines the destination path of files.
     
         The directive is responsible for determining the destination path of files relative to the root, or top, destination folder.
+    
+    :param workers: Optional integer. The number of threads that copy or move files concurrently within a batch. 
+    
+        Destinations are always determined, and destination folders created, in batch order on the calling thread; only the copies or moves are 
+        done by the workers. Listener notifications are fired in batch order after each copy or move has finished. A value of 1 files sequentially.
+    
+    :param dedup: Optional string or 'None'. Either 'skip' or 'link' to avoid filing a file whose content is already at the destination.
+    
+        The content of the files filed to a destination is recorded in a :class:`.DedupIndex` in the destination folder. If the content of a file is 
+        already at the destination, 'skip' files nothing and 'link' creates a hard link to the existing file at the destination of the file instead of 
+        copying it. A moved duplicate is deleted from the source either way. 'None' files every file.
+    
+    :param incremental: Optional boolean. 'True' indicates a file that has not changed since it was last filed to the same destination is not filed again.
+    
+        Every file filed in a batch is recorded in a :class:`.FilingJournal` in the destination folder, and a file in a later batch with the same path, 
+        size, modification time, and inode as its record is skipped after a single 'stat' call, without evaluating the directive. Skipped files are not 
+        yielded or returned as filed paths, but still count towards the 'file-index' and 'file-count' variables of the other files. A single file filed 
+        with :meth:`.file_file` is always filed.
+    
+    :param strategy: Optional string. How a file is copied, either 'copy', 'link', 'reflink', or 'kernel'.
+    
+        'copy' uses 'shutil.copy2'. 'link' creates a hard link, so the filed file and the source share their content and metadata. 'reflink' clones the 
+        content with the 'FICLONE' ioctl on file systems with copy-on-write, such as Btrfs and XFS. 'kernel' copies the content inside the kernel with 
+        'os.copy_file_range', which some file systems also turn into a clone. A strategy that is not available for a file, such as a link or clone to 
+        another file system, falls back to the next: 'reflink' to 'kernel', and every strategy to 'copy', which itself copies with 'sendfile' where 
+        available. A moved file is renamed when the source and destination are on the same file system and only copied with the strategy otherwise.
+    
+    Moves compare the device of the folder of each source and of the destination once per filing, so a file on the same device is renamed with a single
+    'os.replace' call. A file moved to another device is copied, and its source is only deleted once the copies of a group of moved files have been
+    synced to disk together, so a crash never loses a file and the cost of syncing is shared by the group. The last group is synced when the filing
+    ends, so a source may still exist briefly after its filed path has been yielded.
+    
+    The time spent in each stage of the most recent filing is recorded in a :class:`.FilingTimings`, see :meth:`.get_timings`.
         
     """
     
+    # The number of copies or moves queued for each worker before the oldest is waited on
+    PENDING_PER_WORKER = 4
+    
+    # The number of files moved to another device that are synced to disk together before their sources are deleted
+    MOVE_SYNC_SIZE = 256
+    
+    # Filing Statistics
+    
+    # The number of files filed
+    FILED_STATISTIC = 'filed'
+    
+    # The number of files that could not be filed
+    FAILED_STATISTIC = 'failed'
+    
+    # The number of files whose content was already at the destination
+    DUPLICATES_STATISTIC = 'duplicates'
+    
+    # The number of files skipped because they have not changed since they were filed
+    UNCHANGED_STATISTIC = 'unchanged'
+    
+    # The number of destination folders already known to exist, which were not created again
+    FOLDER_CACHE_HITS_STATISTIC = 'folder-cache-hits'
+    
+    # The number of destination folders created, or checked to exist, with 'os.makedirs'
+    FOLDER_CACHE_MISSES_STATISTIC = 'folder-cache-misses'
+    
+    # Deduplication modes
+    
+    # A file whose content is already at the destination is not filed
+    DEDUP_SKIP = 'skip'
+    
+    # A file whose content is already at the destination is filed as a hard link to the existing file
+    DEDUP_LINK = 'link'
+    
+    # Copy strategies
+    
+    # A file is copied with 'shutil.copy2'
+    STRATEGY_COPY = 'copy'
+    
+    # A file is filed as a hard link to the source
+    STRATEGY_LINK = 'link'
+    
+    # A file is filed as a copy-on-write clone of the source
+    STRATEGY_REFLINK = 'reflink'
+    
+    # A file is copied inside the kernel with 'os.copy_file_range'
+    STRATEGY_KERNEL = 'kernel'
+    
+    # The 'ioctl' request that clones a file, from 'linux/fs.h'
+    FICLONE = 0x40049409
+    
+    # The most bytes copied by one 'os.copy_file_range' or 'os.sendfile' call
+    KERNEL_COPY_SIZE = 1 << 30
+    
     # File Context Variables
     
     # The current datetime stamp
@@ -79,19 +184,53 @@ class Filer(object):
     # The source path, this is the absolute path to the source file and includes the file name and extension.
     FILE_SOURCE_PATH = 'file-source-path'
     
-    def __init__(self, directive):
+    def __init__(self, directive, workers=1, dedup=None, incremental=False, strategy=STRATEGY_COPY):
         """Constructor for the :class:`.Filer`."""
         
         if directive is None:
             raise FilerError("The directive does not exist")
+        
+        if workers < 1:
+            raise FilerError("The number of workers must be at least one")
+        
+        if dedup not in (None, self.DEDUP_SKIP, self.DEDUP_LINK):
+            raise FilerError("The deduplication mode: '{}' is unknown".format(dedup))
+        
+        if strategy not in (self.STRATEGY_COPY, self.STRATEGY_LINK, self.STRATEGY_REFLINK, self.STRATEGY_KERNEL):
+            raise FilerError("The copy strategy: '{}' is unknown".format(strategy))
                 
         self.directive = directive
+        self.workers = workers
+        self.dedup = dedup
+        self.incremental = incremental
+        self.strategy = strategy
+        self.statistics = collections.Counter()
+        self.timings = FilingTimings()
+        self._statistics_lock = threading.Lock()
         self._listeners = []
+        self._folders = set()
+        self._dedup_indexes = {}
+        self._journals = {}
+        self._devices = {}
+        self._moved = []
+        self._moved_lock = threading.Lock()
+        self._names = RandomNames()
+        self._claimed = {}
     
     def subscribe(self, listener):
         self._listeners.append(listener)
+    
+    def get_statistics(self):
+        """Gets the statistics of the most recent filing as a dictionary of counts keyed by the statistic constants of the :class:`.Filer`."""
+        
+        return dict(self.statistics)
+    
+    def get_timings(self):
+        """Gets the :class:`.FilingTimings` of the most recent filing, or of the filing in progress."""
+        
+        return self.timings
 
-    def file(self, source, destination, recursive=False, move=False):
+    def file(self, source, destination, recursive=False, move=False, stream=False):
         """Files based on the type of source.
         
         If the 'source' is a single file, it will still be batched but with an index of 1 and a count of 1.
@@ -100,12 +239,17 @@ class Filer(object):
         :param destination: A path. The path to a folder where the source will be filed.
         :param recursive: Optional boolean. 'True' indicates a recursive filing if the source is a folder. A recursive filing files all files in subfolders of the source root, or top, folder. 'False' indicates only files in the root, or top, folder are filed.
         :param move: Optional boolean. 'True' indicates the source is moved (copied to the destination then deleted). 'False' indicates the source is copied but not deleted.
+        :param stream: Optional boolean. 'True' indicates a folder is filed while it is scanned, see :meth:`.iter_file_folder`. 'False' indicates all of the files in a folder are found before filing begins.
         
         """
         # TODO: Add overwrite argument option. If 'True' files are overwritten if they already exist at the destination. If 'False' files are not copied or moved if they already exist at the destination.
 
         if os.path.isdir(source):
-            self.file_folder(source, destination, recursive, move)
+            if stream:
+                for filed_path in self.iter_file_folder(source, destination, recursive, move):  # @UnusedVariable
+                    pass
+            else:
+                self.file_folder(source, destination, recursive, move)
         else:
             source_list = source.split(',')
             self.file_list(source_list, destination, move)
@@ -119,32 +263,61 @@ class Filer(object):
 
         """
         
-        return self._file(self._create_context(source), destination, move)
+        # A malformed directive is reported before any file is examined.
+        self.directive.compile()
+        self._start()
+        
+        try:
+            start = time.perf_counter_ns()
+            context = self._create_context(source)
+            self.timings.record(FilingTimings.CONTEXT_STAGE, time.perf_counter_ns() - start)
+            
+            return self._file(context, destination, move)
+        finally:
+            self._finish()
     
     def file_list(self, source, destination, move=False):
         """Files a list of file paths.
         
+        Each path is examined with a single 'stat' call, which is shared with the filer context. Paths that are not files are skipped.
+        
         :param source: A list. The file paths to be filed as a batch.
         :param destination: A path. The path to a folder where the source will be filed.
         :param move: Optional boolean. 'True' indicates the source is moved (copied to the destination then deleted). 'False' indicates the source is copied but not deleted.
         
         """
         
-        filed_paths = []       
-        file_count = len(source)
-        file_index = 1
+        # A malformed directive is reported before any file is examined.
+        self.directive.compile()
+        timings = FilingTimings()
+        entries = list(self._time_entries(self._stat_paths(source), timings))
         
-        for file_path in source:
-            if os.path.isfile(file_path):
-                filed_path = self._file(self._create_context(file_path, file_index, file_count), destination, move)
-                filed_paths.append(filed_path)
-                file_index = file_index + 1
+        return list(self._iter_file_entries(entries, len(entries), destination, move, timings))
+    
+    def iter_file_list(self, source, destination, move=False, count=None):
+        """Files file paths as they are generated and yields each filed path.
+        
+        Filing starts with the first path and paths are not kept after they are filed, so the source can be a generator over any number of files.
+        The path of each filed file, or 'None' if filing failed, is yielded in order.
+        
+        :param source: An iterable. The file paths to be filed as a batch. Paths that are not files are skipped.
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param move: Optional boolean. 'True' indicates the source is moved (copied to the destination then deleted). 'False' indicates the source is copied but not deleted.
+        :param count: Optional integer. The value of the 'file-count' variable. 'None' indicates the number of files is unknown.
+        
+        """
+        
+        # A malformed directive is reported before any file is examined.
+        self.directive.compile()
+        timings = FilingTimings()
         
-        return filed_paths
+        return self._iter_file_entries(self._time_entries(self._stat_paths(source), timings), count, destination, move, timings)
         
     def file_folder(self, source, destination, recursive=False, move=False):
         """Files all of the files in a folder.
         
+        The folder is scanned with 'os.scandir', so the metadata of each file is retrieved at most once, and only if the directive uses it.
+        
         :param source: A path. The path to a folder where all files within the folder will be filed as a batch.
         :param destination: A path. The path to a folder where the source will be filed.
         :param recursive: Optional boolean. 'True' indicates a recursive filing if the source is a folder. A recursive filing files all files in subfolders of the source root, or top, folder. 'False' indicates only files in the root, or top, folder are filed.
@@ -153,51 +326,310 @@ class Filer(object):
         """
                 
         if os.path.isdir(source):
-            files = []
-    
-            if recursive:
-                for root, subfolder_names, file_names in os.walk(source):  # @UnusedVariable
-                    for file_name in file_names:
-                        files.append(os.path.join(root, file_name))
-            else:
-                for folder_item in os.listdir(source):
-                    files.append(os.path.join(source, folder_item))
-                
-            filed_paths = self.file_list(files, destination, move) 
+            # A malformed directive is reported before any file is examined.
+            self.directive.compile()
+            timings = FilingTimings()
+            entries = list(self._time_entries(self._scan_folder(source, recursive), timings))
+            filed_paths = list(self._iter_file_entries(entries, len(entries), destination, move, timings))
                 
             return filed_paths
         else:
             raise FilerError("The source: '{}' could not be filed because it is not a folder".format(source))
+    
+    def iter_file_folder(self, source, destination, recursive=False, move=False):
+        """Files the files in a folder while the folder is scanned and yields each filed path.
+        
+        Unlike :meth:`.file_folder`, the paths of the files in the folder are never all held in memory and filing starts with the first file found. 
+        If the directive uses the 'file-count' variable, the files are first counted by a scan that does not retrieve any file metadata; otherwise, 
+        the count is unknown and the folder is scanned only once. 
+        
+        The destination should not be inside the source when filing recursively, because the files that have been filed could be found by the scan.
+        
+        :param source: A path. The path to a folder where all files within the folder will be filed as a batch.
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param recursive: Optional boolean. 'True' indicates the files in all subfolders are filed as well.
+        :param move: Optional boolean. 'True' indicates the source is moved (copied to the destination then deleted). 'False' indicates the source is copied but not deleted.
+        
+        """
+        
+        if not os.path.isdir(source):
+            raise FilerError("The source: '{}' could not be filed because it is not a folder".format(source))
+        
+        # A malformed directive is reported before any file is examined.
+        self.directive.compile()
+        count = None
+        timings = FilingTimings()
+        
+        if self.FILE_COUNT in self.directive.get_variables():
+            count = sum(1 for entry in self._time_entries(self._scan_folder(source, recursive), timings))  # @UnusedVariable
+        
+        return self._iter_file_entries(self._time_entries(self._scan_folder(source, recursive), timings), count, destination, move, timings)
+
+    def plan(self, source, destination, recursive=False):
+        """Determines where every file of a source would be filed, without filing it, and yields a tuple of the source path, the destination file path, and the name of the matching rule for each file.
+
+        Nothing is created, copied, or moved; the source is only examined for the metadata the directive uses. A random folder or file name is left as 
+        the '?' placeholder in the destination file path, since it is only chosen when the file is filed. The destination file path and rule name of a 
+        file are both 'None' if its destination could not be determined. Files are planned in the order they would be filed.
+
+        :param source: A file path, a comma-separated list of file paths, or a folder path, see :meth:`.file`.
+        :param destination: A path. The path to a folder where the source would be filed.
+        :param recursive: Optional boolean. 'True' indicates the files in all subfolders are planned as well if the source is a folder.
+
+        """
+
+        # A malformed directive is reported before any file is examined.
+        program = self.directive.compile()
+
+        if os.path.isdir(source):
+            entries = self._scan_folder(source, recursive)
+            count = None
+
+            if self.FILE_COUNT in program.variables:
+                count = sum(1 for entry in self._scan_folder(source, recursive))  # @UnusedVariable
+        else:
+            entries = list(self._stat_paths(source.split(',')))
+            count = len(entries)
+
+        planned = collections.deque(maxlen=1)
+        contexts = self._iter_contexts(entries, count, planned)
+
+        while True:
+            try:
+                for rule_name, folder_names, file_name in program.plan(contexts):
+                    yield planned.pop()[self.FILE_SOURCE_PATH], os.path.join(destination, *(folder_names + [file_name])), rule_name
+
+                return
+            except Exception:
+                # An error that is not caused by a file, such as a folder that cannot be scanned, ends the plan.
+                if not planned:
+                    raise
+
+                # The plan stops at the file that failed, so it is resumed with the file after it.
+                yield planned.pop()[self.FILE_SOURCE_PATH], None, None
+
+    def _iter_contexts(self, entries, file_count, planned):
+        """Generates a filer context for each entry of a batch.
+
+        :param entries: An iterable. Tuples of a file path and its 'stat' result or 'os.DirEntry'.
+        :param file_count: An integer or 'None'. The value of the 'file-count' variable.
+        :param planned: A 'collections.deque' with a maximum length of one. Holds the most recently generated filer context until it is planned.
+
+        """
+
+        for file_index, (file_path, file_stat) in enumerate(entries, 1):
+            context = self._create_context(file_path, file_index, file_count, file_stat)
+            planned.append(context)
+            yield context
+
+    def _scan_folder(self, source, recursive):
+        """Generates a tuple of the path and 'os.DirEntry' for every file in a folder.
+        
+        Files are generated before the files in subfolders, in the same order as 'os.walk'. Symbolic links to folders are not followed and folders that cannot be read are skipped.
+        
+        :param source: A path. The folder to scan.
+        :param recursive: A boolean. 'True' indicates the files in all subfolders are generated as well.
+        
+        """
+        
+        folders = [source]
+        
+        while folders:
+            folder = folders.pop()
+            subfolders = []
+            
+            try:
+                with os.scandir(folder) as folder_entries:
+                    for folder_entry in folder_entries:
+                        try:
+                            if folder_entry.is_file():
+                                yield folder_entry.path, folder_entry
+                            elif recursive and folder_entry.is_dir(follow_symlinks=False):
+                                subfolders.append(folder_entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            
+            # Reversed so the first subfolder is the next one popped from the stack.
+            folders.extend(reversed(subfolders))
+
+    def _time_entries(self, entries, timings):
+        """Generates the entries of a batch, recording the time taken to find each one as the 'walk' stage.
+        
+        Only the time spent finding an entry is recorded, not the time spent filing it before the next one is requested.
+        
+        :param entries: An iterable. Tuples of a file path and its 'stat' result or 'os.DirEntry'.
+        :param timings: A :class:`.FilingTimings`. The timings of the filing.
+        
+        """
+        
+        iterator = iter(entries)
+        
+        while True:
+            start = time.perf_counter_ns()
+            
+            try:
+                entry = next(iterator)
+            except StopIteration:
+                return
+            
+            timings.record(FilingTimings.WALK_STAGE, time.perf_counter_ns() - start)
+            
+            yield entry
+
+    def _stat_paths(self, source):
+        """Generates a tuple of the path and 'stat' result for every path that is a file.
+        
+        :param source: An iterable of paths.
+        
+        """
+        
+        for file_path in source:
+            try:
+                file_stat = os.stat(file_path)
+            except (OSError, ValueError):
+                continue
+            
+            if stat.S_ISREG(file_stat.st_mode):
+                yield file_path, file_stat
+
+    def _iter_file_entries(self, entries, file_count, destination, move, timings=None):
+        """Files a batch of files that have already been examined and yields each filed path.
+        
+        :param entries: An iterable. Tuples of a file path and its 'stat' result or 'os.DirEntry'.
+        :param file_count: An integer or 'None'. The value of the 'file-count' variable.
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param move: A boolean. 'True' indicates the source is moved. 'False' indicates the source is copied but not deleted.
+        :param timings: Optional :class:`.FilingTimings`. The timings of the filing, which may already hold the time taken to find the entries.
+        
+        """
+        
+        self._start(timings)
+        
+        try:
+            if self.incremental:
+                entries = self._iter_changed(entries, self._get_journal(destination))
+            
+            if self.workers > 1:
+                yield from self._iter_file_entries_concurrently(entries, file_count, destination, move)
+                return
+            
+            file_index = 1
+            
+            for file_path, file_stat in entries:
+                start = time.perf_counter_ns()
+                context = self._create_context(file_path, file_index, file_count, file_stat)
+                self.timings.record(FilingTimings.CONTEXT_STAGE, time.perf_counter_ns() - start)
+                
+                yield self._file(context, destination, move)
+                file_index = file_index + 1
+        finally:
+            self._finish()
+
+    def _iter_file_entries_concurrently(self, entries, file_count, destination, move):
+        """Files a batch of files that have already been examined with a pool of worker threads and yields each filed path.
+        
+        A bounded number of copies or moves are in flight at once. A file filed to the same destination as a file still in flight waits for it, so the 
+        last file in batch order wins, as when filing sequentially.
+        
+        :param entries: An iterable. Tuples of a file path and its 'stat' result or 'os.DirEntry'.
+        :param file_count: An integer or 'None'. The value of the 'file-count' variable.
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param move: A boolean. 'True' indicates the source is moved. 'False' indicates the source is copied but not deleted.
+        
+        """
+        
+        import concurrent.futures
+        
+        pending = collections.deque()
+        in_flight = {}
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for file_index, (file_path, file_stat) in enumerate(entries, 1):
+                start = time.perf_counter_ns()
+                context = self._create_context(file_path, file_index, file_count, file_stat)
+                self.timings.record(FilingTimings.CONTEXT_STAGE, time.perf_counter_ns() - start)
+                
+                try:
+                    destination_file_path, transfer, arguments = self._begin(context, destination, move)
+                    
+                    if destination_file_path in in_flight:
+                        concurrent.futures.wait((in_flight[destination_file_path],))
+                    
+                    future = executor.submit(self._run_transfer, transfer, arguments)
+                    
+                    if destination_file_path is not None:
+                        in_flight[destination_file_path] = future
+                except Exception as error:
+                    destination_file_path = None
+                    future = concurrent.futures.Future()
+                    future.set_exception(error)
+                
+                pending.append((context, destination, destination_file_path, future))
+                
+                if len(pending) >= self.workers * self.PENDING_PER_WORKER:
+                    yield self._complete(in_flight, *pending.popleft())
+            
+            while pending:
+                yield self._complete(in_flight, *pending.popleft())
+
+    def _complete(self, in_flight, context, destination, destination_file_path, future):
+        """Waits for a copy or move started by a worker and fires its notifications.
+        
+        :param in_flight: A dictionary. The futures of the copies or moves in flight by destination path.
+        :param context: A dictionary. The filer context of the source.
+        :param destination: A path. The path to the folder where the source is filed.
+        :param destination_file_path: A path. The destination the source is copied or moved to, or 'None' if the destination could not be determined.
+        :param future: A 'concurrent.futures.Future'. The copy or move.
+        
+        """
+        
+        source_path = context[self.FILE_SOURCE_PATH]
+        self._notify_started(source_path)
+        
+        if in_flight.get(destination_file_path) is future:
+            del in_flight[destination_file_path]
+        
+        try:
+            filed_path = future.result()
+        except Exception:
+            self._fail()
+            self._notify_failed(source_path)
+            return None
+        
+        self._record(context, destination, filed_path)
+        self.statistics[self.FILED_STATISTIC] += 1
+        self.timings.add_file(context[self.FILE_SIZE])
+        self._notify_completed(source_path, filed_path)
+        
+        return filed_path
 
-    def _create_context(self, source, index=1, count=1):
+    def _create_context(self, source, index=1, count=1, file_stat=None):
         """Creates a filer context.
         
+        The variables of the context are computed when the directive first uses them. See :class:`.FilerContext`.
+        
         :param source: A path. The path to a file, which is the source location to be filed to a destination.
         :param index: Optional integer. Indicates the file index, or number, within a batch operation.
         :param count: Optional integer. Indicates the total number of files within a batch operation.
+        :param file_stat: Optional 'os.stat_result' or 'os.DirEntry'. The metadata of the source. If 'None', the source is examined with 'os.stat'.
         
         """
+        
+        if file_stat is None:
+            try:
+                file_stat = os.stat(source)
+            except (OSError, ValueError):
+                file_stat = None
+        
+        if isinstance(file_stat, os.DirEntry):
+            is_file = file_stat.is_file()
+        else:
+            is_file = file_stat is not None and stat.S_ISREG(file_stat.st_mode)
     
-        if os.path.isfile(source):
-            context = {}
-            file_name, file_extension = os.path.splitext(source)
-            file_name = os.path.basename(file_name)
-            file_extension = file_extension[1:].strip().lower()           
-            context[self.CURRENT_DATETIME] = datetime.now()
-            
-            # Need to change count, index, and size to string; otherwise, the condition tests will try to equate a string with an integer.
-            context[self.FILE_COUNT] = count
-            context[self.FILE_EXTENSION] = file_extension
-            context[self.FILE_DATE_ACCESSED] = datetime.fromtimestamp(os.path.getatime(source))
-            context[self.FILE_DATE_CREATED] = datetime.fromtimestamp(os.path.getctime(source))
-            context[self.FILE_DATE_MODIFIED] = datetime.fromtimestamp(os.path.getmtime(source))
-            context[self.FILE_INDEX] = index
-            context[self.FILE_NAME] = file_name
-            context[self.FILE_PATH] = os.path.dirname(source)
-            context[self.FILE_SIZE] = os.path.getsize(source)
-            context[self.FILE_SOURCE_PATH] = os.path.abspath(source)    
-            
-            return context
+        if is_file:
+            return FilerContext(source, index, count, file_stat)
         else:
             raise FilerError("A filer context could not be created because the source is not a file")
 
@@ -230,550 +662,3240 @@ class Filer(object):
         self._notify_started(context[self.FILE_SOURCE_PATH])
         
         try:
-            destination_folder_names, destination_file_name = self.directive.get_destination(context)
-            destination_file_path = destination
+            destination_file_path, transfer, arguments = self._begin(context, destination, move)  # @UnusedVariable
+            filed_path = self._run_transfer(transfer, arguments)
             
-            for destination_folder_name in destination_folder_names:
-                if destination_folder_name == Directive.RANDOM_VALUE_WILDCARD:
-                    destination_file_path = tempfile.mkdtemp(suffix='', prefix='', dir=destination_file_path)
-                else:
-                    destination_file_path = os.path.join(destination_file_path, destination_folder_name)
-                    os.makedirs(destination_file_path, exist_ok=True)
-                
-            random_placeholder_index = destination_file_name.find(Directive.RANDOM_VALUE_WILDCARD) 
-                
-            if random_placeholder_index == -1:
-                destination_file_path = os.path.join(destination_file_path, destination_file_name)
-            else:
-                prefix = destination_file_name[:random_placeholder_index]
-                suffix = destination_file_name[random_placeholder_index+1:]
-        
-                temp_file_handle, destination_file_path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=destination_file_path, text=False)
-                    
-                # Ensure the race condition, thread-safe created temporary file has been closed and is not used by another
-                # process so that it can be replaced by the source file.
-                os.fdopen(temp_file_handle, 'w').close()
+            self._record(context, destination, filed_path)
+            self.statistics[self.FILED_STATISTIC] += 1
+            self.timings.add_file(context[self.FILE_SIZE])
+            self._notify_completed(context[self.FILE_SOURCE_PATH], filed_path)
             
-            filed_path = None
+            return filed_path
+        except:
+            self._fail()
+            self._notify_failed(context[self.FILE_SOURCE_PATH])
+
+    def _begin(self, context, destination, move):
+        """Determines how a file is filed and prepares its destination.
+        
+        A tuple of the destination file path, the function that copies or moves the file, and the arguments of the function is returned. The function 
+        can be called on another thread. When deduplicating, the destination file path is 'None' if it has a random name, since the name is only 
+        claimed by the function.
+        
+        :param context: A dictionary. The filer context, use _create_context to generate the filer context of a file.
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param move: A boolean. 'True' indicates the file is moved. 'False' indicates the source file is copied and not deleted afterwards.
+        
+        """
+        
+        source_path = context[self.FILE_SOURCE_PATH]
+        
+        # The size is retrieved while the source exists, for the bytes filed, and is kept by the context for after a move.
+        context[self.FILE_SIZE]
+        
+        if self.dedup is None:
+            destination_file_path = self._prepare(context, destination)
+            same_device = move and self._is_same_device(source_path, destination)
             
-            if move:
-                filed_path = shutil.move(context[self.FILE_SOURCE_PATH], destination_file_path)
+            return destination_file_path, self._transfer, (source_path, destination_file_path, move, same_device)
+        
+        # The source is only compared to the index by the function that files it, so the hashing is done by the workers when filing concurrently. The
+        # destination file path is not known until then, and is 'None' if it has a random name.
+        dedup_index = self._get_dedup_index(destination)
+        destination_folder_names, destination_file_name = self._evaluate(context)
+        destination_file_path = None
+        same_device = move and self._is_same_device(source_path, destination)
+        
+        if Directive.RANDOM_VALUE_WILDCARD not in destination_folder_names and Directive.RANDOM_VALUE_WILDCARD not in destination_file_name:
+            destination_file_path = os.path.join(destination, *(destination_folder_names + [destination_file_name]))
+        
+        return destination_file_path, self._file_deduplicated, (dedup_index, source_path, context[self.FILE_SIZE], destination, destination_folder_names, 
+                                                                destination_file_name, move, same_device)
+
+    def _prepare(self, context, destination):
+
+        """Determines the destination file path for a filer context and creates its folders.
+        
+        Random folder and file names are claimed at the destination with :class:`.RandomNames`, so the destination file path is unique. The descriptor 
+        of a claimed file is kept until the file is copied, so the copy is written into it instead of opening the file again.
+        
+        :param context: A dictionary. The filer context, use _create_context to generate the filer context of a file.
+        :param destination: A path. The path to a folder where the source will be filed.
+        
+        """
+        
+        destination_folder_names, destination_file_name = self._evaluate(context)
+        
+        return self._make_destination(destination, destination_folder_names, destination_file_name)
+    
+    def _evaluate(self, context):
+        """Determines the destination folder names and file name of a filer context with the directive.
+        
+        :param context: A dictionary. The filer context.
+        
+        """
+        
+        start = time.perf_counter_ns()
+        
+        try:
+            return self.directive.get_destination(context)
+        finally:
+            self.timings.record(FilingTimings.EVALUATE_STAGE, time.perf_counter_ns() - start)
+    
+    def _make_destination(self, destination, destination_folder_names, destination_file_name):
+        """Creates the folders of a destination, claims its random names, and returns the destination file path. Can be called on a worker thread.
+        
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param destination_folder_names: A list. The folder names from the directive.
+        :param destination_file_name: A String. The file name from the directive.
+        
+        """
+        
+        start = time.perf_counter_ns()
+        destination_file_path = destination
+        is_random = False
+        is_made = True
+        
+        # Consecutive folder names are created together with a single 'os.makedirs' call.
+        for destination_folder_name in destination_folder_names:
+            if destination_folder_name == Directive.RANDOM_VALUE_WILDCARD:
+                if not is_made:
+                    self._make_folder(destination_file_path, is_random)
+                
+                destination_file_path = self._names.claim_folder(destination_file_path)
+                is_random = True
+                is_made = True
             else:
-                filed_path = shutil.copy2(context[self.FILE_SOURCE_PATH], destination_file_path)
+                destination_file_path = os.path.join(destination_file_path, destination_folder_name)
+                is_made = False
+        
+        if not is_made:
+            self._make_folder(destination_file_path, is_random)
             
-            self._notify_completed(context[self.FILE_SOURCE_PATH], destination_file_path)
+        random_placeholder_index = destination_file_name.find(Directive.RANDOM_VALUE_WILDCARD) 
             
-            return filed_path
-        except:
-            self._notify_failed(context[self.FILE_SOURCE_PATH])
+        if random_placeholder_index == -1:
+            destination_file_path = os.path.join(destination_file_path, destination_file_name)
+        else:
+            prefix = destination_file_name[:random_placeholder_index]
+            suffix = destination_file_name[random_placeholder_index+1:]
+    
+            file_descriptor, destination_file_path = self._names.claim_file(destination_file_path, prefix, suffix)
+            self._claimed[destination_file_path] = file_descriptor
+        
+        self.timings.record(FilingTimings.FOLDERS_STAGE, time.perf_counter_ns() - start)
+        
+        return destination_file_path
 
-class Directive(object):
-    """Responsible for reading an XML file and determining the destination of a file.
+    def _make_folder(self, folder_path, is_random):
+        """Creates a destination folder and its parents unless it is already known to exist.
+        
+        Folders created during a filing are remembered until the filing ends or a file fails to be filed, so a folder shared by many files is only created 
+        once. Folders inside a random folder are unique to a single file, so they are created but not remembered.
+        
+        :param folder_path: A path. The folder to create.
+        :param is_random: A boolean. 'True' indicates the folder is, or is inside, a random folder.
+        
+        """
+        
+        if folder_path in self._folders:
+            self._count(self.FOLDER_CACHE_HITS_STATISTIC)
+        else:
+            os.makedirs(folder_path, exist_ok=True)
+            self._count(self.FOLDER_CACHE_MISSES_STATISTIC)
+            
+            if not is_random:
+                self._folders.add(folder_path)
     
-    Constructor arguments are as follows:
+    def _start(self, timings=None):
+        """Resets the destination folder cache, the device cache, the statistics, and the timings at the start of a filing.
+        
+        :param timings: Optional :class:`.FilingTimings`. The timings of the filing, if they were started before the filing.
+        
+        """
+        
+        self._folders = set()
+        self._devices = {}
+        self.statistics = collections.Counter()
+        self.timings = FilingTimings() if timings is None else timings
     
-    :param file: A path. The directive definition XML file path. 
+    def _finish(self):
+        """Deletes the sources of the files moved to another device, and closes the deduplication indexes and journals at the end of a filing."""
+        
+        with self._moved_lock:
+            moved = self._moved
+            self._moved = []
+        
+        self._delete_moved(moved)
+        
+        # A file claimed for a random file name is left empty if its source could not be filed.
+        for destination_file_path in list(self._claimed):
+            self._release(destination_file_path)
+        
+        for dedup_index in self._dedup_indexes.values():
+            dedup_index.close()
+        
+        for journal in self._journals.values():
+            journal.close()
+        
+        self._dedup_indexes = {}
+        self._journals = {}
+        self.timings.finish()
     
-    """
+    def _get_journal(self, destination):
+        """Gets the journal of a destination, opening it the first time it is used during a filing.
+        
+        :param destination: A path. The path to a folder where the source will be filed.
+        
+        """
+        
+        journal = self._journals.get(destination)
+        
+        if journal is None:
+            os.makedirs(destination, exist_ok=True)
+            journal = FilingJournal(destination)
+            self._journals[destination] = journal
+        
+        return journal
     
-    # XML    
-    NAMESPACE = 'descatter/filer/schema/1.0'
-    PREFIX = 'ds'
-    XPATH_NAMESPACE = {PREFIX: NAMESPACE}
-    TRUE_ATTRIBUTE_VALUE = 'true'
-    FALSE_ATTRIBUTE_VALUE = 'false'
-            
-    # Tags
-    AUTHOR_TAG = 'author'
-    CONDITIONS_TAG = 'conditions'
-    CONDITION_TAG = 'condition'
-    DATE_TAG = 'date'
-    DATE_TAG_FULL_NAME = "{" + NAMESPACE + "}" + DATE_TAG
-    DESCRIPTION_TAG = 'description'
-    EMAIL_TAG = 'email'
-    FILE_TAG = 'file'
-    FOLDER_TAG = 'folder'
-    GROUP_TAG = 'group'
-    INFO_TAG = 'info'
-    MACRO_TAG = 'macro'
-    MACROS_TAG = 'macros'
-    NAME_TAG = 'name'
-    PATHS_TAG = 'paths'
-    PATH_TAG = 'path'
-    RULES_TAG = 'rules'
-    RULE_TAG = 'rule'
-    TEXT_TAG = 'text'
-    TEXT_TAG_FULL_NAME = "{" + NAMESPACE + "}" + TEXT_TAG
-    TITLE_TAG = 'title'
+    def _iter_changed(self, entries, journal):
+        """Generates the entries of a batch that have changed since they were last filed.
         
-    # Attributes
-    CASE_ATTRIBUTE = 'case'
-    CASE_SENSITIVE_ATTRIBUTE = 'case-sensitive'
-    FORMAT_ATTRIBUTE = 'format'
-    MACRO_ATTRIBUTE = 'macro'
-    MATCH_ATTRIBUTE = 'match'
-    NAME_ATTRIBUTE = 'name'
-    PATH_ATTRIBUTE = 'path'
-    PREFIX_ATTRIBUTE = 'prefix'
-    REPLACE_SPACES_WITH_ATTRIBUTE = 'replace-spaces-with'
-    SUFFIX_ATTRIBUTE = 'suffix'
-    TYPE_ATTRIBUTE = 'type'
-    VALUE_ATTRIBUTE = 'value'
-    VARIABLE_ATTRIBUTE = 'variable'
-    
-    # Conditions match attribute values
-    CONDITIONS_MATCH_ALL = 'all'
-    CONDITIONS_MATCH_ANY = 'any'
-    
-    # Condition type attribute values
-    CONDITION_TYPE_EQUALS = 'equals'
-    CONDITION_TYPE_GREATER_THAN = 'greater-than'
-    CONDITION_TYPE_LESS_THAN = 'less-than' 
-    CONDITION_TYPE_NOT_EQUAL = 'not-equal'
-    CONDITION_TYPE_HAS = 'has' 
-    
-    # Text case attribute values
-    TEXT_CASE_LOWER = 'lower'
-    TEXT_CASE_TITLE = 'title'
-    TEXT_CASE_UPPER = 'upper'
-    
-    # Value wildcards
-    ANY_VALUE_WILDCARD = '*'
-    
-    # '?' is used as a placeholder to define a random file name or random folder name because
-    # it is an illegal character on all operating systems.
-    RANDOM_VALUE_WILDCARD = '?'
-    
-    # Author dictionary keys
-    AUTHOR_NAME_KEY = 'name'
-    AUTHOR_EMAIL_KEY = 'email'
-    
-    # Precompiled XPaths
-    XPATH_TITLE_ELEMENT = etree.XPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + TITLE_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_NAME_ELEMENT = etree.XPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + AUTHOR_TAG + "/" + PREFIX + ":" + NAME_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_EMAIL_ELEMENT = etree.XPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + AUTHOR_TAG + "/" + PREFIX + ":" + EMAIL_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_DESCRIPTION_ELEMENT = etree.XPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + DESCRIPTION_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_RULE_ELEMENTS = etree.XPath("//" + PREFIX + ":" + RULES_TAG + "/" + PREFIX + ":" + RULE_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_CONDITION_ELEMENTS = etree.XPath(PREFIX + ":" + CONDITIONS_TAG + "/" + PREFIX + ":" + CONDITION_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_MATCH_ATTRIBUTE = etree.XPath(PREFIX + ":" + CONDITIONS_TAG + "/@" + MATCH_ATTRIBUTE, namespaces=XPATH_NAMESPACE)
-    XPATH_PATH_ELEMENT = etree.XPath("//" + PREFIX + ":" + PATHS_TAG + "/" + PREFIX + ":" + PATH_TAG + "[@" + NAME_ATTRIBUTE + "=$name]", namespaces=XPATH_NAMESPACE)
-    XPATH_FOLDER_ELEMENTS = etree.XPath(".//" + PREFIX + ":" + FOLDER_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_FILE_ELEMENT = etree.XPath(".//" + PREFIX + ":" + FILE_TAG, namespaces=XPATH_NAMESPACE)
-    XPATH_MACRO_ELEMENT = etree.XPath("//" + PREFIX + ":" + MACROS_TAG + "/" + PREFIX + ":" + MACRO_TAG + "[@" + NAME_ATTRIBUTE + "=$name]", namespaces=XPATH_NAMESPACE)
-    XPATH_TEXT_ELEMENTS = etree.XPath(".//" + PREFIX + ":" + TEXT_TAG, namespaces=XPATH_NAMESPACE)
+        Each entry is examined with at most one 'stat' call, and the 'stat' result is generated in place of an 'os.DirEntry', so it is shared with the
+        filer context.
         
-    def __init__(self, file):
-        """Constructor for the :class:`.Directive`."""
+        :param entries: An iterable. Tuples of a file path and its 'stat' result or 'os.DirEntry'.
+        :param journal: A :class:`.FilingJournal`. The journal of the destination.
         
-        self.file_path = file
-        self._root = etree.parse(self.file_path).getroot()
-    
-    def get_name(self):
-        """Gets the name of this directive."""
+        """
         
-        return self._root.get(self.NAME_ATTRIBUTE)
+        for file_path, file_stat in entries:
+            if isinstance(file_stat, os.DirEntry):
+                try:
+                    file_stat = file_stat.stat()
+                except OSError:
+                    # The file cannot be examined, so it is filed to report the failure.
+                    yield file_path, file_stat
+                    continue
+            
+            if journal.is_unchanged(os.path.abspath(file_path), file_stat):
+                self.statistics[self.UNCHANGED_STATISTIC] += 1
+            else:
+                yield file_path, file_stat
     
-    def get_info(self):
-        """Gets the contents of the 'info' element and returns a dictionary with the keys as the tag names for each child element."""
+    def _record(self, context, destination, filed_path):
+        """Records a filed file in the journal of its destination during an incremental filing.
         
-        info = {}
-        title_element = self.XPATH_TITLE_ELEMENT(self._root)
+        :param context: A dictionary. The filer context of the source.
+        :param destination: A path. The path to the folder where the source was filed.
+        :param filed_path: A path. Where the source was filed.
         
-        if title_element:
-            title_element = title_element[0]
-            info[self.TITLE_TAG] = title_element.text.strip()
-        else:
-            info[self.TITLE_TAG] = None
+        """
         
-        name_element = self.XPATH_NAME_ELEMENT(self._root)
-        email_element = self.XPATH_EMAIL_ELEMENT(self._root)
+        journal = self._journals.get(destination)
         
-        if name_element:
-            name_element = name_element[0]
-            info[self.NAME_TAG] = name_element.text.strip()
-        else:
-            info[self.NAME_TAG] = None
+        if journal is not None:
+            journal.record(context[self.FILE_SOURCE_PATH], context.get_stat(), filed_path)
+    
+    def _get_dedup_index(self, destination):
+        """Gets the deduplication index of a destination, opening it the first time it is used during a filing.
         
-        if email_element:
-            email_element = email_element[0]
-            info[self.EMAIL_TAG] = email_element.text.strip()
-        else:
-            info[self.EMAIL_TAG] = None
+        :param destination: A path. The path to a folder where the source will be filed.
         
-        description_element = self.XPATH_DESCRIPTION_ELEMENT(self._root)
+        """
         
-        if description_element:
-            description_element = description_element[0]
-            info[self.DESCRIPTION_TAG] = description_element.text.strip()
-            format_value = description_element.get(self.FORMAT_ATTRIBUTE)
-            info[self.FORMAT_ATTRIBUTE] = format_value
-        else:
-            info[self.DESCRIPTION_TAG] = None
+        dedup_index = self._dedup_indexes.get(destination)
         
-        return info
+        if dedup_index is None:
+            os.makedirs(destination, exist_ok=True)
+            dedup_index = DedupIndex(destination)
+            self._dedup_indexes[destination] = dedup_index
         
-    def get_destination(self, filer_context):
-        """Determines the destination for a filer context.
+        return dedup_index
+    
+    def _count(self, statistic):
+        """Adds one to a statistic. Can be called on a worker thread.
         
-        :param _filer_context: A dictionary. Contains the variables used within a directive to create rules, folder names, and file names.
-            
-            This is a container for the various variables that can be references by their names within the directive XML file to create rules and text.
-            
-            See also:
-            
-            :ref: `create_context`
+        :param statistic: A String. One of the statistic constants of the :class:`.Filer`.
         
         """
         
-        path_name = None
-        self._filer_context = filer_context
-        
-        for rule_element in self.XPATH_RULE_ELEMENTS(self._root):
-            path_name = self._process_rule(rule_element)
-            
-            if path_name is not None:
-                break
+        with self._statistics_lock:
+            self.statistics[statistic] += 1
+    
+    def _fail(self):
+        """Records a file that could not be filed and forgets the destination folders, because one of them may have been removed."""
         
-        if path_name is None:
-            raise DirectiveError("A path could not be determined")
-        else:
-            return self._process_path(path_name)
+        self._folders.clear()
+        self.statistics[self.FAILED_STATISTIC] += 1
 
-    def _process_rule(self, rule_element):
-        """Processes a rule element.
-        
-        This retrieves the path name if a rule condition is met.
+    def _run_transfer(self, transfer, arguments):
+        """Calls the function that copies or moves a file, recording its time as the 'transfer' stage. Can be called on a worker thread.
         
-        :param rule_element: An etree element. The 'rule' XML node.
+        :param transfer: A function. The copy or move, from :meth:`._begin`.
+        :param arguments: A tuple. The arguments of the function.
         
         """
         
-        path_name = None
-        condition_results = []        
+        start = time.perf_counter_ns()
         
-        for condition_element in self.XPATH_CONDITION_ELEMENTS(rule_element):
-            condition_results.append(self._get_condition_result(condition_element))
+        try:
+            return transfer(*arguments)
+        finally:
+            self.timings.record(FilingTimings.TRANSFER_STAGE, time.perf_counter_ns() - start)
+    
+    def _transfer(self, source_path, destination_file_path, move, same_device=False):
+        """Copies or moves a source to its destination file path.
         
-        match = self.XPATH_MATCH_ATTRIBUTE(rule_element)
+        :param source_path: A path. The absolute path to the source.
+        :param destination_file_path: A path. The destination, from :meth:`._prepare`.
+        :param move: A boolean. 'True' indicates the file is moved. 'False' indicates the source file is copied and not deleted afterwards.
+        :param same_device: Optional boolean. 'True' indicates the source and destination are on the same device, so a moved source is renamed.
         
-        if match:
-            match = match[0].lower()
-        else:
-            raise DirectiveError("The '{}' attribute is missing for the '{}' element".format(self.MATCH_ATTRIBUTE, self.CONDITIONS_TAG))
+        """
         
-        if self._is_match(match, condition_results):
-            path_name = rule_element.get(self.PATH_ATTRIBUTE)
+        if not move:
+            return self._copy(source_path, destination_file_path)
+        
+        if same_device:
+            self._release(destination_file_path)
             
-            if path_name is None:
-                raise DirectiveError("The '{}' attribute is missing for the '{}' element".format(self.PATH_ATTRIBUTE, self.RULE_TAG))
+            try:
+                os.replace(source_path, destination_file_path)
+                
+                return destination_file_path
+            except OSError as error:
+                # Different mounts of the same device cannot be renamed across.
+                if error.errno != errno.EXDEV:
+                    raise
         
-        return path_name
-
-    def _process_path(self, name):
-        """Processes a path element by its name attribute.
+        self._copy(source_path, destination_file_path)
+        self._delete_when_synced(source_path, destination_file_path)
         
-        Retrieves a list of folders and a file name based on a path name.
+        return destination_file_path
+    
+    def _is_same_device(self, source_path, destination):
+        """Determines if a source is on the same device as the destination.
         
-        :param name: A String. The value of the 'name' attribute for the path XML node.
+        The devices of the folder of the source and of the destination are each examined once per filing.
+        
+        :param source_path: A path. The absolute path to the source.
+        :param destination: A path. The path to the folder where the source is filed.
         
         """
         
-        path_element = self.XPATH_PATH_ELEMENT(self._root, name=name)
+        source_device = self._get_device(os.path.dirname(source_path))
         
-        if not path_element:
-            raise DirectiveError("The '{}' path could not be found".format(name))
-        else:
-            path_element = path_element[0]
+        return source_device is not None and source_device == self._get_device(destination)
+    
+    def _get_device(self, folder_path):
+        """Gets the device of a folder, or 'None' if it cannot be examined.
         
-        folder_names = []
-                            
-        for folder_element in self.XPATH_FOLDER_ELEMENTS(path_element):
-            folder_name = self._get_value(folder_element)
-            folder_names.append(folder_name)
-            
-        file_element = self.XPATH_FILE_ELEMENT(path_element, name=path_element.get(self.NAME_ATTRIBUTE))
+        :param folder_path: A path.
         
-        if not file_element:
-            raise DirectiveError("The '{}' element is missing the child '{}' element".format(self.PATH_TAG, self.FILE_TAG))
-        else:
-            return folder_names, self._get_value(file_element[0])
-
-    def _process_macro(self, name):
-        """Processes a macro element by its name attribute.
+        """
         
-        Retrieves text based on a macro node.
+        try:
+            return self._devices[folder_path]
+        except KeyError:
+            pass
         
-        :param name: A String. The value of the 'name' attribute for the macro XML node.
+        try:
+            device = os.stat(folder_path or os.curdir).st_dev
+        except OSError:
+            device = None
         
-        """
+        self._devices[folder_path] = device
+        
+        return device
+    
+    def _delete_when_synced(self, source_path, destination_file_path):
+        """Deletes the source of a file copied to another device once a group of such files has been copied.
         
-        macro_element = self.XPATH_MACRO_ELEMENT(self._root, name=name)
+        :param source_path: A path. The absolute path to the source.
+        :param destination_file_path: A path. The copy of the source.
         
-        if not macro_element:
-            raise DirectiveError("The '{}' macro could not be found".format(name))
-        else:
-            macro_element = macro_element[0]
+        """
         
-        if len(macro_element):
-            text = ''
+        with self._moved_lock:
+            self._moved.append((source_path, destination_file_path))
             
-            for child in macro_element:
-                if child.tag == self.TEXT_TAG_FULL_NAME:
-                    text = text + self._get_text(child)
-                elif child.tag == self.DATE_TAG_FULL_NAME:
-                    text = text + self._get_date_text(child)
-                else:
-                    raise DirectiveError("The '{}' element is unknown as a '{}' element child".format(child.tag, self.MACRO_TAG))
+            if len(self._moved) < self.MOVE_SYNC_SIZE:
+                return
             
-            return text
-        else:
-            raise DirectiveError("The '{}' macro is missing one or more '{}' child elements".format(name, self.TEXT_TAG))
-
-    def _is_match(self, match, results):
-        """Determines if the rule is match and should be used to determine the path.
+            moved = self._moved
+            self._moved = []
         
-        :param match: A String. The match conditions attribute value.
-        :param results: A List. The boolean values of each condition in the rule.
+        self._delete_moved(moved)
+    
+    def _delete_moved(self, moved):
+        """Syncs the copies of moved files to disk and then deletes their sources.
+        
+        A source is kept if its copy cannot be synced.
+        
+        :param moved: A list. Tuples of the source path and the path of its copy.
         
         """
         
-        if match == self.CONDITIONS_MATCH_ALL:
-            return all(results)
-        elif match == self.CONDITIONS_MATCH_ANY:
-            return any(results)
-        else:
-            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.MATCH_ATTRIBUTE, self.CONDITIONS_TAG))
+        if not moved:
+            return
+        
+        start = time.perf_counter_ns()
+        synced = []
+        folder_paths = set()
+        
+        for source_path, destination_file_path in moved:
+            try:
+                sync_path(destination_file_path)
+            except OSError:
+                continue
+            
+            synced.append(source_path)
+            folder_paths.add(os.path.dirname(destination_file_path))
+        
+        # The names of the copies are synced with their folders, where supported.
+        for folder_path in folder_paths:
+            try:
+                sync_path(folder_path)
+            except OSError:
+                pass
+        
+        for source_path in synced:
+            try:
+                os.remove(source_path)
+            except OSError:
+                pass
+        
+        self.timings.record(FilingTimings.SYNC_STAGE, time.perf_counter_ns() - start)
     
-    def _get_condition_result(self, condition_element):
-        """Gets the boolean result from a condition element.
+    def _copy(self, source_path, destination_file_path):
+        """Copies a source to its destination file path with the copy strategy, falling back to the next strategy if it is not available.
         
-        :param condition_element: An etree element. The 'condition' XML node.
+        :param source_path: A path. The absolute path to the source.
+        :param destination_file_path: A path. The destination, from :meth:`._prepare`.
         
         """
         
-        type_value = condition_element.get(self.TYPE_ATTRIBUTE)
-        variable = condition_element.get(self.VARIABLE_ATTRIBUTE)
-        value = condition_element.get(self.VALUE_ATTRIBUTE)
-        case_sensitive = condition_element.get(self.CASE_SENSITIVE_ATTRIBUTE)
-        variable_format = condition_element.get(self.FORMAT_ATTRIBUTE)
+        if self.strategy == self.STRATEGY_LINK:
+            self._release(destination_file_path)
+            
+            try:
+                return link_file(source_path, destination_file_path)
+            except OSError:
+                pass
         
-        if type_value is None:
-            raise DirectiveError("The '{}' attribute is missing from the '{}' tag".format(self.TYPE_ATTRIBUTE, self.CONDITION_TAG))
-        else:
-            type_value = type_value.lower()
+        file_descriptor = self._claimed.pop(destination_file_path, None)
         
-        if variable is None:
-            raise DirectiveError("The '{}' attribute is missing from the '{}' tag".format(self.VARIABLE_ATTRIBUTE, self.CONDITION_TAG))
-        elif variable in self._filer_context:
-            variable = self._filer_context[variable]
-        else:
-            raise DirectiveError("The '{}' value for the '{}' attribute is not a context variable".format(variable, self.VARIABLE_ATTRIBUTE))
-            
-        if value is None:
-            raise DirectiveError("The '{}' attribute is missing from the '{}' tag".format(self.VALUE_ATTRIBUTE, self.CONDITION_TAG))
+        if file_descriptor is None and self.strategy in (self.STRATEGY_COPY, self.STRATEGY_LINK):
+            return shutil.copy2(source_path, destination_file_path)
         
-        if variable_format is None:
-            variable = str(variable)
-        else:
-            variable = variable_format.format(variable)
+        # A claimed file is written through its descriptor, which is closed with the destination file even if the source cannot be opened.
+        with open(destination_file_path if file_descriptor is None else file_descriptor, 'wb') as destination_file, open(source_path, 'rb') as source_file:
+            if self.strategy == self.STRATEGY_REFLINK:
+                copy_functions = (clone_file, kernel_copy_file, send_file)
+            elif self.strategy == self.STRATEGY_KERNEL:
+                copy_functions = (kernel_copy_file, send_file)
+            else:
+                copy_functions = (send_file,)
             
-        if case_sensitive is None:
-            variable = variable.lower()
-            value = value.lower()
-        elif case_sensitive.lower() == self.FALSE_ATTRIBUTE_VALUE:
-            variable = variable.lower()
-            value = value.lower()
-        elif case_sensitive.lower() == self.TRUE_ATTRIBUTE_VALUE:
-            pass
-        else:
-            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.CASE_SENSITIVE_ATTRIBUTE, self.CONDITION_TAG))
-
-        if type_value == self.CONDITION_TYPE_EQUALS:
-            if value == self.ANY_VALUE_WILDCARD:
-                return True
+            for copy_function in copy_functions:
+                try:
+                    copy_function(source_file, destination_file)
+                    break
+                except OSError:
+                    # Anything copied before the failure is copied again.
+                    source_file.seek(0)
+                    destination_file.seek(0)
+                    destination_file.truncate()
             else:
-                return variable == value
-        elif type_value == self.CONDITION_TYPE_GREATER_THAN:
-            return variable > value
-        elif type_value == self.CONDITION_TYPE_LESS_THAN:
-            return variable < value
-        elif type_value == self.CONDITION_TYPE_NOT_EQUAL:
-            return variable != value
-        elif type_value == self.CONDITION_TYPE_HAS:
-            return value in variable
-        else:
-            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.TYPE_ATTRIBUTE, self.CONDITION_TAG))
+                shutil.copyfileobj(source_file, destination_file)
+        
+        shutil.copystat(source_path, destination_file_path)
+        
+        return destination_file_path
     
-    def _get_text(self, text_element):
-        """Gets the formatted text from a text element.
-       
-        :param text_element. An etree element. The 'text' XML node.
+    def _release(self, destination_file_path):
+        """Closes the descriptor of a file claimed for a random file name, if it has not been used.
+        
+        :param destination_file_path: A path. The destination, from :meth:`._prepare`.
         
         """
         
-        text = self._get_value(text_element)
+        file_descriptor = self._claimed.pop(destination_file_path, None)
         
-        # Only format the text if it is non-empty
-        if text:
-            text = self._format_text(text, text_element)
-            
-        return text
+        if file_descriptor is not None:
+            os.close(file_descriptor)
     
-    def _get_date_text(self, date_element):
-        """Gets the formatted date text from a date element.
-       
-        :param date_element: An etree element. A 'date' XML node.
+    def _file_deduplicated(self, dedup_index, source_path, size, destination, destination_folder_names, destination_file_name, move, same_device=False):
+        """Files a source unless it has the same content as a file in the deduplication index, and returns the filed path. Can be called on a worker thread.
         
-        """
+        The index is searched, the source is filed, and the filed file is added to the index while holding the lock of the index for the size of the 
+        source, so when two sources with the same content are filed at once by different workers, the second is found as a duplicate of the first.
         
-        variable_name = date_element.get(self.VARIABLE_ATTRIBUTE) 
-        format_value = date_element.get(self.FORMAT_ATTRIBUTE)
+        :param dedup_index: A :class:`.DedupIndex`. The index of the destination.
+        :param source_path: A path. The absolute path to the source.
+        :param size: An integer. The size of the source in bytes.
+        :param destination: A path. The path to a folder where the source will be filed.
+        :param destination_folder_names: A list. The folder names from the directive.
+        :param destination_file_name: A String. The file name from the directive.
+        :param move: A boolean. 'True' indicates the file is moved. 'False' indicates the source file is copied and not deleted afterwards.
+        :param same_device: Optional boolean. 'True' indicates the source and destination are on the same device, so a moved source is renamed.
         
-        if variable_name is None:
-            raise DirectiveError("The '{}' element is missing the '{}' attribute".format(self.DATE_TAG, self.VARIABLE_ATTRIBUTE))
-        elif format_value is None:
-            raise DirectiveError("The '{}' element is missing the '{}' attribute".format(self.DATE_TAG, self.FORMAT_ATTRIBUTE))
-        else:
-            value = self._get_variable_value(variable_name)
+        """
+        
+        with dedup_index.get_lock(size):
+            existing_path, hashes = dedup_index.find(source_path, size)
             
-            try:
-                formatted_value = format_value.format(value)
+            if existing_path is None:
+                destination_file_path = self._make_destination(destination, destination_folder_names, destination_file_name)
                 
-                if formatted_value == format_value:
-                    raise DirectiveError("The '{}' attribute value for the '{}' element is not a valid format string".format(self.FORMAT_ATTRIBUTE, self.DATE_TAG))
-                else:
-                    return formatted_value 
-            except AttributeError:
-                raise DirectiveError("The '{}' attribute value for the '{}' element is not a date or time".format(self.VARIABLE_ATTRIBUTE, self.DATE_TAG))
-            except ValueError:
-                raise DirectiveError("The '{}' attribute value for the '{}' element is not a valid format string".format(self.FORMAT_ATTRIBUTE, self.DATE_TAG)) 
+                return self._transfer_indexed(dedup_index, source_path, destination_file_path, move, hashes, same_device)
+            
+            self._count(self.DUPLICATES_STATISTIC)
+            
+            if self.dedup == self.DEDUP_SKIP:
+                return self._skip_duplicate(source_path, existing_path, move)
+            
+            destination_file_path = self._make_destination(destination, destination_folder_names, destination_file_name)
+            
+            return self._link_duplicate(dedup_index, source_path, existing_path, destination_file_path, move, hashes)
     
-    def _get_value(self, element):
-        """Gets the value for an element.
-        
-        The value is either the text from the 'value' attribute, the text from the 'variable' attribute, or the text from a 'macro' attribute.
-        The variable text is converted from the filer context based on the name of the variable. The macro text is the output from processing a macro.
+    def _transfer_indexed(self, dedup_index, source_path, destination_file_path, move, hashes, same_device=False):
+        """Copies or moves a source that is not a duplicate and records its content in the deduplication index.
         
-        :param element: An etree element. Any XML that can have a 'value', 'variable', or 'macro' attribute.
+        :param dedup_index: A :class:`.DedupIndex`. The index of the destination.
+        :param source_path: A path. The absolute path to the source.
+        :param destination_file_path: A path. The destination, from :meth:`._prepare`.
+        :param move: A boolean. 'True' indicates the file is moved. 'False' indicates the source file is copied and not deleted afterwards.
+        :param hashes: A tuple. The hashes of the source computed while looking for a duplicate, see :meth:`.DedupIndex.find`.
+        :param same_device: Optional boolean. 'True' indicates the source and destination are on the same device, so a moved source is renamed.
         
         """
         
-        value = element.get(self.VALUE_ATTRIBUTE)
-        variable_name = element.get(self.VARIABLE_ATTRIBUTE)
-        macro_name = element.get(self.MACRO_ATTRIBUTE)
+        filed_path = self._transfer(source_path, destination_file_path, move, same_device)
+        dedup_index.add(filed_path, hashes)
         
-        if value is not None:
-            return value
-        elif variable_name is not None:
-            return self._get_variable_value(variable_name)
-        elif macro_name is not None:
-            return self._process_macro(macro_name)
-        else:
-            raise DirectiveError("The '{}' element is missing either the '{}', '{}', or '{}' attribute".format(element.tag, self.VALUE_ATTRIBUTE, self.VARIABLE_ATTRIBUTE, self.MACRO_ATTRIBUTE))
+        return filed_path
     
-    def _get_variable_value(self, variable_name):
-        """Gets the text from a filer context variable.
+    def _skip_duplicate(self, source_path, existing_path, move):
+        """Files a duplicate by leaving the existing file in place.
         
-        :param variable_name: A String. The name of the variable in the filer context.
+        :param source_path: A path. The absolute path to the source.
+        :param existing_path: A path. The file at the destination with the same content.
+        :param move: A boolean. 'True' indicates the source is deleted.
         
         """
         
-        if variable_name in self._filer_context:
-            return self._filer_context[variable_name]
-        else:
-            raise DirectiveError("The '{}' value for the '{}' attribute is not a context variable".format(variable_name, self.VARIABLE_ATTRIBUTE))
+        if move:
+            os.remove(source_path)
+        
+        return existing_path
     
-    def _format_text(self, text, text_element): 
-        """Formats the text based on the attributes of the text element.
+    def _link_duplicate(self, dedup_index, source_path, existing_path, destination_file_path, move, hashes):
+        """Files a duplicate as a hard link to the existing file.
+        
+        The source is copied or moved instead if a hard link cannot be created, such as when the destination is on a file system without hard links.
         
-        :param text: A String. The text to format.
-        :param text_element: An etree element. The text element.
+        :param dedup_index: A :class:`.DedupIndex`. The index of the destination.
+        :param source_path: A path. The absolute path to the source.
+        :param existing_path: A path. The file at the destination with the same content.
+        :param destination_file_path: A path. The destination, from :meth:`._prepare`.
+        :param move: A boolean. 'True' indicates the source is deleted.
+        :param hashes: A tuple. The hashes of the source, see :meth:`.DedupIndex.find`.
         
         """
         
-        # The order is important in the tuple. The various text formatting attributes will be
-        # applied in the order in the tuple and the prefix and suffix should be applied after
-        # replacing spaces and setting case.
-        format_methods = (self._format_case, self._format_replace_spaces_with, self._format_prefix, self._format_suffix)
+        if os.path.abspath(existing_path) != os.path.abspath(destination_file_path):
+            self._release(destination_file_path)
+            
+            # The destination may be the empty file claimed for a random file name, which is replaced by the link.
+            if os.path.lexists(destination_file_path):
+                os.remove(destination_file_path)
+            
+            try:
+                os.link(existing_path, destination_file_path)
+            except OSError:
+                return self._transfer_indexed(dedup_index, source_path, destination_file_path, move, hashes)
+            
+            dedup_index.add(destination_file_path, hashes)
         
-        for format_method in format_methods:
-            text = format_method(text, text_element)
+        if move:
+            os.remove(source_path)
         
-        return text
+        return destination_file_path
+
+class DedupIndex(object):
+    """A persistent index of the content of the files filed to a destination folder.
+    
+    The index is a SQLite database in the destination folder with the size, modification time, and hashes of every file filed while deduplicating. 
+    Hashing is staged, so a file is only read when another file has the same size: first a partial hash of the start and end of the files is compared, 
+    and only files with the same partial hash are read in full. The hashes of an indexed file are computed the first time they are needed and then 
+    stored, and are computed again if the file has been modified. Indexed files that no longer exist are removed from the index.
+    
+    The index is safe to use from many threads.
+    
+    Constructor arguments are as follows:
+    
+    :param root: A path. The destination folder.
+    
+    """
+    
+    # The name of the database file in the destination folder
+    FILE_NAME = '.descatter-dedup.sqlite'
+    
+    # The number of bytes read from the start and from the end of a file for the partial hash
+    PARTIAL_SIZE = 65536
+    
+    # The number of bytes read at a time for the full hash
+    BLOCK_SIZE = 1048576
     
-    def _format_case(self, text, text_element):
-        """Formats text based on the 'case' attribute.
+    # The number of locks shared by the file sizes, see get_lock
+    LOCK_COUNT = 64
+    
+    def __init__(self, root):
+        """Constructor for the :class:`.DedupIndex`."""
         
-        If the 'case' attribute is not present in the 'text' element, nothing will be formatted.
+        import sqlite3
         
-        :param text: A String. The text to format.
-        :param text_element: An etree element. The 'text' XML node.
+        self.root = root
+        self._lock = threading.Lock()
+        self._size_locks = [threading.Lock() for index in range(self.LOCK_COUNT)]  # @UnusedVariable
+        self._connection = sqlite3.connect(os.path.join(root, self.FILE_NAME), isolation_level=None, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL, partial_hash TEXT, full_hash TEXT)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS files_size ON files (size)")
+    
+    def close(self):
+        """Closes the database."""
         
-        """
-            
-        case = text_element.get(self.CASE_ATTRIBUTE)
+        with self._lock:
+            self._connection.close()
+    
+    def get_lock(self, size):
+        """Gets the lock held while a file of a size is found and then added, so a file filed at the same time with the same content is found.
         
-        if case is None:
-            return text
-        else:
-            case = case.lower()
-            
-        if case == self.TEXT_CASE_LOWER:
-            return text.lower()
-        elif case == self.TEXT_CASE_UPPER:
-            return text.upper()
-        elif case == self.TEXT_CASE_TITLE:
-            return text.title()
-        else:
-            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.CASE_ATTRIBUTE, self.TEXT_TAG))
+        Files with the same size always share a lock, and files with different sizes may share one.
+        
+        :param size: An integer. The size of the file in bytes.
         
-    def _format_replace_spaces_with(self, text, text_element):
-        """Replaces spaces in a text based on the 'replace-spaces-with' attribute of a 'text' element.
+        """
+        
+        return self._size_locks[size % self.LOCK_COUNT]
+    
+    def find(self, source_path, size):
+        """Finds an indexed file with the same content as a source file.
         
-        If the 'replace-spaces-with' attribute is not present in the 'text' element, nothing will be replaced.
+        A tuple of the path to the indexed file, or 'None' if there is no duplicate, and a tuple of the partial and full hash of the source is returned. 
+        A hash of the source is 'None' if it was not needed; pass the hashes to :meth:`.add` so they are not computed again.
         
-        :param text: A String. The text to replace spaces.
-        :param text_element: An etree element. The 'text' XML node.
+        :param source_path: A path. The file to find.
+        :param size: An integer. The size of the source in bytes.
         
         """
+        
+        with self._lock:
+            rows = self._connection.execute("SELECT path, mtime, partial_hash, full_hash FROM files WHERE size = ?", (size,)).fetchall()
+        
+        source_partial_hash = None
+        source_full_hash = None
+        
+        for path, mtime, partial_hash, full_hash in rows:
+            indexed_path = os.path.join(self.root, path)
+            
+            try:
+                indexed_stat = os.stat(indexed_path)
+            except OSError:
+                self._remove(path)
+                continue
             
-        space_replacement = text_element.get(self.REPLACE_SPACES_WITH_ATTRIBUTE)
+            if indexed_stat.st_size != size or indexed_stat.st_mtime_ns != mtime:
+                # The file has been modified since it was indexed.
+                self._update(path, indexed_stat, None, None)
+                
+                if indexed_stat.st_size != size:
+                    continue
+                
+                partial_hash = None
+                full_hash = None
             
-        if space_replacement is None:
-            return text
-        else:
-            return text.replace(' ', space_replacement) 
+            if source_partial_hash is None:
+                source_partial_hash = self._hash(source_path, size, True)
+            
+            if partial_hash is None:
+                partial_hash = self._hash(indexed_path, size, True)
+                self._update(path, indexed_stat, partial_hash, full_hash)
+            
+            if partial_hash != source_partial_hash:
+                continue
+            
+            if size <= 2 * self.PARTIAL_SIZE:
+                # The partial hash of a small file is the hash of all of its content.
+                return indexed_path, (source_partial_hash, source_partial_hash)
+            
+            if source_full_hash is None:
+                source_full_hash = self._hash(source_path, size, False)
+            
+            if full_hash is None:
+                full_hash = self._hash(indexed_path, size, False)
+                self._update(path, indexed_stat, partial_hash, full_hash)
+            
+            if full_hash == source_full_hash:
+                return indexed_path, (source_partial_hash, source_full_hash)
         
-    def _format_prefix(self, text, text_element):
-        """Prefixes text with the 'prefix' attribute value of a 'text' element.
+        return None, (source_partial_hash, source_full_hash)
+    
+    def add(self, file_path, hashes=(None, None)):
+        """Adds a file in the destination folder to the index, replacing any previous entry for the path.
         
-        If the 'prefix' attribute is not present in the 'text' element, nothing will be prefixed.
+        :param file_path: A path. The file to add.
+        :param hashes: Optional tuple. The partial and full hash of the content of the file, if known, from :meth:`.find`.
         
-        :param text: A String. The text to prefix.
-        :param text_element: An etree element. The 'text' XML node.
+        """
+        
+        self._update(os.path.relpath(file_path, self.root), os.stat(file_path), *hashes)
+    
+    def _update(self, path, file_stat, partial_hash, full_hash):
+        """Inserts or replaces the entry of a file.
+        
+        :param path: A path. The path of the file relative to the destination folder.
+        :param file_stat: An 'os.stat_result'. The current metadata of the file.
+        :param partial_hash: A String or 'None'.
+        :param full_hash: A String or 'None'.
         
         """
+        
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO files (path, size, mtime, partial_hash, full_hash) VALUES (?, ?, ?, ?, ?)", 
+                                     (path, file_stat.st_size, file_stat.st_mtime_ns, partial_hash, full_hash))
+    
+    def _remove(self, path):
+        """Removes the entry of a file.
+        
+        :param path: A path. The path of the file relative to the destination folder.
+        
+        """
+        
+        with self._lock:
+            self._connection.execute("DELETE FROM files WHERE path = ?", (path,))
+    
+    def _hash(self, file_path, size, partial):
+        """Hashes the content of a file.
+        
+        :param file_path: A path. The file to hash.
+        :param size: An integer. The size of the file in bytes.
+        :param partial: A boolean. 'True' indicates only the start and end of the file are hashed. All of a small file is always hashed.
+        
+        """
+        
+        file_hash = hashlib.sha256()
+        
+        with open(file_path, 'rb') as file_object:
+            if partial and size > 2 * self.PARTIAL_SIZE:
+                file_hash.update(file_object.read(self.PARTIAL_SIZE))
+                file_object.seek(-self.PARTIAL_SIZE, os.SEEK_END)
+                file_hash.update(file_object.read(self.PARTIAL_SIZE))
+            else:
+                for block in iter(lambda: file_object.read(self.BLOCK_SIZE), b''):
+                    file_hash.update(block)
+        
+        return file_hash.hexdigest()
+
+class FilingJournal(object):
+    """A persistent record of the files filed to a destination folder, used to skip files that have not changed when filing incrementally.
+    
+    The journal is a SQLite database in the destination folder with the path, size, modification time, and inode of every source filed and where it 
+    was filed. The journal is only used from the thread that files a batch.
+    
+    Constructor arguments are as follows:
+    
+    :param root: A path. The destination folder.
+    
+    """
+    
+    # The name of the database file in the destination folder
+    FILE_NAME = '.descatter-journal.sqlite'
+    
+    def __init__(self, root):
+        """Constructor for the :class:`.FilingJournal`."""
+        
+        import sqlite3
+        
+        self.root = root
+        self._connection = sqlite3.connect(os.path.join(root, self.FILE_NAME), isolation_level=None)
+        
+        # Records are only lost on a power failure, and a lost record only causes a file to be filed again.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL, inode INTEGER NOT NULL, destination TEXT NOT NULL)")
+    
+    def close(self):
+        """Closes the database."""
+        
+        self._connection.close()
+    
+    def is_unchanged(self, source_path, file_stat):
+        """Determines if a source has been filed and has not changed since.
+        
+        :param source_path: A path. The absolute path to the source.
+        :param file_stat: An 'os.stat_result'. The current metadata of the source.
+        
+        """
+        
+        row = self._connection.execute("SELECT size, mtime, inode FROM sources WHERE path = ?", (source_path,)).fetchone()
+        
+        return row is not None and row == (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino)
+    
+    def record(self, source_path, file_stat, filed_path):
+        """Records a filed source, replacing any previous record of the source.
+        
+        :param source_path: A path. The absolute path to the source.
+        :param file_stat: An 'os.stat_result'. The metadata of the source when it was filed.
+        :param filed_path: A path. Where the source was filed.
+        
+        """
+        
+        self._connection.execute("INSERT OR REPLACE INTO sources (path, size, mtime, inode, destination) VALUES (?, ?, ?, ?, ?)", 
+                                 (source_path, file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino, os.path.relpath(filed_path, self.root)))
+
+class FilingTimings(object):
+    """The time spent in each stage of a filing, with the number of files and bytes filed.
+    
+    Each stage keeps a count, a total, a maximum, and a histogram of its durations, which are measured with the monotonic 'time.perf_counter_ns' 
+    clock. The histogram has four buckets for every power of two nanoseconds, so a percentile is within 12.5% of the true duration while a stage 
+    needs at most a few hundred counters however many files are filed. Durations can be recorded from several threads.
+    
+    The stages are:
+    
+        'walk'      Finding each file of the source and examining it, if it is not found by scanning a folder.
+        'context'   Creating the filer context of each file. Variables are computed on first use, so they are part of the 'evaluate' stage.
+        'evaluate'  Determining the destination of each file with :meth:`.Directive.get_destination`.
+        'folders'   Creating the destination folders and claiming the random names of each file.
+        'transfer'  Copying, moving, or linking each file.
+        'sync'      Syncing a group of files moved to another device to disk and deleting their sources.
+    
+    """
+    
+    # Stages
+    WALK_STAGE = 'walk'
+    CONTEXT_STAGE = 'context'
+    EVALUATE_STAGE = 'evaluate'
+    FOLDERS_STAGE = 'folders'
+    TRANSFER_STAGE = 'transfer'
+    SYNC_STAGE = 'sync'
+    
+    # The stages in the order they occur for a file
+    STAGES = (WALK_STAGE, CONTEXT_STAGE, EVALUATE_STAGE, FOLDERS_STAGE, TRANSFER_STAGE, SYNC_STAGE)
+    
+    # The number of histogram buckets for every power of two nanoseconds, as a number of bits
+    BUCKET_BITS = 2
+    
+    # The bits of a duration below its highest bit that select its bucket within a power of two
+    _BUCKET_MASK = (1 << BUCKET_BITS) - 1
+    
+    # The indexes of the count, total, maximum, and histogram in the list kept for each stage
+    _COUNT = 0
+    _TOTAL = 1
+    _MAXIMUM = 2
+    _HISTOGRAM = 3
+    
+    def __init__(self):
+        """Constructor for the :class:`.FilingTimings`."""
+        
+        self.files = 0
+        self.bytes = 0
+        self._stages = {stage: [0, 0, 0, {}] for stage in self.STAGES}
+        self._started = time.perf_counter_ns()
+        self._finished = None
+        self._lock = threading.Lock()
+    
+    def record(self, stage, nanoseconds):
+        """Records the duration of a stage for one file, or for one group of files for the 'sync' stage.
+        
+        This is called several times for every file filed, so it is kept to a few operations on a list.
+        
+        :param stage: A String. One of the stage constants of the :class:`.FilingTimings`.
+        :param nanoseconds: An integer.
+        
+        """
+        
+        # The same as :meth:`._get_bucket`, without the cost of a call.
+        bits = self.BUCKET_BITS
+        shift = nanoseconds.bit_length() - bits - 1
+        bucket = nanoseconds if shift <= 0 else ((shift + 1) << bits) + ((nanoseconds >> shift) & self._BUCKET_MASK)
+        timing = self._stages[stage]
+        histogram = timing[self._HISTOGRAM]
+        
+        with self._lock:
+            timing[self._COUNT] += 1
+            timing[self._TOTAL] += nanoseconds
+            histogram[bucket] = histogram.get(bucket, 0) + 1
             
-        prefix = text_element.get(self.PREFIX_ATTRIBUTE)
+            if nanoseconds > timing[self._MAXIMUM]:
+                timing[self._MAXIMUM] = nanoseconds
+    
+    def add_file(self, size):
+        """Records a filed file.
+        
+        :param size: An integer. The size of the file in bytes.
+        
+        """
+        
+        with self._lock:
+            self.files = self.files + 1
+            self.bytes = self.bytes + size
+    
+    def finish(self):
+        """Stops the elapsed time of the filing."""
+        
+        self._finished = time.perf_counter_ns()
+    
+    def get_elapsed(self):
+        """Gets the seconds from the start of the filing to its end, or to now if it has not ended."""
+        
+        finished = time.perf_counter_ns() if self._finished is None else self._finished
+        
+        return (finished - self._started) / 1e9
+    
+    def get_count(self, stage):
+        """Gets the number of durations recorded for a stage.
+        
+        :param stage: A String. One of the stage constants.
+        
+        """
+        
+        return self._stages[stage][self._COUNT]
+    
+    def get_total(self, stage):
+        """Gets the total seconds recorded for a stage.
+        
+        :param stage: A String. One of the stage constants.
+        
+        """
+        
+        return self._stages[stage][self._TOTAL] / 1e9
+    
+    def get_maximum(self, stage):
+        """Gets the longest duration recorded for a stage in seconds.
+        
+        :param stage: A String. One of the stage constants.
+        
+        """
+        
+        return self._stages[stage][self._MAXIMUM] / 1e9
+    
+    def get_percentile(self, stage, percent):
+        """Gets a percentile of the durations recorded for a stage in seconds, or 'None' if none were recorded.
+        
+        The middle of the histogram bucket holding the percentile is returned, but never more than the maximum.
+        
+        :param stage: A String. One of the stage constants.
+        :param percent: A number. The percentile, from 0 to 100.
+        
+        """
+        
+        timing = self._stages[stage]
+        
+        with self._lock:
+            count = timing[self._COUNT]
+            histogram = sorted(timing[self._HISTOGRAM].items())
+            maximum = timing[self._MAXIMUM]
+        
+        if count == 0:
+            return None
+        
+        rank = max(1, -(-count * percent // 100))
+        seen = 0
+        
+        for bucket, bucket_count in histogram:
+            seen = seen + bucket_count
             
-        if prefix is None:
-            return text
-        else:
-            return prefix + text
+            if seen >= rank:
+                break
+        
+        low = self._get_bucket_start(bucket)
+        high = self._get_bucket_start(bucket + 1)
+        
+        return min(maximum, (low + high) // 2) / 1e9
     
-    def _format_suffix(self, text, text_element):
-        """Suffixes text with the 'suffix' attribute value of a 'text' element.
+    def get_files_per_second(self):
+        """Gets the number of files filed per second of elapsed time."""
         
-        If the 'suffix' attribute is not present in the 'text' element, nothing will be suffixed.
+        elapsed = self.get_elapsed()
         
-        :param text: A String. The text to suffix.
-        :param text_element: An etree element. The 'text' XML node.
+        return self.files / elapsed if elapsed > 0 else 0.0
+    
+    def get_bytes_per_second(self):
+        """Gets the number of bytes filed per second of elapsed time."""
+        
+        elapsed = self.get_elapsed()
+        
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+    
+    def to_dict(self):
+        """Gets the timings as a dictionary of plain values, such as for a metrics exporter or JSON.
+        
+        Times are in seconds. Each stage has its 'count', 'total', 'p50', 'p99', 'max', and 'histogram', which is a list of pairs of the upper bound 
+        of a bucket in seconds and the number of durations in it. Stages with no durations are left out.
         
         """
+        
+        stages = {}
+        
+        for stage in self.STAGES:
+            if not self.get_count(stage):
+                continue
             
-        suffix = text_element.get(self.SUFFIX_ATTRIBUTE)
+            with self._lock:
+                histogram = sorted(self._stages[stage][self._HISTOGRAM].items())
             
-        if suffix is None:
-            return text
-        else:
-            return text + suffix
\ No newline at end of file
+            stages[stage] = {'count': self.get_count(stage),
+                             'total': self.get_total(stage),
+                             'p50': self.get_percentile(stage, 50),
+                             'p99': self.get_percentile(stage, 99),
+                             'max': self.get_maximum(stage),
+                             'histogram': [(self._get_bucket_start(bucket + 1) / 1e9, bucket_count) for bucket, bucket_count in histogram]}
+        
+        return {'elapsed': self.get_elapsed(),
+                'files': self.files,
+                'bytes': self.bytes,
+                'files_per_second': self.get_files_per_second(),
+                'bytes_per_second': self.get_bytes_per_second(),
+                'stages': stages}
+    
+    @classmethod
+    def _get_bucket(cls, nanoseconds):
+        """Gets the histogram bucket of a duration.
+        
+        :param nanoseconds: An integer.
+        
+        """
+        
+        shift = nanoseconds.bit_length() - cls.BUCKET_BITS - 1
+        
+        if shift <= 0:
+            return nanoseconds
+        
+        return ((shift + 1) << cls.BUCKET_BITS) + ((nanoseconds >> shift) & cls._BUCKET_MASK)
+    
+    def _get_bucket_start(self, bucket):
+        """Gets the shortest duration in nanoseconds in a histogram bucket.
+        
+        :param bucket: An integer.
+        
+        """
+        
+        if bucket < 2 << self.BUCKET_BITS:
+            return bucket
+        
+        shift = (bucket >> self.BUCKET_BITS) - 1
+        
+        return ((1 << self.BUCKET_BITS) + (bucket & self._BUCKET_MASK)) << shift
+
+class RandomNames(object):
+    """Claims unique random names for the folders and files that replace the '?' placeholder of a directive.
+
+    A name is a short random ID from a generator seeded once per process, and is claimed with a single 'os.mkdir', or 'os.open' with 'O_EXCL', that 
+    fails if the name is taken, in which case another ID is tried. Unlike 'tempfile.mkstemp', the descriptor of a claimed file is returned open for 
+    writing, so the file can be filled without opening it again. As with 'tempfile', claimed folders and files are only accessible by their owner.
+
+    """
+
+    # The number of names tried before giving up
+    ATTEMPTS = 100
+
+    # The bytes of randomness in a name, which are encoded as eight characters
+    ID_SIZE = 5
+
+    # The flags a claimed file is opened with
+    FILE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0)
+
+    def __init__(self):
+        """Constructor for the :class:`.RandomNames`."""
+
+        self._random = None
+        self._pid = None
+
+    def claim_folder(self, folder_path, prefix='', suffix=''):
+        """Creates a folder with a unique random name and returns its path.
+
+        :param folder_path: A path. The folder in which the folder is created.
+        :param prefix: Optional string. The text before the random ID.
+        :param suffix: Optional string. The text after the random ID.
+
+        """
+
+        for attempt in range(self.ATTEMPTS):  # @UnusedVariable
+            path = os.path.join(folder_path, prefix + self.get_id() + suffix)
+
+            try:
+                os.mkdir(path, 0o700)
+            except FileExistsError:
+                continue
+
+            return path
+
+        raise FileExistsError(errno.EEXIST, "No unique random folder name is available", folder_path)
+
+    def claim_file(self, folder_path, prefix='', suffix=''):
+        """Creates a file with a unique random name and returns a tuple of its descriptor, open for writing, and its path.
+
+        :param folder_path: A path. The folder in which the file is created.
+        :param prefix: Optional string. The text before the random ID.
+        :param suffix: Optional string. The text after the random ID.
+
+        """
+
+        for attempt in range(self.ATTEMPTS):  # @UnusedVariable
+            path = os.path.join(folder_path, prefix + self.get_id() + suffix)
+
+            try:
+                return os.open(path, self.FILE_FLAGS, 0o600), path
+            except FileExistsError:
+                continue
+
+        raise FileExistsError(errno.EEXIST, "No unique random file name is available", folder_path)
+
+    def get_id(self):
+        """Generates a random ID of eight lowercase letters and digits."""
+
+        # The generator is seeded again in a forked process, so parent and child generate different IDs.
+        if self._pid != os.getpid():
+            self._random = random.Random()
+            self._pid = os.getpid()
+
+        return base64.b32encode(self._random.getrandbits(self.ID_SIZE * 8).to_bytes(self.ID_SIZE, 'big')).decode('ascii').lower()
+
+class FilerContext(collections.abc.Mapping):
+    """The variables of a file that a directive uses to determine its destination.
+    
+    Each variable is computed the first time it is accessed and then cached, so work is only done for the variables a directive uses. 
+    The file metadata is retrieved with a single 'stat' call the first time a date or size variable is accessed; none is retrieved if the directive 
+    only uses the name, extension, or path of a file. Use :meth:`.Directive.get_variables` to determine the variables a directive can use.
+    
+    Constructor arguments are as follows:
+    
+    :param source: A path. The path to the file.
+    :param index: Optional integer. The file index, or number, within a batch operation.
+    :param count: Optional integer. The total number of files within a batch operation.
+    :param file_stat: Optional 'os.stat_result' or 'os.DirEntry'. The metadata of the file, if already known.
+    
+    """
+    
+    def __init__(self, source, index=1, count=1, file_stat=None):
+        """Constructor for the :class:`.FilerContext`."""
+        
+        self.source = source
+        self.index = index
+        self.count = count
+        self._file_stat = file_stat
+        self._variables = {}
+    
+    def __getitem__(self, name):
+        """Gets a variable by name, computing it on first access."""
+        
+        try:
+            return self._variables[name]
+        except KeyError:
+            pass
+        
+        try:
+            get_variable = self._VARIABLE_GETTERS[name]
+        except KeyError:
+            raise KeyError(name)
+        
+        value = get_variable(self)
+        self._variables[name] = value
+        
+        return value
+    
+    def __setitem__(self, name, value):
+        
+        self._variables[name] = value
+    
+    def __iter__(self):
+        
+        return iter(self._VARIABLE_GETTERS)
+    
+    def __len__(self):
+        
+        return len(self._VARIABLE_GETTERS)
+    
+    def __contains__(self, name):
+        
+        return name in self._VARIABLE_GETTERS or name in self._variables
+    
+    def get_stat(self):
+        """Gets the 'os.stat_result' of the file, which is retrieved only once."""
+        
+        if self._file_stat is None:
+            self._file_stat = os.stat(self.source)
+        elif isinstance(self._file_stat, os.DirEntry):
+            self._file_stat = self._file_stat.stat()
+        
+        return self._file_stat
+    
+    def _get_current_datetime(self):
+        
+        return datetime.now()
+    
+    def _get_file_count(self):
+        
+        return self.count
+    
+    def _get_file_extension(self):
+        
+        return os.path.splitext(self.source)[1][1:].strip().lower()
+    
+    def _get_file_date_accessed(self):
+        
+        return datetime.fromtimestamp(self.get_stat().st_atime)
+    
+    def _get_file_date_created(self):
+        
+        return datetime.fromtimestamp(self.get_stat().st_ctime)
+    
+    def _get_file_date_modified(self):
+        
+        return datetime.fromtimestamp(self.get_stat().st_mtime)
+    
+    def _get_file_index(self):
+        
+        return self.index
+    
+    def _get_file_name(self):
+        
+        return os.path.basename(os.path.splitext(self.source)[0])
+    
+    def _get_file_path(self):
+        
+        return os.path.dirname(self.source)
+    
+    def _get_file_size(self):
+        
+        return self.get_stat().st_size
+    
+    def _get_file_source_path(self):
+        
+        return os.path.abspath(self.source)
+    
+    _VARIABLE_GETTERS = {Filer.CURRENT_DATETIME: _get_current_datetime,
+                         Filer.FILE_COUNT: _get_file_count,
+                         Filer.FILE_EXTENSION: _get_file_extension,
+                         Filer.FILE_DATE_ACCESSED: _get_file_date_accessed,
+                         Filer.FILE_DATE_CREATED: _get_file_date_created,
+                         Filer.FILE_DATE_MODIFIED: _get_file_date_modified,
+                         Filer.FILE_INDEX: _get_file_index,
+                         Filer.FILE_NAME: _get_file_name,
+                         Filer.FILE_PATH: _get_file_path,
+                         Filer.FILE_SIZE: _get_file_size,
+                         Filer.FILE_SOURCE_PATH: _get_file_source_path}
+
+class DeferredXPath(object):
+    """An XPath expression that is compiled with 'lxml' when it is first evaluated, so 'lxml' is only imported once a directive is parsed.
+
+    Constructor arguments are as follows:
+
+    :param path: A String. The XPath expression.
+    :param namespaces: Optional dictionary. The namespace prefixes used in the expression.
+
+    """
+
+    def __init__(self, path, namespaces=None):
+        """Constructor for the :class:`.DeferredXPath`."""
+
+        self.path = path
+        self.namespaces = namespaces
+        self._xpath = None
+
+    def __call__(self, element, **variables):
+        """Evaluates the expression, as an 'etree.XPath' does.
+
+        :param element: An etree element. The context node.
+        :param variables: Optional. The values of the variables in the expression.
+
+        """
+
+        if self._xpath is None:
+            from lxml import etree
+
+            self._xpath = etree.XPath(self.path, namespaces=self.namespaces)
+
+        return self._xpath(element, **variables)
+
+class Directive(object):
+    """Responsible for reading an XML file and determining the destination of a file.
+    
+    A directive is safe to share between threads. The filer context is passed explicitly to every evaluation and the compiled program is never 
+    modified after it is created, so :meth:`.get_destination` can be called concurrently for different files.
+    
+    Constructor arguments are as follows:
+    
+    :param file: A path. The directive definition XML file path. 
+    
+    """
+    
+    # XML    
+    NAMESPACE = 'descatter/filer/schema/1.0'
+    PREFIX = 'ds'
+    XPATH_NAMESPACE = {PREFIX: NAMESPACE}
+    TRUE_ATTRIBUTE_VALUE = 'true'
+    FALSE_ATTRIBUTE_VALUE = 'false'
+            
+    # Tags
+    AUTHOR_TAG = 'author'
+    CONDITIONS_TAG = 'conditions'
+    CONDITION_TAG = 'condition'
+    DATE_TAG = 'date'
+    DATE_TAG_FULL_NAME = "{" + NAMESPACE + "}" + DATE_TAG
+    DESCRIPTION_TAG = 'description'
+    EMAIL_TAG = 'email'
+    FILE_TAG = 'file'
+    FOLDER_TAG = 'folder'
+    GROUP_TAG = 'group'
+    INFO_TAG = 'info'
+    MACRO_TAG = 'macro'
+    MACROS_TAG = 'macros'
+    NAME_TAG = 'name'
+    PATHS_TAG = 'paths'
+    PATH_TAG = 'path'
+    RULES_TAG = 'rules'
+    RULE_TAG = 'rule'
+    TEXT_TAG = 'text'
+    TEXT_TAG_FULL_NAME = "{" + NAMESPACE + "}" + TEXT_TAG
+    TITLE_TAG = 'title'
+        
+    # Attributes
+    CASE_ATTRIBUTE = 'case'
+    CASE_SENSITIVE_ATTRIBUTE = 'case-sensitive'
+    FORMAT_ATTRIBUTE = 'format'
+    MACRO_ATTRIBUTE = 'macro'
+    MATCH_ATTRIBUTE = 'match'
+    NAME_ATTRIBUTE = 'name'
+    PATH_ATTRIBUTE = 'path'
+    PREFIX_ATTRIBUTE = 'prefix'
+    REPLACE_SPACES_WITH_ATTRIBUTE = 'replace-spaces-with'
+    SUFFIX_ATTRIBUTE = 'suffix'
+    TYPE_ATTRIBUTE = 'type'
+    VALUE_ATTRIBUTE = 'value'
+    VARIABLE_ATTRIBUTE = 'variable'
+    
+    # Conditions match attribute values
+    CONDITIONS_MATCH_ALL = 'all'
+    CONDITIONS_MATCH_ANY = 'any'
+    
+    # Condition type attribute values
+    CONDITION_TYPE_EQUALS = 'equals'
+    CONDITION_TYPE_GREATER_THAN = 'greater-than'
+    CONDITION_TYPE_LESS_THAN = 'less-than' 
+    CONDITION_TYPE_NOT_EQUAL = 'not-equal'
+    CONDITION_TYPE_HAS = 'has' 
+    CONDITION_TYPE_MATCHES = 'matches'
+    CONDITION_TYPE_GLOB = 'glob'
+    
+    # Text case attribute values
+    TEXT_CASE_LOWER = 'lower'
+    TEXT_CASE_TITLE = 'title'
+    TEXT_CASE_UPPER = 'upper'
+    
+    # Value wildcards
+    ANY_VALUE_WILDCARD = '*'
+    
+    # '?' is used as a placeholder to define a random file name or random folder name because
+    # it is an illegal character on all operating systems.
+    RANDOM_VALUE_WILDCARD = '?'
+    
+    # Author dictionary keys
+    AUTHOR_NAME_KEY = 'name'
+    AUTHOR_EMAIL_KEY = 'email'
+    
+    # Precompiled XPaths
+    XPATH_TITLE_ELEMENT = DeferredXPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + TITLE_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_NAME_ELEMENT = DeferredXPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + AUTHOR_TAG + "/" + PREFIX + ":" + NAME_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_EMAIL_ELEMENT = DeferredXPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + AUTHOR_TAG + "/" + PREFIX + ":" + EMAIL_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_DESCRIPTION_ELEMENT = DeferredXPath(PREFIX + ":" + INFO_TAG + "/" + PREFIX + ":" + DESCRIPTION_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_RULE_ELEMENTS = DeferredXPath("//" + PREFIX + ":" + RULES_TAG + "/" + PREFIX + ":" + RULE_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_CONDITION_ELEMENTS = DeferredXPath(PREFIX + ":" + CONDITIONS_TAG + "/" + PREFIX + ":" + CONDITION_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_MATCH_ATTRIBUTE = DeferredXPath(PREFIX + ":" + CONDITIONS_TAG + "/@" + MATCH_ATTRIBUTE, namespaces=XPATH_NAMESPACE)
+    XPATH_PATH_ELEMENT = DeferredXPath("//" + PREFIX + ":" + PATHS_TAG + "/" + PREFIX + ":" + PATH_TAG + "[@" + NAME_ATTRIBUTE + "=$name]", namespaces=XPATH_NAMESPACE)
+    XPATH_FOLDER_ELEMENTS = DeferredXPath(".//" + PREFIX + ":" + FOLDER_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_FILE_ELEMENT = DeferredXPath(".//" + PREFIX + ":" + FILE_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_MACRO_ELEMENTS = DeferredXPath("//" + PREFIX + ":" + MACROS_TAG + "/" + PREFIX + ":" + MACRO_TAG, namespaces=XPATH_NAMESPACE)
+    XPATH_TEXT_ELEMENTS = DeferredXPath(".//" + PREFIX + ":" + TEXT_TAG, namespaces=XPATH_NAMESPACE)
+        
+    def __init__(self, file):
+        """Constructor for the :class:`.Directive`."""
+        
+        from lxml import etree
+        
+        self.file_path = file
+        self._xml_root = etree.parse(self.file_path).getroot()
+        self._name = self._xml_root.get(self.NAME_ATTRIBUTE)
+        self._program = None
+        self._compiled_paths = {}
+        self._compiled_macros = {}
+        self._compiling_macros = set()
+        self._macro_elements = None
+        self._compile_lock = threading.RLock()
+    
+    @classmethod
+    def from_program(cls, file, name, program):
+        """Creates a directive from a program compiled earlier, without parsing the XML file.
+        
+        The file is only parsed if the XML itself is needed, such as by :meth:`.get_info`. See :class:`.CompiledDirectiveCache`.
+        
+        :param file: A path. The directive definition XML file path.
+        :param name: A String. The name of the directive.
+        :param program: A :class:`.Program`. The compiled directive.
+        
+        """
+        
+        directive = cls.__new__(cls)
+        directive.file_path = file
+        directive._xml_root = None
+        directive._name = name
+        directive._program = program
+        directive._compiled_paths = {}
+        directive._compiled_macros = {}
+        directive._compiling_macros = set()
+        directive._macro_elements = None
+        directive._compile_lock = threading.RLock()
+        
+        return directive
+    
+    @property
+    def _root(self):
+        """The root element of the XML file, which is parsed on first use by a directive created with :meth:`.from_program`."""
+        
+        if self._xml_root is None:
+            from lxml import etree
+            
+            self._xml_root = etree.parse(self.file_path).getroot()
+        
+        return self._xml_root
+    
+    def get_name(self):
+        """Gets the name of this directive."""
+        
+        return self._name
+    
+    def get_info(self):
+        """Gets the contents of the 'info' element and returns a dictionary with the keys as the tag names for each child element."""
+        
+        info = {}
+        title_element = self.XPATH_TITLE_ELEMENT(self._root)
+        
+        if title_element:
+            title_element = title_element[0]
+            info[self.TITLE_TAG] = title_element.text.strip()
+        else:
+            info[self.TITLE_TAG] = None
+        
+        name_element = self.XPATH_NAME_ELEMENT(self._root)
+        email_element = self.XPATH_EMAIL_ELEMENT(self._root)
+        
+        if name_element:
+            name_element = name_element[0]
+            info[self.NAME_TAG] = name_element.text.strip()
+        else:
+            info[self.NAME_TAG] = None
+        
+        if email_element:
+            email_element = email_element[0]
+            info[self.EMAIL_TAG] = email_element.text.strip()
+        else:
+            info[self.EMAIL_TAG] = None
+        
+        description_element = self.XPATH_DESCRIPTION_ELEMENT(self._root)
+        
+        if description_element:
+            description_element = description_element[0]
+            info[self.DESCRIPTION_TAG] = description_element.text.strip()
+            format_value = description_element.get(self.FORMAT_ATTRIBUTE)
+            info[self.FORMAT_ATTRIBUTE] = format_value
+        else:
+            info[self.DESCRIPTION_TAG] = None
+        
+        return info
+        
+    def compile(self):
+        """Compiles the directive into a :class:`.Program`.
+
+        The XML is walked only once. Every rule, the path each rule references, and the macros those paths reference are converted to plain Python objects
+        with all of their attributes validated, so a malformed directive raises a :class:`.DirectiveError` before any file is evaluated. The program is cached
+        and returned on subsequent calls.
+
+        """
+
+        program = self._program
+
+        if program is None:
+            with self._compile_lock:
+                if self._program is None:
+                    rules = []
+
+                    for rule_element in self.XPATH_RULE_ELEMENTS(self._root):
+                        rule = self._compile_rule(rule_element)
+                        rules.append((rule, self._compile_path(rule.path_name)))
+
+                    self._program = Program(rules)
+
+                program = self._program
+
+        return program
+
+    def get_destination(self, filer_context):
+        """Determines the destination for a filer context.
+
+        :param filer_context: A dictionary. Contains the variables used within a directive to create rules, folder names, and file names.
+
+            This is a container for the various variables that can be references by their names within the directive XML file to create rules and text.
+
+            See also:
+
+            :ref: `create_context`
+
+        """
+
+        return self.compile().get_destination(filer_context)
+
+    def get_destinations(self, filer_contexts):
+        """Determines the destinations for many filer contexts in one pass.
+
+        Rule selection and path evaluation are shared between filer contexts with the same variables. See :meth:`.Program.get_destinations`.
+
+        :param filer_contexts: An iterable of dictionaries. The filer contexts.
+
+        """
+
+        return self.compile().get_destinations(filer_contexts)
+
+    def plan(self, filer_contexts):
+        """Determines the name of the matching rule and the destination for many filer contexts in one pass.
+
+        A tuple of the rule name, the folder names, and the file name is generated for each filer context. See :meth:`.Program.plan`.
+
+        :param filer_contexts: An iterable of dictionaries. The filer contexts.
+
+        """
+
+        return self.compile().plan(filer_contexts)
+
+    def get_variables(self):
+        """Gets the names of the filer context variables the directive can use to determine a destination.
+
+        The variables used by every condition, path, and macro that can be evaluated are included, so a filer context variable that is not in this set
+        is never used by the directive.
+
+        """
+
+        return self.compile().variables
+
+    def _process_rule(self, rule_element, filer_context):
+        """Processes a rule element.
+
+        This retrieves the path name if a rule condition is met.
+
+        :param rule_element: An etree element. The 'rule' XML node.
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        with self._compile_lock:
+            rule = self._compile_rule(rule_element)
+
+        return rule.evaluate(filer_context)
+
+    def _process_path(self, name, filer_context):
+        """Processes a path element by its name attribute.
+
+        Retrieves a list of folders and a file name based on a path name.
+
+        :param name: A String. The value of the 'name' attribute for the path XML node.
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        with self._compile_lock:
+            path = self._compile_path(name)
+
+        return path.evaluate(filer_context)
+
+    def _process_macro(self, name, filer_context):
+        """Processes a macro element by its name attribute.
+
+        Retrieves text based on a macro node.
+
+        :param name: A String. The value of the 'name' attribute for the macro XML node.
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        with self._compile_lock:
+            macro = self._compile_macro(name)
+
+        return macro.evaluate(filer_context)
+
+    def _get_condition_result(self, condition_element, filer_context):
+        """Gets the boolean result from a condition element.
+
+        :param condition_element: An etree element. The 'condition' XML node.
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        with self._compile_lock:
+            condition = self._compile_condition(condition_element)
+
+        return condition.evaluate(filer_context)
+
+    def _compile_rule(self, rule_element):
+        """Compiles a rule element.
+
+        :param rule_element: An etree element. The 'rule' XML node.
+
+        """
+
+        conditions = []
+
+        for condition_element in self.XPATH_CONDITION_ELEMENTS(rule_element):
+            conditions.append(self._compile_condition(condition_element))
+
+        match = self.XPATH_MATCH_ATTRIBUTE(rule_element)
+
+        if match:
+            match = match[0].lower()
+        else:
+            raise DirectiveError("The '{}' attribute is missing for the '{}' element".format(self.MATCH_ATTRIBUTE, self.CONDITIONS_TAG))
+
+        if match == self.CONDITIONS_MATCH_ALL:
+            match_function = all
+        elif match == self.CONDITIONS_MATCH_ANY:
+            match_function = any
+        else:
+            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.MATCH_ATTRIBUTE, self.CONDITIONS_TAG))
+
+        path_name = rule_element.get(self.PATH_ATTRIBUTE)
+
+        if path_name is None:
+            raise DirectiveError("The '{}' attribute is missing for the '{}' element".format(self.PATH_ATTRIBUTE, self.RULE_TAG))
+
+        return Rule(rule_element.get(self.NAME_ATTRIBUTE), conditions, match_function, path_name)
+
+    def _compile_condition(self, condition_element):
+        """Compiles a condition element.
+
+        :param condition_element: An etree element. The 'condition' XML node.
+
+        """
+
+        type_value = condition_element.get(self.TYPE_ATTRIBUTE)
+        variable_name = condition_element.get(self.VARIABLE_ATTRIBUTE)
+        value = condition_element.get(self.VALUE_ATTRIBUTE)
+        case_sensitive = condition_element.get(self.CASE_SENSITIVE_ATTRIBUTE)
+        variable_format = condition_element.get(self.FORMAT_ATTRIBUTE)
+
+        if type_value is None:
+            raise DirectiveError("The '{}' attribute is missing from the '{}' tag".format(self.TYPE_ATTRIBUTE, self.CONDITION_TAG))
+        else:
+            type_value = type_value.lower()
+
+        if variable_name is None:
+            raise DirectiveError("The '{}' attribute is missing from the '{}' tag".format(self.VARIABLE_ATTRIBUTE, self.CONDITION_TAG))
+
+        if value is None:
+            raise DirectiveError("The '{}' attribute is missing from the '{}' tag".format(self.VALUE_ATTRIBUTE, self.CONDITION_TAG))
+
+        raw_value = value
+
+        if case_sensitive is None or case_sensitive.lower() == self.FALSE_ATTRIBUTE_VALUE:
+            case_sensitive = False
+            value = value.lower()
+        elif case_sensitive.lower() == self.TRUE_ATTRIBUTE_VALUE:
+            case_sensitive = True
+        else:
+            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.CASE_SENSITIVE_ATTRIBUTE, self.CONDITION_TAG))
+
+        if type_value == self.CONDITION_TYPE_EQUALS:
+            if value == self.ANY_VALUE_WILDCARD:
+                comparison = None
+            else:
+                comparison = operator.eq
+        elif type_value == self.CONDITION_TYPE_GREATER_THAN:
+            comparison = operator.gt
+        elif type_value == self.CONDITION_TYPE_LESS_THAN:
+            comparison = operator.lt
+        elif type_value == self.CONDITION_TYPE_NOT_EQUAL:
+            comparison = operator.ne
+        elif type_value == self.CONDITION_TYPE_HAS:
+            comparison = operator.contains
+        elif type_value == self.CONDITION_TYPE_MATCHES or type_value == self.CONDITION_TYPE_GLOB:
+            comparison = match_pattern
+
+            if type_value == self.CONDITION_TYPE_MATCHES:
+                # The lazy prefix lets the expression match anywhere in the text, like 're.search', while still matching from the start.
+                pattern = r"[\s\S]*?(?:" + raw_value + ")"
+            else:
+                pattern = translate_glob(raw_value)
+
+            try:
+                value = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+            except re.error as error:
+                raise DirectiveError("The '{}' attribute value for the '{}' tag is not a valid pattern: {}".format(self.VALUE_ATTRIBUTE, self.CONDITION_TAG, error))
+        else:
+            raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.TYPE_ATTRIBUTE, self.CONDITION_TAG))
+
+        variable_type = None
+        native_value = None
+
+        # A number, size, or date variable is compared as its own type, unless it is formatted as text or tested for containing text.
+        if comparison in (operator.eq, operator.gt, operator.lt, operator.ne) and variable_format is None and variable_name in Condition.VARIABLE_TYPES:
+            variable_type = Condition.VARIABLE_TYPES[variable_name]
+
+            try:
+                native_value = variable_type[1](raw_value)
+            except ValueError:
+                raise DirectiveError("The '{}' attribute value for the '{}' tag is not a valid {} for the '{}' variable".format(self.VALUE_ATTRIBUTE, self.CONDITION_TAG, variable_type[2], variable_name))
+
+        return Condition(variable_name, comparison, value, case_sensitive, variable_format, variable_type, native_value)
+
+    def _compile_path(self, name):
+        """Compiles a path element by its name attribute.
+
+        :param name: A String. The value of the 'name' attribute for the path XML node.
+
+        """
+
+        if name in self._compiled_paths:
+            return self._compiled_paths[name]
+
+        path_element = self.XPATH_PATH_ELEMENT(self._root, name=name)
+
+        if not path_element:
+            raise DirectiveError("The '{}' path could not be found".format(name))
+        else:
+            path_element = path_element[0]
+
+        folders = []
+
+        for folder_element in self.XPATH_FOLDER_ELEMENTS(path_element):
+            folders.append(self._compile_value(folder_element))
+
+        file_element = self.XPATH_FILE_ELEMENT(path_element)
+
+        if not file_element:
+            raise DirectiveError("The '{}' element is missing the child '{}' element".format(self.PATH_TAG, self.FILE_TAG))
+
+        path = Path(name, folders, self._compile_value(file_element[0]))
+        self._compiled_paths[name] = path
+
+        return path
+
+    def _compile_macro(self, name):
+        """Compiles a macro element by its name attribute.
+
+        Macros are compiled once and shared by every path, text, or macro that references them.
+
+        :param name: A String. The value of the 'name' attribute for the macro XML node.
+
+        """
+
+        if name in self._compiled_macros:
+            return self._compiled_macros[name]
+
+        if name in self._compiling_macros:
+            raise DirectiveError("The '{}' macro references itself".format(name))
+
+        if self._macro_elements is None:
+            # The macros are indexed by name with a single search of the document. The first macro with a name is used.
+            self._macro_elements = {}
+
+            for macro_element in self.XPATH_MACRO_ELEMENTS(self._root):
+                self._macro_elements.setdefault(macro_element.get(self.NAME_ATTRIBUTE), macro_element)
+
+        macro_element = self._macro_elements.get(name)
+
+        if macro_element is None:
+            raise DirectiveError("The '{}' macro could not be found".format(name))
+
+        if not len(macro_element):
+            raise DirectiveError("The '{}' macro is missing one or more '{}' child elements".format(name, self.TEXT_TAG))
+
+        self._compiling_macros.add(name)
+
+        try:
+            parts = []
+
+            for child in macro_element:
+                if child.tag == self.TEXT_TAG_FULL_NAME:
+                    parts.append(self._compile_text(child))
+                elif child.tag == self.DATE_TAG_FULL_NAME:
+                    parts.append(self._compile_date(child))
+                else:
+                    raise DirectiveError("The '{}' element is unknown as a '{}' element child".format(child.tag, self.MACRO_TAG))
+        finally:
+            self._compiling_macros.discard(name)
+
+        macro = Macro(name, parts)
+        self._compiled_macros[name] = macro
+
+        return macro
+
+    def _compile_text(self, text_element):
+        """Compiles a text element.
+
+        :param text_element: An etree element. The 'text' XML node.
+
+        """
+
+        case = text_element.get(self.CASE_ATTRIBUTE)
+
+        if case is not None:
+            case = case.lower()
+
+            if case == self.TEXT_CASE_LOWER:
+                case = str.lower
+            elif case == self.TEXT_CASE_UPPER:
+                case = str.upper
+            elif case == self.TEXT_CASE_TITLE:
+                case = str.title
+            else:
+                raise DirectiveError("The '{}' attribute value for the '{}' tag is unknown".format(self.CASE_ATTRIBUTE, self.TEXT_TAG))
+
+        return Text(self._compile_value(text_element),
+                    case,
+                    text_element.get(self.REPLACE_SPACES_WITH_ATTRIBUTE),
+                    text_element.get(self.PREFIX_ATTRIBUTE),
+                    text_element.get(self.SUFFIX_ATTRIBUTE))
+
+    def _compile_date(self, date_element):
+        """Compiles a date element.
+
+        :param date_element: An etree element. A 'date' XML node.
+
+        """
+
+        variable_name = date_element.get(self.VARIABLE_ATTRIBUTE)
+        format_value = date_element.get(self.FORMAT_ATTRIBUTE)
+
+        if variable_name is None:
+            raise DirectiveError("The '{}' element is missing the '{}' attribute".format(self.DATE_TAG, self.VARIABLE_ATTRIBUTE))
+        elif format_value is None:
+            raise DirectiveError("The '{}' element is missing the '{}' attribute".format(self.DATE_TAG, self.FORMAT_ATTRIBUTE))
+
+        try:
+            has_field = any(field_name is not None for literal_text, field_name, format_spec, conversion in string.Formatter().parse(format_value))  # @UnusedVariable
+        except ValueError:
+            has_field = False
+
+        if not has_field:
+            raise DirectiveError("The '{}' attribute value for the '{}' element is not a valid format string".format(self.FORMAT_ATTRIBUTE, self.DATE_TAG))
+
+        return Date(variable_name, format_value)
+
+    def _compile_value(self, element):
+        """Compiles the value for an element.
+
+        The value is either the text from the 'value' attribute, the text from the 'variable' attribute, or the text from a 'macro' attribute.
+
+        :param element: An etree element. Any XML that can have a 'value', 'variable', or 'macro' attribute.
+
+        """
+
+        value = element.get(self.VALUE_ATTRIBUTE)
+        variable_name = element.get(self.VARIABLE_ATTRIBUTE)
+        macro_name = element.get(self.MACRO_ATTRIBUTE)
+
+        if value is not None:
+            return Value(value)
+        elif variable_name is not None:
+            return Variable(variable_name)
+        elif macro_name is not None:
+            return self._compile_macro(macro_name)
+        else:
+            raise DirectiveError("The '{}' element is missing either the '{}', '{}', or '{}' attribute".format(element.tag, self.VALUE_ATTRIBUTE, self.VARIABLE_ATTRIBUTE, self.MACRO_ATTRIBUTE))
+
+class DirectiveCache(object):
+    """A bounded cache of directives loaded from files, so a directive that is used again is not parsed again.
+
+    Directives are keyed by the absolute path of their file, and a cached directive is only used while the size and modification time of its file 
+    are unchanged; otherwise the file is parsed again. The least recently used directive is dropped once the cache is full.
+
+    Constructor arguments are as follows:
+
+    :param size: Optional integer. The most directives kept.
+    :param compiled_cache: Optional :class:`.CompiledDirectiveCache`. Loads directives compiled by earlier runs instead of parsing their files. 
+
+    """
+
+    # The default number of directives kept
+    SIZE = 16
+
+    def __init__(self, size=SIZE, compiled_cache=None):
+        """Constructor for the :class:`.DirectiveCache`."""
+
+        self.size = size
+        self.compiled_cache = compiled_cache
+        self._directives = collections.OrderedDict()
+
+    def get(self, file_path):
+        """Gets the directive of a file, parsing the file only if its directive is not cached or the file has changed.
+
+        An 'OSError' is raised if the file cannot be examined.
+
+        :param file_path: A path. The directive definition XML file path.
+
+        """
+
+        absolute_path = os.path.abspath(file_path)
+        file_stat = os.stat(absolute_path)
+        version = (file_stat.st_size, file_stat.st_mtime_ns)
+        cached = self._directives.get(absolute_path)
+
+        if cached is not None and cached[0] == version:
+            self._directives.move_to_end(absolute_path)
+
+            return cached[1]
+
+        if self.compiled_cache is None:
+            directive = Directive(absolute_path)
+        else:
+            directive = self.compiled_cache.get(absolute_path, file_stat)
+
+        self._directives[absolute_path] = (version, directive)
+        self._directives.move_to_end(absolute_path)
+
+        while len(self._directives) > self.size:
+            self._directives.popitem(last=False)
+
+        return directive
+
+    def clear(self):
+        """Drops every cached directive."""
+
+        self._directives.clear()
+
+class CompiledDirectiveCache(object):
+    """A cache of compiled directives on disk, so a directive used by an earlier run is loaded without parsing or validating its XML file.
+
+    The :class:`.Program` of each directive is pickled to a file in the cache folder named after a hash of the absolute path of the directive. The 
+    cached program is used while the size and modification time of the directive file are unchanged, or, if they have changed, while the SHA-256 hash 
+    of its content is unchanged. A cache file written by a different version of this module is ignored. A directive that does not compile is not 
+    cached, so its errors are raised when it is used, as for a directive that is parsed.
+
+    Cache files are unpickled, so the cache folder must only be writable by the user.
+
+    Constructor arguments are as follows:
+
+    :param folder_path: Optional path. The folder of the cache files. If 'None', the 'descatter' folder in the user cache folder is used, which is 
+        '$XDG_CACHE_HOME' or '~/.cache'.
+
+    """
+
+    # The version of the layout of the cache files
+    FORMAT_VERSION = 1
+
+    # The extension of the cache files
+    FILE_EXTENSION = '.pickle'
+
+    def __init__(self, folder_path=None):
+        """Constructor for the :class:`.CompiledDirectiveCache`."""
+
+        if folder_path is None:
+            folder_path = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'descatter')
+
+        self.folder_path = folder_path
+        self._module_version = None
+
+    def get(self, file_path, file_stat=None):
+        """Gets a directive, loading its compiled program from the cache, or parsing and compiling it and adding it to the cache.
+
+        :param file_path: A path. The directive definition XML file path.
+        :param file_stat: Optional 'os.stat_result'. The metadata of the directive file. If 'None', the file is examined with 'os.stat'.
+
+        """
+
+        file_path = os.path.abspath(file_path)
+
+        if file_stat is None:
+            file_stat = os.stat(file_path)
+
+        cache_file_path = self.get_cache_file_path(file_path)
+        header, data = self._read(cache_file_path)
+        content_hash = None
+
+        if header is not None and header[:2] == (self.FORMAT_VERSION, self._get_module_version()) and header[2] == file_path:
+            if header[3:5] == (file_stat.st_size, file_stat.st_mtime_ns):
+                directive = self._load(file_path, data)
+            else:
+                # The file has been touched or copied without changing its content.
+                content_hash = self._hash(file_path)
+                directive = self._load(file_path, data) if header[5] == content_hash else None
+
+                if directive is not None:
+                    self._write(cache_file_path, file_path, file_stat, content_hash, data)
+
+            if directive is not None:
+                return directive
+
+        directive = Directive(file_path)
+
+        try:
+            program = directive.compile()
+        except DirectiveError:
+            return directive
+
+        if content_hash is None:
+            content_hash = self._hash(file_path)
+
+        try:
+            data = pickle.dumps((directive.get_name(), program), pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return directive
+
+        self._write(cache_file_path, file_path, file_stat, content_hash, data)
+
+        return directive
+
+    def get_cache_file_path(self, file_path):
+        """Gets the path of the cache file of a directive.
+
+        :param file_path: A path. The absolute path of the directive definition XML file.
+
+        """
+
+        return os.path.join(self.folder_path, hashlib.sha256(os.fsencode(file_path)).hexdigest()[:32] + self.FILE_EXTENSION)
+
+    def _get_module_version(self):
+        """Gets the modification time of this module, since the pickled programs depend on its classes."""
+
+        if self._module_version is None:
+            try:
+                self._module_version = os.stat(__file__).st_mtime_ns
+            except (OSError, NameError):
+                self._module_version = 0
+
+        return self._module_version
+
+    def _read(self, cache_file_path):
+        """Reads a cache file and returns a tuple of its header and the pickled program, or 'None' for both if it cannot be read.
+
+        :param cache_file_path: A path.
+
+        """
+
+        try:
+            with open(cache_file_path, 'rb') as cache_file:
+                header = pickle.load(cache_file)
+
+                return header, cache_file.read()
+        except Exception:
+            return None, None
+
+    def _load(self, file_path, data):
+        """Unpickles a cached program and returns its directive, or 'None' if it cannot be unpickled.
+
+        :param file_path: A path. The absolute path of the directive definition XML file.
+        :param data: A bytes object. The pickled name and program.
+
+        """
+
+        try:
+            name, program = pickle.loads(data)
+        except Exception:
+            return None
+
+        return Directive.from_program(file_path, name, program)
+
+    def _write(self, cache_file_path, file_path, file_stat, content_hash, data):
+        """Writes a cache file atomically. The cache is skipped if the cache folder cannot be written.
+
+        :param cache_file_path: A path.
+        :param file_path: A path. The absolute path of the directive definition XML file.
+        :param file_stat: An 'os.stat_result'. The metadata of the directive file.
+        :param content_hash: A String. The hash of the content of the directive file.
+        :param data: A bytes object. The pickled name and program.
+
+        """
+
+        header = (self.FORMAT_VERSION, self._get_module_version(), file_path, file_stat.st_size, file_stat.st_mtime_ns, content_hash)
+        temporary_path = '{}.{}.tmp'.format(cache_file_path, os.getpid())
+
+        try:
+            os.makedirs(self.folder_path, mode=0o700, exist_ok=True)
+
+            with open(temporary_path, 'wb') as cache_file:
+                pickle.dump(header, cache_file, pickle.HIGHEST_PROTOCOL)
+                cache_file.write(data)
+
+            os.replace(temporary_path, cache_file_path)
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+    def _hash(self, file_path):
+        """Computes the SHA-256 hash of the content of a file.
+
+        :param file_path: A path.
+
+        """
+
+        with open(file_path, 'rb') as directive_file:
+            return hashlib.sha256(directive_file.read()).hexdigest()
+
+class DirectiveIndex(collections.abc.Mapping):
+    """The directives in a folder and its subfolders by name, where each directive is only parsed when it is first used.
+
+    The folder is scanned once, reading only the name at the start of each file with :func:`.read_directive_name`, so indexing many directives is
+    fast. Directives are parsed through a :class:`.DirectiveCache`, so a directive whose file has changed since it was parsed is parsed again. If
+    files have the same name, the file found last is used.
+
+    Constructor arguments are as follows:
+
+    :param folder_path: A path. The folder of directive definition XML files.
+    :param directive_cache: Optional :class:`.DirectiveCache`. Parses and keeps the directives. If 'None', the index creates its own cache.
+
+    """
+
+    # The bytes of a directive file read at a time while looking for its name
+    HEADER_SIZE = 4096
+
+    def __init__(self, folder_path, directive_cache=None):
+        """Constructor for the :class:`.DirectiveIndex`."""
+
+        if directive_cache is None:
+            directive_cache = DirectiveCache()
+
+        self.folder_path = folder_path
+        self._directive_cache = directive_cache
+        self._paths = {}
+
+        for root, subfolder_names, file_names in os.walk(folder_path):  # @UnusedVariable
+            for file_name in file_names:
+                file_path = os.path.join(root, file_name)
+                self._paths[read_directive_name(file_path)] = file_path
+
+    def __getitem__(self, name):
+        """Gets a directive by name, parsing it on first use."""
+
+        return self._directive_cache.get(self._paths[name])
+
+    def __iter__(self):
+
+        return iter(self._paths)
+
+    def __len__(self):
+
+        return len(self._paths)
+
+    def __contains__(self, name):
+
+        # Overridden so testing for a name does not parse the directive.
+        return name in self._paths
+
+    def get_path(self, name):
+        """Gets the path of the file of a directive by name without parsing it.
+
+        :param name: A String. The name of the directive.
+
+        """
+
+        return self._paths[name]
+
+class _RootElementRead(Exception):
+    """Raised by the start element handler of :func:`.read_directive_name` to stop parsing once the root element has been read."""
+    pass
+
+def read_directive_name(file_path):
+    """Reads the name of a directive from the start tag of the root element of its file, without reading the rest of the file.
+
+    A :class:`.DirectiveError` is raised if the file does not start with well-formed XML. 'None' is returned if the root element has no name.
+
+    :param file_path: A path. The directive definition XML file path.
+
+    """
+
+    parser = xml.parsers.expat.ParserCreate()
+    names = []
+
+    def read_root(tag, attributes):
+        names.append(attributes.get(Directive.NAME_ATTRIBUTE))
+
+        raise _RootElementRead()
+
+    parser.StartElementHandler = read_root
+
+    try:
+        with open(file_path, 'rb') as directive_file:
+            while True:
+                data = directive_file.read(DirectiveIndex.HEADER_SIZE)
+                parser.Parse(data, not data)
+
+                if not data:
+                    break
+    except _RootElementRead:
+        return names[0]
+    except xml.parsers.expat.ExpatError as error:
+        raise DirectiveError("The directive: '{}' could not be read: {}".format(file_path, error))
+
+    raise DirectiveError("The directive: '{}' has no root element".format(file_path))
+
+def get_variable_value(filer_context, variable_name):
+    """Gets a variable from a filer context.
+
+    :param filer_context: A dictionary. The filer context.
+    :param variable_name: A String. The name of the variable in the filer context.
+
+    """
+
+    try:
+        return filer_context[variable_name]
+    except KeyError:
+        raise DirectiveError("The '{}' value for the '{}' attribute is not a context variable".format(variable_name, Directive.VARIABLE_ATTRIBUTE))
+
+def match_pattern(text, pattern):
+    """Determines if a compiled 'matches' or 'glob' condition pattern matches text.
+
+    :param text: A String.
+    :param pattern: A compiled regular expression.
+
+    """
+
+    return pattern.match(text) is not None
+
+def translate_glob(pattern):
+    """Translates a glob pattern into a regular expression that matches the whole text.
+
+    '*' matches any text, '?' matches any character, and '[...]' or '[!...]' matches any character in, or not in, a set. Unlike 'fnmatch.translate',
+    the expression never contains groups, so many expressions can be combined into one. See :class:`.Program`.
+
+    :param pattern: A String. The glob pattern.
+
+    """
+
+    parts = []
+    index = 0
+    length = len(pattern)
+
+    while index < length:
+        character = pattern[index]
+        index = index + 1
+
+        if character == '*':
+            if not parts or parts[-1] != r"[\s\S]*":
+                parts.append(r"[\s\S]*")
+        elif character == '?':
+            parts.append(r"[\s\S]")
+        elif character == '[':
+            end = index
+
+            if end < length and pattern[end] == '!':
+                end = end + 1
+
+            if end < length and pattern[end] == ']':
+                end = end + 1
+
+            while end < length and pattern[end] != ']':
+                end = end + 1
+
+            if end >= length:
+                parts.append(re.escape(character))
+            else:
+                characters = pattern[index:end].replace('\\', '\\\\').replace('[', '\\[')
+                index = end + 1
+
+                if characters.startswith('!'):
+                    characters = '^' + characters[1:]
+                elif characters.startswith('^'):
+                    characters = '\\' + characters
+
+                parts.append('[' + characters + ']')
+        else:
+            parts.append(re.escape(character))
+
+    return ''.join(parts) + r"\Z"
+
+def parse_integer(text):
+    """Parses an integer, such as the 'value' of a condition on the index of a file.
+
+    :param text: A String.
+
+    """
+
+    return int(text.strip())
+
+def parse_size(text):
+    """Parses a size in bytes, such as '900', '10MB', or '1.5 GiB'.
+
+    Units are not case sensitive. Decimal units (kB, MB, GB, TB, PB) are powers of 1000 and binary units (KiB, MiB, GiB, TiB, PiB) are powers of 1024.
+    A 'ValueError' is raised if the text is not a size.
+
+    :param text: A String.
+
+    """
+
+    match = Condition.SIZE_PATTERN.match(text)
+
+    if match is None:
+        raise ValueError("'{}' is not a size".format(text))
+
+    number, unit = match.groups()
+    unit = unit.lower()
+
+    if unit.endswith('b'):
+        unit = unit[:-1]
+
+    if unit.endswith('i'):
+        multiplier = 1024 ** Condition.SIZE_PREFIXES.index(unit[:-1])
+    else:
+        multiplier = 1000 ** Condition.SIZE_PREFIXES.index(unit)
+
+    return int(float(number) * multiplier)
+
+def parse_datetime(text):
+    """Parses an ISO 8601 date or date and time, such as '2013-08-09' or '2013-08-09 14:30'.
+
+    A date without a time is midnight at the start of the day. The dates of files are in local time without a time zone, so a date and time with a 
+    time zone offset, such as '2013-08-09T14:30+02:00', is converted to local time and its time zone is removed.
+
+    :param text: A String.
+
+    """
+
+    value = datetime.fromisoformat(text.strip())
+
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+
+    return value
+
+def sync_path(path):
+    """Flushes a file, or the entries of a folder, to disk.
+
+    An 'OSError' is raised if the path cannot be opened or synced, such as a folder on an operating system that cannot open folders.
+
+    :param path: A path.
+
+    """
+
+    file_descriptor = os.open(path, os.O_RDONLY)
+
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+def link_file(source_path, destination_path):
+    """Files a source as a hard link, replacing an existing file at the destination, and returns the destination.
+
+    An 'OSError' is raised if the link cannot be created, such as when the destination is on another file system.
+
+    :param source_path: A path.
+    :param destination_path: A path.
+
+    """
+
+    # The destination may be the empty file claimed for a random file name, which is replaced by the link.
+    if os.path.lexists(destination_path):
+        os.remove(destination_path)
+
+    os.link(source_path, destination_path)
+
+    return destination_path
+
+def clone_file(source_file, destination_file):
+    """Copies the content of an open file as a copy-on-write clone into another open file.
+
+    An 'OSError' is raised if the file system cannot clone the source.
+
+    :param source_file: A file object. Opened for reading.
+    :param destination_file: A file object. Opened for writing.
+
+    """
+
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "Cloning a file is only available on Linux")
+
+    fcntl.ioctl(destination_file.fileno(), Filer.FICLONE, source_file.fileno())
+
+def kernel_copy_file(source_file, destination_file):
+    """Copies the content of an open file into another open file inside the kernel with 'os.copy_file_range'.
+
+    An 'OSError' is raised if the kernel cannot copy between the files, such as on a kernel or file system without 'copy_file_range'.
+
+    :param source_file: A file object. Opened for reading.
+    :param destination_file: A file object. Opened for writing.
+
+    """
+
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "Copying a file inside the kernel is not available")
+
+    while os.copy_file_range(source_file.fileno(), destination_file.fileno(), Filer.KERNEL_COPY_SIZE):
+        pass
+
+def send_file(source_file, destination_file):
+    """Copies the content of an open file into another open file with 'os.sendfile', as 'shutil.copy2' does where available.
+
+    An 'OSError' is raised if the files cannot be copied with 'os.sendfile'.
+
+    :param source_file: A file object. Opened for reading.
+    :param destination_file: A file object. Opened for writing.
+
+    """
+
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        raise OSError(errno.ENOSYS, "Copying a file with 'sendfile' is not available")
+
+    offset = 0
+
+    while True:
+        sent = os.sendfile(destination_file.fileno(), source_file.fileno(), offset, Filer.KERNEL_COPY_SIZE)
+
+        if sent == 0:
+            break
+
+        offset = offset + sent
+
+class Program(object):
+    """A compiled directive.
+
+    Evaluating a program never touches the XML of the directive. Use :meth:`.Directive.compile` to create a program.
+
+    Rules that only test one variable for equality, such as a rule for each file extension, are placed in a dictionary keyed by the value they match.
+    Rules that only test one variable with 'matches' or 'glob' patterns are combined into a single regular expression with an alternative for each 
+    pattern in rule order, so one match of the variable finds the first of them that matches. Only the rules that could not be indexed or combined and 
+    appear before the rule found are evaluated, so the first rule that matches is still the one that is used.
+
+    :param rules: A list. Tuples of a :class:`.Rule` and the :class:`.Path` it references, in the order the rules appear in the directive.
+
+    """
+
+    # The maximum number of rule selections or paths remembered by get_destinations before they are discarded
+    CACHE_SIZE = 65536
+
+    # The variables that differ for nearly every file, so a rule selection or a path that depends on them is never remembered
+    UNSHARED_VARIABLES = frozenset([Filer.CURRENT_DATETIME,
+                                    Filer.FILE_DATE_ACCESSED,
+                                    Filer.FILE_DATE_CREATED,
+                                    Filer.FILE_DATE_MODIFIED,
+                                    Filer.FILE_INDEX,
+                                    Filer.FILE_SOURCE_PATH])
+
+    def __init__(self, rules):
+        """Constructor for the :class:`.Program`."""
+
+        self.rules = rules
+        self.variables = frozenset().union(*[rule.get_variables() | path.get_variables() for rule, path in rules])
+        self._candidate_variables = {}
+        self._path_variables = dict((path, self._get_shared_variables(path.get_variables())) for rule, path in rules)
+        self._indexes = {}
+        self._patterns = {}
+        self._unindexed = []
+
+        for position, (rule, path) in enumerate(rules):
+            indexed_values = rule.get_indexed_values()
+            patterns = None
+
+            if indexed_values is None:
+                patterns = rule.get_patterns()
+
+            if patterns is not None:
+                condition, expressions = patterns
+                key = (condition.variable_name, condition.case_sensitive)
+
+                if key not in self._patterns:
+                    self._patterns[key] = (condition, [], [])
+
+                self._patterns[key][1].append(position)
+                self._patterns[key][2].append(expressions)
+            elif indexed_values is None:
+                self._unindexed.append((position, rule, path))
+            else:
+                condition, values = indexed_values
+                key = (condition.variable_name, condition.case_sensitive)
+
+                if key not in self._indexes:
+                    self._indexes[key] = (condition, {})
+
+                positions = self._indexes[key][1]
+
+                for value in values:
+                    positions.setdefault(value, position)
+
+        self._indexes = list(self._indexes.values())
+        self._patterns = [self._combine(*patterns) for patterns in self._patterns.values()]
+        self._patterns = [patterns for patterns in self._patterns if patterns is not None]
+        self._unindexed.sort(key=operator.itemgetter(0))
+
+    def get_indexed_count(self):
+        """Gets the number of rules that are selected with a dictionary lookup or a combined pattern instead of being evaluated."""
+
+        return len(self.rules) - len(self._unindexed)
+
+    def get_destination(self, filer_context):
+        """Determines the destination for a filer context.
+
+        The path of the first rule that matches is used.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        rule, path = self._select(filer_context)  # @UnusedVariable
+
+        return path.evaluate(filer_context)
+
+    def get_destinations(self, filer_contexts):
+        """Determines the destination for each of many filer contexts.
+
+        A tuple of the folder names and the file name is generated for each filer context, in order. See :meth:`.plan`.
+
+        :param filer_contexts: An iterable of dictionaries. The filer contexts.
+
+        """
+
+        for rule_name, folder_names, file_name in self.plan(filer_contexts):  # @UnusedVariable
+            yield folder_names, file_name
+
+    def plan(self, filer_contexts):
+        """Determines the matching rule and the destination for each of many filer contexts.
+
+        The rule found with the indexes and combined patterns only depends on the indexed variables, and only the rules evaluated before it, the
+        candidates, depend on other variables. So the rule selected is determined once for every distinct combination of the rule found and the variables
+        used by its candidates, and the destination is determined once for every distinct combination of the variables used by the path. For example, the
+        rule of each file extension is selected once, and a path that only uses the file extension is evaluated once for each extension. A selection or
+        destination that depends on a variable in :attr:`.UNSHARED_VARIABLES` is never remembered.
+
+        A tuple of the rule name, the folder names, and the file name is generated for each filer context, in order.
+
+        :param filer_contexts: An iterable of dictionaries. The filer contexts.
+
+        """
+
+        selected = {}
+        destinations = {}
+
+        for filer_context in filer_contexts:
+            indexed_position = self._find_indexed(filer_context)
+
+            if indexed_position is None:
+                rule, path = self._select_linear(filer_context)
+            else:
+                candidate_variables = self._get_candidate_variables(indexed_position)
+                rule_key = None
+                selection = None
+
+                if candidate_variables is not None:
+                    try:
+                        rule_key = (indexed_position, tuple([filer_context[name] for name in candidate_variables]))
+                        selection = selected.get(rule_key)
+                    except (KeyError, TypeError):
+                        # A variable is missing or cannot be used as a key, so the selection is not remembered.
+                        rule_key = None
+
+                if selection is None:
+                    selection = self._select_candidates(filer_context, indexed_position)
+
+                    if rule_key is not None:
+                        if len(selected) >= self.CACHE_SIZE:
+                            selected.clear()
+
+                        selected[rule_key] = selection
+
+                rule, path = selection
+
+            path_variables = self._path_variables[path]
+            path_key = None
+            destination = None
+
+            if path_variables is not None:
+                try:
+                    path_key = (path, tuple([filer_context[name] for name in path_variables]))
+                    destination = destinations.get(path_key)
+                except (KeyError, TypeError):
+                    path_key = None
+
+            if destination is None:
+                destination = path.evaluate(filer_context)
+
+                if path_key is not None:
+                    if len(destinations) >= self.CACHE_SIZE:
+                        destinations.clear()
+
+                    destinations[path_key] = destination
+
+            yield rule.name, list(destination[0]), destination[1]
+
+    def _select(self, filer_context):
+        """Selects the first rule that matches a filer context and returns a tuple of the rule and its path.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        indexed_position = self._find_indexed(filer_context)
+
+        if indexed_position is None:
+            return self._select_linear(filer_context)
+
+        return self._select_candidates(filer_context, indexed_position)
+
+    def _find_indexed(self, filer_context):
+        """Finds the position of the first rule that matches a filer context with the indexes and combined patterns.
+
+        The number of rules is returned if none of them match, and 'None' is returned if a variable they test is missing.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        rule_count = len(self.rules)
+        indexed_position = rule_count
+
+        for condition, positions in self._indexes:
+            try:
+                text = condition.get_text(filer_context)
+            except DirectiveError:
+                # Let the rules report the missing variable in the order they appear.
+                return None
+
+            position = positions.get(text, rule_count)
+
+            if position < indexed_position:
+                indexed_position = position
+
+        for condition, expression, positions in self._patterns:
+            try:
+                text = condition.get_text(filer_context)
+            except DirectiveError:
+                return None
+
+            match = expression.match(text)
+
+            if match is not None:
+                position = positions[match.lastgroup]
+
+                if position < indexed_position:
+                    indexed_position = position
+
+        return indexed_position
+
+    def _select_candidates(self, filer_context, indexed_position):
+        """Selects the first rule that matches a filer context, evaluating only the rules before the rule found with the indexes, and returns a tuple of the rule and its path.
+
+        :param filer_context: A dictionary. The filer context.
+        :param indexed_position: An integer. The position found by :meth:`._find_indexed`.
+
+        """
+
+        for position, rule, path in self._unindexed:
+            if position > indexed_position:
+                break
+            elif rule.is_match(filer_context):
+                return rule, path
+
+        if indexed_position < len(self.rules):
+            return self.rules[indexed_position]
+
+        raise DirectiveError("A path could not be determined")
+
+    def _get_candidate_variables(self, indexed_position):
+        """Gets the names of the variables used by the rules evaluated before the rule found with the indexes.
+
+        'None' is returned if no rule is evaluated, or if the selection is not remembered, see :meth:`._get_shared_variables`.
+
+        :param indexed_position: An integer. The position found by :meth:`._find_indexed`.
+
+        """
+
+        candidate_variables = self._candidate_variables.get(indexed_position, False)
+
+        if candidate_variables is False:
+            variables = [rule.get_variables() for position, rule, path in self._unindexed if position < indexed_position]
+            candidate_variables = self._get_shared_variables(frozenset().union(*variables)) if variables else None
+            self._candidate_variables[indexed_position] = candidate_variables
+
+        return candidate_variables
+
+    def _get_shared_variables(self, variables):
+        """Gets the names of variables in a fixed order, or 'None' if any of them is in :attr:`.UNSHARED_VARIABLES`.
+
+        :param variables: A set. The names of the variables.
+
+        """
+
+        if variables & self.UNSHARED_VARIABLES:
+            return None
+
+        return tuple(sorted(variables))
+
+    def _combine(self, condition, positions, expressions):
+        """Combines the patterns of many rules into one regular expression.
+
+        Each pattern is an alternative in a named group, and the alternatives are in rule order, so the group of a match is the first rule that matches.
+        A tuple of the representative condition, the combined regular expression, and a dictionary of the rule position by group name is returned.
+
+        :param condition: A :class:`.Condition`. Provides the variable text that is matched.
+        :param positions: A list. The position of each rule, in order.
+        :param expressions: A list. The list of regular expressions of each rule.
+
+        """
+
+        alternatives = []
+        group_positions = {}
+
+        for position, rule_expressions in zip(positions, expressions):
+            for expression in rule_expressions:
+                group_name = 'rule{}_{}'.format(position, len(group_positions))
+                alternatives.append("(?P<" + group_name + ">" + expression + ")")
+                group_positions[group_name] = position
+
+        try:
+            expression = re.compile("|".join(alternatives), 0 if condition.case_sensitive else re.IGNORECASE)
+        except re.error:
+            # The patterns cannot be combined, so the rules are evaluated in order instead.
+            for position in positions:
+                self._unindexed.append((position,) + self.rules[position])
+
+            return None
+
+        return condition, expression, group_positions
+
+    def _select_linear(self, filer_context):
+        """Selects the first rule that matches a filer context by evaluating every rule in order and returns a tuple of the rule and its path.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        for rule, path in self.rules:
+            if rule.is_match(filer_context):
+                return rule, path
+
+        raise DirectiveError("A path could not be determined")
+
+class Rule(object):
+    """A compiled 'rule' element.
+
+    :param name: A String. The value of the 'name' attribute.
+    :param conditions: A list of :class:`.Condition` objects.
+    :param match: A function. Either 'all' or 'any', applied to the condition results.
+    :param path_name: A String. The name of the path used if the rule is a match.
+
+    """
+
+    def __init__(self, name, conditions, match, path_name):
+        """Constructor for the :class:`.Rule`."""
+
+        self.name = name
+        self.conditions = conditions
+        self.match = match
+        self.path_name = path_name
+
+    def is_match(self, filer_context):
+        """Determines if the rule is a match for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        return self.match(condition.evaluate(filer_context) for condition in self.conditions)
+
+    def evaluate(self, filer_context):
+        """Gets the path name if the rule is a match for a filer context; otherwise, 'None'.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        if self.is_match(filer_context):
+            return self.path_name
+        else:
+            return None
+
+    def get_variables(self):
+        """Gets the names of the filer context variables used by the conditions."""
+
+        return set(condition.variable_name for condition in self.conditions)
+
+    def get_indexed_values(self):
+        """Gets the values that select this rule with a dictionary lookup.
+
+        A rule can be indexed if every condition is an 'equals' text condition without a wildcard or format on the same variable with the same case
+        sensitivity. 'None' is returned if the rule cannot be indexed; otherwise, a tuple of a representative :class:`.Condition` and the set of values.
+
+        """
+
+        if not self.conditions:
+            return None
+
+        first = self.conditions[0]
+
+        for condition in self.conditions:
+            if (condition.comparison is not operator.eq or
+                condition.variable_format is not None or
+                condition.variable_type is not None or
+                condition.variable_name != first.variable_name or
+                condition.case_sensitive != first.case_sensitive):
+                return None
+
+        values = set(condition.value for condition in self.conditions)
+
+        if self.match is all and len(values) > 1:
+            return None
+
+        return first, values
+
+    def get_patterns(self):
+        """Gets the patterns that select this rule when they are combined into one regular expression.
+
+        A rule can be combined if every condition is a 'matches' or 'glob' condition without a format on the same variable with the same case sensitivity, 
+        and either there is only one condition or any condition can match. 'None' is returned if the rule cannot be combined; otherwise, a tuple of a 
+        representative :class:`.Condition` and a list of the regular expression of each condition.
+
+        """
+
+        if not self.conditions:
+            return None
+
+        first = self.conditions[0]
+
+        for condition in self.conditions:
+            if (condition.comparison is not match_pattern or
+                condition.variable_format is not None or
+                condition.variable_name != first.variable_name or
+                condition.case_sensitive != first.case_sensitive or
+                condition.value.groups):
+                return None
+
+        if self.match is all and len(self.conditions) > 1:
+            return None
+
+        return first, [condition.value.pattern for condition in self.conditions]
+
+class Condition(object):
+    """A compiled 'condition' element.
+
+    :param variable_name: A String. The filer context variable that is tested.
+    :param comparison: A function or 'None'. Compares the variable text to the value text. 'None' indicates the wildcard value, which matches anything.
+    :param value: A String. The value text. Already lower case if the condition is not case sensitive. A compiled regular expression for a 'matches' or 
+        'glob' condition, see :func:`.match_pattern`.
+    :param case_sensitive: A boolean. 'False' indicates the variable text is converted to lower case before comparison.
+    :param variable_format: A String or 'None'. The format string used to convert the variable to text.
+    :param variable_type: Optional tuple or 'None'. The type, parse function, and description of the variable from :attr:`.VARIABLE_TYPES` if the
+        variable is compared as a number, size, or date. 'None' indicates the variable is compared as text.
+    :param native_value: Optional. The value parsed by the parse function of the variable type.
+
+    """
+
+    # The unit prefixes of a size, where the empty prefix is bytes
+    SIZE_PREFIXES = ['', 'k', 'm', 'g', 't', 'p']
+
+    SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?|\.\d+)\s*((?:[kmgtp]i?)?b?)\s*$", re.IGNORECASE)
+
+    # The filer context variables that are compared by conditions as a number, size, or date instead of text, with a tuple of the type of the 
+    # variable, the function that parses the 'value' of a condition and a variable that is text, and a description of the type
+    VARIABLE_TYPES = {Filer.CURRENT_DATETIME: (datetime, parse_datetime, 'date'),
+                      Filer.FILE_COUNT: (int, parse_integer, 'integer'),
+                      Filer.FILE_DATE_ACCESSED: (datetime, parse_datetime, 'date'),
+                      Filer.FILE_DATE_CREATED: (datetime, parse_datetime, 'date'),
+                      Filer.FILE_DATE_MODIFIED: (datetime, parse_datetime, 'date'),
+                      Filer.FILE_INDEX: (int, parse_integer, 'integer'),
+                      Filer.FILE_SIZE: (int, parse_size, 'size')}
+
+    def __init__(self, variable_name, comparison, value, case_sensitive, variable_format, variable_type=None, native_value=None):
+        """Constructor for the :class:`.Condition`."""
+
+        self.variable_name = variable_name
+        self.comparison = comparison
+        self.value = value
+        self.case_sensitive = case_sensitive
+        self.variable_format = variable_format
+        self.variable_type = variable_type
+        self.native_value = native_value
+
+    def evaluate(self, filer_context):
+        """Gets the boolean result of the condition for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        if self.comparison is None:
+            get_variable_value(filer_context, self.variable_name)
+            return True
+
+        if self.variable_type is not None:
+            variable = get_variable_value(filer_context, self.variable_name)
+            native_type, parse, description = self.variable_type  # @UnusedVariable
+
+            if type(variable) is native_type:
+                return self.comparison(variable, self.native_value)
+            elif isinstance(variable, str):
+                try:
+                    return self.comparison(parse(variable), self.native_value)
+                except ValueError:
+                    pass
+
+            # A variable that is unknown, such as the count of a streamed batch, or cannot be parsed is compared as text.
+
+        return self.comparison(self.get_text(filer_context), self.value)
+
+    def get_variables(self):
+        """Gets the name of the filer context variable used by the condition."""
+
+        return {self.variable_name}
+
+    def get_text(self, filer_context):
+        """Gets the variable as the text that is compared to the value.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        variable = get_variable_value(filer_context, self.variable_name)
+
+        if self.variable_format is None:
+            variable = str(variable)
+        else:
+            variable = self.variable_format.format(variable)
+
+        if not self.case_sensitive:
+            variable = variable.lower()
+
+        return variable
+
+class Path(object):
+    """A compiled 'path' element.
+
+    :param name: A String. The value of the 'name' attribute.
+    :param folders: A list. The compiled value of each 'folder' element, outermost first.
+    :param file: The compiled value of the 'file' element.
+
+    """
+
+    def __init__(self, name, folders, file):
+        """Constructor for the :class:`.Path`."""
+
+        self.name = name
+        self.folders = folders
+        self.file = file
+
+    def evaluate(self, filer_context):
+        """Gets a list of folder names and a file name for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        folder_names = [folder.evaluate(filer_context) for folder in self.folders]
+
+        return folder_names, self.file.evaluate(filer_context)
+
+    def get_variables(self):
+        """Gets the names of the filer context variables used by the folders and file."""
+
+        return self.file.get_variables().union(*[folder.get_variables() for folder in self.folders])
+
+class Macro(object):
+    """A compiled 'macro' element.
+
+    The text of a macro is memoised. A macro that does not use any filer context variables is expanded once. Otherwise, the text is kept in a bounded
+    least recently used cache keyed by the values its parts depend on, see the 'get_key' method of each part, so files with the same values share it.
+
+    :param name: A String. The value of the 'name' attribute.
+    :param parts: A list of :class:`.Text` and :class:`.Date` objects, which are concatenated in order.
+
+    """
+
+    # The maximum number of expansions remembered for a macro that uses filer context variables
+    CACHE_SIZE = 4096
+
+    def __init__(self, name, parts):
+        """Constructor for the :class:`.Macro`."""
+
+        self.name = name
+        self.parts = parts
+        self.variables = frozenset().union(*[part.get_variables() for part in parts])
+        self._constant = None
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def evaluate(self, filer_context):
+        """Gets the macro text for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        if not self.variables:
+            if self._constant is None:
+                self._constant = self._expand(filer_context)
+
+            return self._constant
+
+        key = self.get_key(filer_context)
+
+        try:
+            with self._cache_lock:
+                text = self._cache.get(key)
+
+                if text is not None:
+                    self._cache.move_to_end(key)
+                    return text
+        except TypeError:
+            # A value cannot be used as a key, so the macro is expanded every time.
+            return self._expand(filer_context)
+
+        text = self._expand(filer_context)
+
+        with self._cache_lock:
+            self._cache[key] = text
+
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        return text
+
+    def __getstate__(self):
+        """Gets the state of the macro without its memoised text or lock, so it can be pickled. See :class:`.CompiledDirectiveCache`."""
+
+        state = self.__dict__.copy()
+        state['_constant'] = None
+        state['_cache'] = collections.OrderedDict()
+        del state['_cache_lock']
+
+        return state
+
+    def __setstate__(self, state):
+        """Restores the state of an unpickled macro."""
+
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+
+    def get_key(self, filer_context):
+        """Gets a tuple of the values the macro text depends on for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        return tuple([part.get_key(filer_context) for part in self.parts])
+
+    def get_variables(self):
+        """Gets the names of the filer context variables used by the text and date parts, including nested macros."""
+
+        return set(self.variables)
+
+    def _expand(self, filer_context):
+        """Concatenates the text of the parts for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        text = ''
+
+        for part in self.parts:
+            text = text + part.evaluate(filer_context)
+
+        return text
+
+class Text(object):
+    """A compiled 'text' element.
+
+    :param source: A :class:`.Value`, :class:`.Variable`, or :class:`.Macro` object. Provides the unformatted text.
+    :param case: A function or 'None'. Either 'str.lower', 'str.upper', or 'str.title'.
+    :param replace_spaces_with: A String or 'None'.
+    :param prefix: A String or 'None'.
+    :param suffix: A String or 'None'.
+
+    """
+
+    def __init__(self, source, case, replace_spaces_with, prefix, suffix):
+        """Constructor for the :class:`.Text`."""
+
+        self.source = source
+        self.case = case
+        self.replace_spaces_with = replace_spaces_with
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def evaluate(self, filer_context):
+        """Gets the formatted text for a filer context.
+
+        Only non-empty text is formatted. The prefix and suffix are applied after setting the case and replacing spaces.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        text = self.source.evaluate(filer_context)
+
+        if text:
+            if self.case is not None:
+                text = self.case(text)
+
+            if self.replace_spaces_with is not None:
+                text = text.replace(' ', self.replace_spaces_with)
+
+            if self.prefix is not None:
+                text = self.prefix + text
+
+            if self.suffix is not None:
+                text = text + self.suffix
+
+        return text
+
+    def get_key(self, filer_context):
+        """Gets the value the formatted text depends on for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        return self.source.get_key(filer_context)
+
+    def get_variables(self):
+        """Gets the names of the filer context variables used by the source."""
+
+        return self.source.get_variables()
+
+class Date(object):
+    """A compiled 'date' element.
+
+    :param variable_name: A String. The filer context variable, which must be a date or time.
+    :param format_value: A String. The format string applied to the variable.
+
+    """
+
+    # The 'strftime' directives that only use the date. Any other directive, including a platform specific one, may use the time of day.
+    DAY_DIRECTIVES = frozenset('aAbBCdDeFgGhjmuUVwWxyY%')
+
+    def __init__(self, variable_name, format_value):
+        """Constructor for the :class:`.Date`."""
+
+        self.variable_name = variable_name
+        self.format_value = format_value
+        self._is_day = self._is_day_format(format_value)
+
+    def evaluate(self, filer_context):
+        """Gets the formatted date text for a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        value = get_variable_value(filer_context, self.variable_name)
+
+        try:
+            return self.format_value.format(value)
+        except AttributeError:
+            raise DirectiveError("The '{}' attribute value for the '{}' element is not a date or time".format(Directive.VARIABLE_ATTRIBUTE, Directive.DATE_TAG))
+        except ValueError:
+            raise DirectiveError("The '{}' attribute value for the '{}' element is not a valid format string".format(Directive.FORMAT_ATTRIBUTE, Directive.DATE_TAG))
+
+    def get_key(self, filer_context):
+        """Gets the value the formatted date depends on for a filer context.
+
+        If the format only uses the date, the key is the day, so every time on the same day has the same key; otherwise, it is the variable.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        value = get_variable_value(filer_context, self.variable_name)
+
+        if self._is_day and isinstance(value, datetime):
+            return value.date()
+        else:
+            return value
+
+    def get_variables(self):
+        """Gets the name of the filer context variable used by the date."""
+
+        return {self.variable_name}
+
+    def _is_day_format(self, format_value):
+        """Determines if a format string only formats the date, and not the time of day, of its argument.
+
+        :param format_value: A String. The format string.
+
+        """
+
+        try:
+            fields = [field for field in string.Formatter().parse(format_value) if field[1] is not None]
+        except ValueError:
+            return False
+
+        for literal_text, field_name, format_spec, conversion in fields:  # @UnusedVariable
+            if field_name not in ('', '0') or conversion is not None or not format_spec:
+                return False
+
+            if any(directive not in self.DAY_DIRECTIVES for directive in re.findall('%(.?)', format_spec, re.DOTALL)):
+                return False
+
+        return True
+
+class Value(object):
+    """A compiled 'value' attribute, which is constant text.
+
+    :param value: A String.
+
+    """
+
+    def __init__(self, value):
+        """Constructor for the :class:`.Value`."""
+
+        self.value = value
+
+    def evaluate(self, filer_context):
+        """Gets the text. The filer context is ignored."""
+
+        return self.value
+
+    def get_key(self, filer_context):
+        """Gets 'None', because the text does not depend on the filer context."""
+
+        return None
+
+    def get_variables(self):
+        """Gets an empty set, because a value does not use the filer context."""
+
+        return set()
+
+class Variable(object):
+    """A compiled 'variable' attribute, which is replaced by a filer context variable.
+
+    :param variable_name: A String. The name of the variable in the filer context.
+
+    """
+
+    def __init__(self, variable_name):
+        """Constructor for the :class:`.Variable`."""
+
+        self.variable_name = variable_name
+
+    def evaluate(self, filer_context):
+        """Gets the variable from a filer context.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        return get_variable_value(filer_context, self.variable_name)
+
+    def get_key(self, filer_context):
+        """Gets the variable from a filer context, which is what the text depends on.
+
+        :param filer_context: A dictionary. The filer context.
+
+        """
+
+        return get_variable_value(filer_context, self.variable_name)
+
+    def get_variables(self):
+        """Gets the name of the filer context variable."""
+
+        return {self.variable_name}
\ No newline at end of file
@@ -0,0 +1,325 @@
+# descatter/watch.py
+# Copyright (C) 2013 the Descatter authors and contributers <see AUTHORS file>
+#
+# This module is part of Descatter.
+#
+# Descatter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Descatter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
+
+"""The watch module files new files in a folder as soon as they have been written.
+
+Changes to the folder are received from the Linux inotify interface, which is called through 'ctypes', so no additional packages are needed.
+Watching is not available on other operating systems.
+
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+class WatchError(Exception): pass
+
+class Inotify(object):
+    """A minimal binding to the Linux inotify interface.
+
+    Raises a :class:`.WatchError` if inotify is not available.
+
+    """
+
+    # Event masks, see 'inotify(7)'
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    # Flags for 'inotify_init1'
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    # The fixed part of an event: the watch descriptor, mask, cookie, and length of the name
+    EVENT_STRUCT = struct.Struct('iIII')
+
+    # The number of bytes read at a time, which holds many events
+    BUFFER_SIZE = 65536
+
+    def __init__(self):
+        """Constructor for the :class:`.Inotify`."""
+
+        if not sys.platform.startswith('linux'):
+            raise WatchError("Watching a folder is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc.inotify_init1.argtypes = [ctypes.c_int]
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+
+        if self.fd < 0:
+            raise WatchError("The inotify instance could not be created: {}".format(os.strerror(ctypes.get_errno())))
+
+    def add_watch(self, path, mask):
+        """Watches a path and returns the watch descriptor.
+
+        :param path: A path. The folder to watch.
+        :param mask: An integer. The events to receive.
+
+        """
+
+        watch_descriptor = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+
+        if watch_descriptor < 0:
+            error_number = ctypes.get_errno()
+            raise OSError(error_number, os.strerror(error_number), path)
+
+        return watch_descriptor
+
+    def read(self):
+        """Reads the available events and returns a list of tuples of the watch descriptor, mask, and name of each event."""
+
+        try:
+            data = os.read(self.fd, self.BUFFER_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+
+        while offset < len(data):
+            watch_descriptor, mask, cookie, name_length = self.EVENT_STRUCT.unpack_from(data, offset)  # @UnusedVariable
+            offset = offset + self.EVENT_STRUCT.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset = offset + name_length
+            events.append((watch_descriptor, mask, name))
+
+        return events
+
+    def close(self):
+        """Closes the inotify instance, which removes all of its watches."""
+
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class Watcher(object):
+    """Files the files written to, or moved into, a folder with a filer.
+
+    A file is filed once it has been closed after writing, or moved into the folder, and has not been written again for the debounce time, so a
+    file that is written in parts is only filed when it is complete. The files that become ready together are filed as one batch with
+    :meth:`.Filer.iter_file_list`, so the 'file-count' variable is unknown.
+
+    If the kernel event queue overflows, every file in the folder is filed again; filing incrementally avoids copying files that were already filed.
+    Events inside the destination are ignored when the destination is inside the source.
+
+    Constructor arguments are as follows:
+
+    :param filer: A :class:`.Filer`. Files each new file with the directive it was created with.
+    :param source: A path. The folder to watch.
+    :param destination: A path. The folder where new files are filed.
+    :param recursive: Optional boolean. 'True' indicates the files in subfolders, including subfolders created while watching, are filed as well.
+    :param move: Optional boolean. 'True' indicates new files are moved. 'False' indicates new files are copied.
+    :param debounce: Optional number. The seconds a file must not have been written before it is filed.
+
+    """
+
+    # The default seconds a file must not have been written before it is filed
+    DEBOUNCE = 0.5
+
+    # The longest seconds to wait for an event, so a call to stop is noticed
+    IDLE_TIMEOUT = 1.0
+
+    def __init__(self, filer, source, destination, recursive=False, move=False, debounce=DEBOUNCE):
+        """Constructor for the :class:`.Watcher`."""
+
+        if not os.path.isdir(source):
+            raise WatchError("The source: '{}' could not be watched because it is not a folder".format(source))
+
+        self.filer = filer
+        self.source = source
+        self.destination = destination
+        self.recursive = recursive
+        self.move = move
+        self.debounce = debounce
+        self._destination_prefix = os.path.join(os.path.abspath(destination), '')
+        self._folders = {}
+        self._pending = collections.OrderedDict()
+        self._stopped = False
+        self._inotify = Inotify()
+
+        mask = Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO | Inotify.IN_MODIFY | Inotify.IN_ONLYDIR
+
+        if recursive:
+            mask = mask | Inotify.IN_CREATE
+
+        self._mask = mask
+        self._add_folder(source)
+
+    def run(self):
+        """Files new files until :meth:`.stop` is called."""
+
+        self._stopped = False
+
+        try:
+            while not self._stopped:
+                self.poll(self.IDLE_TIMEOUT)
+        finally:
+            self.close()
+
+    def stop(self):
+        """Stops :meth:`.run` within the idle timeout. Can be called from another thread."""
+
+        self._stopped = True
+
+    def close(self):
+        """Stops watching the folder."""
+
+        self._inotify.close()
+
+    def poll(self, timeout):
+        """Waits for changes to the folder and files the files that are ready, and returns a list of the filed paths.
+
+        :param timeout: A number. The most seconds to wait for a change.
+
+        """
+
+        if self._pending:
+            timeout = max(0, min(timeout, next(iter(self._pending.values())) - time.monotonic()))
+
+        readable, writable, exceptional = select.select([self._inotify.fd], [], [], timeout)  # @UnusedVariable
+
+        if readable:
+            self._process(self._inotify.read())
+
+        now = time.monotonic()
+        ready = []
+
+        for file_path, ready_time in self._pending.items():
+            if ready_time > now:
+                break
+
+            ready.append(file_path)
+
+        for file_path in ready:
+            del self._pending[file_path]
+
+        if ready:
+            return list(self.filer.iter_file_list(ready, self.destination, self.move))
+        else:
+            return []
+
+    def _process(self, events):
+        """Updates the files waiting to be filed from inotify events.
+
+        :param events: A list. Tuples of the watch descriptor, mask, and name of each event.
+
+        """
+
+        for watch_descriptor, mask, name in events:
+            if mask & Inotify.IN_Q_OVERFLOW:
+                # Events have been lost, so everything in the folder is filed.
+                for folder_path in list(self._folders.values()):
+                    self._add_files(folder_path)
+
+                continue
+
+            folder_path = self._folders.get(watch_descriptor)
+
+            if folder_path is None:
+                continue
+
+            if mask & Inotify.IN_IGNORED:
+                # The folder has been removed or moved away.
+                del self._folders[watch_descriptor]
+                continue
+
+            path = os.path.join(folder_path, name)
+
+            if os.path.abspath(path).startswith(self._destination_prefix):
+                continue
+
+            if mask & Inotify.IN_ISDIR:
+                if self.recursive and mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                    self._add_folder(path)
+            elif mask & (Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO):
+                self._schedule(path)
+            elif mask & Inotify.IN_MODIFY and path in self._pending:
+                # The file is being written again, so it is not complete.
+                self._schedule(path)
+
+    def _schedule(self, file_path):
+        """Files a file after the debounce time, restarting the wait if it is already waiting.
+
+        :param file_path: A path.
+
+        """
+
+        self._pending.pop(file_path, None)
+        self._pending[file_path] = time.monotonic() + self.debounce
+
+    def _add_folder(self, folder_path):
+        """Watches a folder, and its subfolders if recursive.
+
+        Files already in a subfolder created while watching are filed, since they may have been written before the subfolder was watched.
+
+        :param folder_path: A path.
+
+        """
+
+        if os.path.join(os.path.abspath(folder_path), '').startswith(self._destination_prefix):
+            return
+
+        try:
+            watch_descriptor = self._inotify.add_watch(folder_path, self._mask)
+        except OSError as error:
+            if error.errno in (errno.ENOENT, errno.ENOTDIR) and folder_path != self.source:
+                return
+
+            raise WatchError("The folder: '{}' could not be watched: {}".format(folder_path, error.strerror))
+
+        self._folders[watch_descriptor] = folder_path
+
+        if folder_path != self.source:
+            self._add_files(folder_path)
+
+        if self.recursive:
+            try:
+                with os.scandir(folder_path) as folder_entries:
+                    subfolder_paths = [folder_entry.path for folder_entry in folder_entries if folder_entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                return
+
+            for subfolder_path in subfolder_paths:
+                self._add_folder(subfolder_path)
+
+    def _add_files(self, folder_path):
+        """Files the files already in a folder.
+
+        :param folder_path: A path.
+
+        """
+
+        try:
+            with os.scandir(folder_path) as folder_entries:
+                for folder_entry in folder_entries:
+                    if folder_entry.is_file():
+                        self._schedule(folder_entry.path)
+        except OSError:
+            pass
\ No newline at end of file
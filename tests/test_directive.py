@@ -16,14 +16,17 @@
 # You should have received a copy of the GNU General Public License
 # along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import os
+import shutil
+import tempfile
 import unittest
 
 import organize
 import tests_constants
 
 from lxml import etree
-from datetime import datetime
+from datetime import datetime, timezone
 
 class TestCondition(unittest.TestCase):
     """Test 'condition' element in the XML directive file and its related children elements and attributes."""
@@ -65,7 +68,7 @@ class TestCondition(unittest.TestCase):
         context[organize.Filer.FILE_SIZE] = 0
         context[organize.Filer.FILE_SOURCE_PATH] = os.getcwd()
         
-        self.directive._filer_context = context
+        self.context = context
     
     def tearDown(self):
         pass
@@ -73,145 +76,208 @@ class TestCondition(unittest.TestCase):
     def test_type_equals(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-equals-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
     
     def test_type_equals_not(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-equals-not-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
         
     def test_type_equals_wildcard(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-equals-wildcard-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
      
     def test_type_greater_than(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-greater-than-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
      
     def test_type_greater_than_not(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-greater-than-not-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
      
     def test_type_less_than(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-less-than-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
      
     def test_type_less_than_not(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-less-than-not-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
         
     def test_type_not_equal(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-not-equal-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
     
     def test_type_not_equal_not(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-not-equal-not-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
         
     def test_type_has(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-has-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
     
     def test_type_has_not(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-has-not-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
      
     def test_type_unknown(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-unknown-rule')[0]
-        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element)
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
      
     def test_type_missing(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='type-missing-rule')[0] 
-        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element)
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
 
     def test_case_sensitive_true(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='case-sensitive-true-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
         
     def test_case_sensitive_false(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='case-sensitive-false-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
 
     def test_case_sensitive_unknown(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='case-sensitive-unknown-rule')[0]
-        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element)
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
 
     def test_case_sensitive_missing(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='case-sensitive-missing-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
     
     def test_variable_unknown(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='variable-unknown-rule')[0] 
-        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element)
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
          
     def test_variable_missing(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='variable-missing-rule')[0] 
-        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element)
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
      
     def test_value_missing(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='value-missing-rule')[0] 
-        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element)
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
     
     def test_format_string(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='format-string-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
 
     def test_format_decimal(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='format-decimal-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
         
     def test_format_datetime(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='format-datetime-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
         
     def test_format_not_datetime(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='format-not-datetime-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertFalse(output_value)
 
     def test_format_year_month_day(self):
         
         condition_element = self.xpath_condition_element(self.directive._root, name='format-year-month-day-rule')[0]
-        output_value = self.directive._get_condition_result(condition_element)
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertTrue(output_value)
+    
+    def test_type_matches(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='matches-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertTrue(output_value)
+    
+    def test_type_matches_invalid(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='matches-invalid-rule')[0]
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
+    
+    def test_type_glob(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='glob-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertTrue(output_value)
+    
+    def test_type_glob_not(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='glob-not-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertFalse(output_value)
+    
+    def test_typed_size(self):
+        
+        self.context[organize.Filer.FILE_SIZE] = 900
+        condition_element = self.xpath_condition_element(self.directive._root, name='typed-size-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertFalse(output_value)
+    
+    def test_typed_size_unit(self):
+        
+        self.context[organize.Filer.FILE_SIZE] = 2048
+        condition_element = self.xpath_condition_element(self.directive._root, name='typed-size-unit-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertTrue(output_value)
+    
+    def test_typed_size_invalid(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='typed-size-invalid-rule')[0]
+        self.assertRaises(organize.DirectiveError, self.directive._get_condition_result, condition_element, self.context)
+    
+    def test_typed_date(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='typed-date-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
+        self.assertTrue(output_value)
+    
+    def test_typed_date_offset(self):
+        
+        condition_element = self.xpath_condition_element(self.directive._root, name='typed-date-offset-rule')[0]
+        self.context[organize.Filer.FILE_DATE_CREATED] = datetime(2013, 8, 9, 23, 59, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertTrue(self.directive._get_condition_result(condition_element, self.context))
+        self.context[organize.Filer.FILE_DATE_CREATED] = datetime(2013, 8, 10, 0, 1, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertFalse(self.directive._get_condition_result(condition_element, self.context))
+    
+    def test_typed_text_variable(self):
+        
+        self.context[organize.Filer.FILE_INDEX] = '10'
+        condition_element = self.xpath_condition_element(self.directive._root, name='typed-integer-rule')[0]
+        output_value = self.directive._get_condition_result(condition_element, self.context)
         self.assertTrue(output_value)
 
 class TestRule(unittest.TestCase):
@@ -247,7 +313,7 @@ class TestRule(unittest.TestCase):
         context[organize.Filer.FILE_SIZE] = str(0)
         context[organize.Filer.FILE_SOURCE_PATH] = os.getcwd()
         
-        self.directive._filer_context = context
+        self.context = context
     
     def tearDown(self):
         pass
@@ -255,53 +321,53 @@ class TestRule(unittest.TestCase):
     def test_match_any(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='match-any-rule')[0]
         expected_value = rule_element.get(organize.Directive.PATH_ATTRIBUTE)
-        output_value = self.directive._process_rule(rule_element)
+        output_value = self.directive._process_rule(rule_element, self.context)
      
         self.assertEqual(output_value, expected_value)
      
     def test_match_any_not(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='match-any-not-rule')[0]
-        output_value = self.directive._process_rule(rule_element)
+        output_value = self.directive._process_rule(rule_element, self.context)
      
         self.assertIsNone(output_value)
     
     def test_match_all(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='match-all-rule')[0]
         expected_value = rule_element.get(organize.Directive.PATH_ATTRIBUTE)
-        output_value = self.directive._process_rule(rule_element)
+        output_value = self.directive._process_rule(rule_element, self.context)
      
         self.assertEqual(output_value, expected_value)
      
     def test_match_all_not(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='match-all-not-rule')[0]
-        output_value = self.directive._process_rule(rule_element)
+        output_value = self.directive._process_rule(rule_element, self.context)
      
         self.assertIsNone(output_value)
      
     def test_match_unknown(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='match-unknown-rule')[0]
          
-        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element)
+        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element, self.context)
      
     def test_match_missing(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='match-missing-rule')[0]
          
-        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element)
+        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element, self.context)
     
     def test_path_missing(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='path-missing-rule')[0]
          
-        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element)
+        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element, self.context)
         
     def test_conditions_missing(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='conditions-missing-rule')[0]
          
-        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element)
+        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element, self.context)
     
     def test_condition_missing(self):
         rule_element = self.xpath_rule_element(self.directive._root, name='condition-missing-rule')[0]
          
-        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element)
+        self.assertRaises(organize.DirectiveError, self.directive._process_rule, rule_element, self.context)
 
 class TestPath(unittest.TestCase):
     """Test 'path' element in the XML directive file and its related children elements and attributes."""
@@ -336,75 +402,75 @@ class TestPath(unittest.TestCase):
         context[organize.Filer.FILE_SIZE] = str(0)
         context[organize.Filer.FILE_SOURCE_PATH] = os.getcwd()
         
-        self.directive._filer_context = context
+        self.context = context
     
     def tearDown(self):
         pass
     
     def test_file(self):
         
-        output_value = self.directive._process_path('file')[1]
+        output_value = self.directive._process_path('file', self.context)[1]
         self.assertEqual(output_value, 'file')
     
     def test_file_missing(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-missing', self.context)
     
     def test_file_variable(self):
         
-        output_value = self.directive._process_path('file-variable')[1]
+        output_value = self.directive._process_path('file-variable', self.context)[1]
         self.assertEqual(output_value, 'file_variable')
     
     def test_file_macro(self):
         
-        output_value = self.directive._process_path('file-macro')[1]
+        output_value = self.directive._process_path('file-macro', self.context)[1]
         self.assertEqual(output_value, 'file_macro_name')
     
     def test_file_value_missing(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-value-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-value-missing', self.context)
     
     def test_file_variable_unknown(self):
 
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-variable-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-variable-unknown', self.context)
         
     def test_file_macro_unknown(self):
 
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-macro-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'file-macro-unknown', self.context)
     
     def test_folder(self):
         
-        folder_names, file_name = self.directive._process_path('folder')
+        folder_names, file_name = self.directive._process_path('folder', self.context)
         self.assertEqual(file_name, 'folder_file')
         self.assertEqual(folder_names[0], 'folder')
     
     def test_folder_value_missing(self):
 
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'folder-value-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'folder-value-missing', self.context)
         
     def test_folder_variable(self):
 
-        folder_names, file_name = self.directive._process_path('folder-variable')
+        folder_names, file_name = self.directive._process_path('folder-variable', self.context)
         self.assertEqual(file_name, 'folder_variable_file')
         self.assertEqual(folder_names[0], 'folder_variable')
 
     def test_folder_variable_unknown(self):
 
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'folder-variable-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'folder-variable-unknown', self.context)
         
     def test_folder_macro(self):
         
-        folder_names, file_name = self.directive._process_path('folder-macro')
+        folder_names, file_name = self.directive._process_path('folder-macro', self.context)
         self.assertEqual(file_name, 'folder_macro_file')
         self.assertEqual(folder_names[0], 'folder_macro_name')
 
     def test_folder_macro_unknown(self):
 
-        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'folder-macro-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_path, 'folder-macro-unknown', self.context)
     
     def test_folder_nested(self):
         
-        folder_names, file_name = self.directive._process_path('folder-nested')
+        folder_names, file_name = self.directive._process_path('folder-nested', self.context)
         self.assertEqual(file_name, 'folder_nested_file')
         
         for index in range(len(folder_names)):
@@ -443,142 +509,183 @@ class TestMacro(unittest.TestCase):
         context[organize.Filer.FILE_SIZE] = str(0)
         context[organize.Filer.FILE_SOURCE_PATH] = os.getcwd()
         
-        self.directive._filer_context = context
+        self.context = context
     
     def tearDown(self):
         pass
     
     def test_child_unknown(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'child-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'child-unknown', self.context)
     
     def test_text_value(self):
         
-        output_value = self.directive._process_macro('text-value')
+        output_value = self.directive._process_macro('text-value', self.context)
         self.assertEqual(output_value, 'text_value')
     
     def test_text_missing(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-missing', self.context)
         
     def test_text_value_missing(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-value-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-value-missing', self.context)
     
     def test_text_variable(self):
         
-        output_value = self.directive._process_macro('text-variable')
+        output_value = self.directive._process_macro('text-variable', self.context)
         self.assertEqual(output_value, 'file_variable')    
     
     def test_text_variable_unknown(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-variable-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-variable-unknown', self.context)
     
     def test_text_macro(self):
         
-        output_value = self.directive._process_macro('text-macro')
+        output_value = self.directive._process_macro('text-macro', self.context)
         self.assertEqual(output_value, 'text_value')
     
     def test_text_macro_unknown(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-macro-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-macro-unknown', self.context)
     
     def test_text_prefix(self):
         
-        output_value = self.directive._process_macro('text-prefix')
+        output_value = self.directive._process_macro('text-prefix', self.context)
         self.assertEqual(output_value, 'prefix_text')
     
     def test_text_suffix(self):
         
-        output_value = self.directive._process_macro('text-suffix')
+        output_value = self.directive._process_macro('text-suffix', self.context)
         self.assertEqual(output_value, 'text_suffix')
     
     def test_text_replace_underscore(self):
         
-        output_value = self.directive._process_macro('text-replace-underscore')
+        output_value = self.directive._process_macro('text-replace-underscore', self.context)
         self.assertEqual(output_value, 'text_replace_underscore')
     
     def test_text_replace_empty(self):
         
-        output_value = self.directive._process_macro('text-replace-empty')
+        output_value = self.directive._process_macro('text-replace-empty', self.context)
         self.assertEqual(output_value, 'TextReplaceEmpty')
     
     def test_text_case_upper(self):
         
-        output_value = self.directive._process_macro('text-case-upper')
+        output_value = self.directive._process_macro('text-case-upper', self.context)
         self.assertEqual(output_value, 'TEXT CASE UPPER')
     
     def test_text_case_lower(self):
         
-        output_value = self.directive._process_macro('text-case-lower')
+        output_value = self.directive._process_macro('text-case-lower', self.context)
         self.assertEqual(output_value, 'text case lower')
         
     def test_text_case_title(self):
         
-        output_value = self.directive._process_macro('text-case-title')
+        output_value = self.directive._process_macro('text-case-title', self.context)
         self.assertEqual(output_value, 'Text Case Title')
     
     def test_text_case_unknown(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-case-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'text-case-unknown', self.context)
     
     def test_text_case_all(self):
         
-        output_value = self.directive._process_macro('text-all-format')
+        output_value = self.directive._process_macro('text-all-format', self.context)
         self.assertEqual(output_value, 'prefix_Text_All_Format_suffix')
     
     def test_text_compound(self):
         
-        output_value = self.directive._process_macro('text-compound')
+        output_value = self.directive._process_macro('text-compound', self.context)
         self.assertEqual(output_value, 'macro_text_compound')
     
     def test_date_variable(self):
         
         now = datetime.now()
         expected_value = now.strftime('%Y-%m-%d')
-        output_value = self.directive._process_macro('date-variable')
+        output_value = self.directive._process_macro('date-variable', self.context)
         self.assertEqual(output_value, expected_value)
     
     def test_date_variable_missing(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-variable-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-variable-missing', self.context)
     
     def test_date_format_missing(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-format-missing')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-format-missing', self.context)
     
     def test_date_variable_unknown(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-variable-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-variable-unknown', self.context)
     
     def test_date_variable_not_datetime(self):
 
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-variable-not-datetime')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-variable-not-datetime', self.context)
     
     def test_date_format_unknown(self):
         
-        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-format-unknown')
+        self.assertRaises(organize.DirectiveError, self.directive._process_macro, 'date-format-unknown', self.context)
 
     def test_date_compound(self):
         
         now = datetime.now()
         expected_value = now.strftime('%Y-%m-%d')
-        output_value = self.directive._process_macro('date-compound')
+        output_value = self.directive._process_macro('date-compound', self.context)
         self.assertEqual(output_value, expected_value)
 
     def test_text_date_compound(self):
         
         now = datetime.now()
         expected_value = "text_date_compound_" + now.strftime('%Y-%m-%d')
-        output_value = self.directive._process_macro('text-date-compound')
+        output_value = self.directive._process_macro('text-date-compound', self.context)
         self.assertEqual(output_value, expected_value)
     
     def test_date_text_compound(self):
         
         now = datetime.now()
         expected_value = now.strftime('%Y-%m-%d') + "_date_text_compound"
-        output_value = self.directive._process_macro('date-text-compound')
+        output_value = self.directive._process_macro('date-text-compound', self.context)
         self.assertEqual(output_value, expected_value)
+    
+    def test_memoised_constant(self):
+        
+        macro = self.directive._compile_macro('text-compound')
+        self.assertEqual(macro.evaluate({}), "macro_text_compound")
+        self.assertEqual(macro.evaluate({}), "macro_text_compound")
+        self.assertEqual(len(macro._cache), 0)
+    
+    def test_memoised_day(self):
+        
+        macro = self.directive._compile_macro('date-compound')
+        output_value = [macro.evaluate({organize.Filer.CURRENT_DATETIME: datetime(2013, 5, 17, hour)}) for hour in range(24)]
+        self.assertEqual(output_value, ["2013-05-17"] * 24)
+        self.assertEqual(len(macro._cache), 1)
+    
+    def test_memoised_time(self):
+        
+        macro = self.directive._compile_macro('date-time-variable')
+        output_value = [macro.evaluate({organize.Filer.CURRENT_DATETIME: datetime(2013, 5, 17, hour)}) for hour in (1, 2, 1)]
+        self.assertEqual(output_value, ["2013-05-17 01", "2013-05-17 02", "2013-05-17 01"])
+        self.assertEqual(len(macro._cache), 2)
+    
+    def test_memoised_day_formats(self):
+        
+        test_datetime = datetime(2013, 5, 17, 10)
+        
+        for format_value in ('{:%Y-%m-%d}', '{0:%F %A}', '{:%d%%H}', '{:week %V of %G}'):
+            self.assertEqual(organize.Date(organize.Filer.CURRENT_DATETIME, format_value).get_key({organize.Filer.CURRENT_DATETIME: test_datetime}), test_datetime.date())
+        
+        for format_value in ('{0:%Y%m%d-%T}', '{0:%s}', '{:%R}', '{:%r}', '{:%k}', '{:%l%P}', '{:%-H}', '{:%c}', '{:%Y%}'):
+            self.assertEqual(organize.Date(organize.Filer.CURRENT_DATETIME, format_value).get_key({organize.Filer.CURRENT_DATETIME: test_datetime}), test_datetime)
+    
+    def test_memoised_bounded(self):
+        
+        macro = self.directive._compile_macro('text-variable')
+        macro.CACHE_SIZE = 2
+        
+        for file_name in ('a', 'b', 'c', 'a'):
+            self.assertEqual(macro.evaluate({organize.Filer.FILE_NAME: file_name}), file_name)
+        
+        self.assertEqual(list(macro._cache), [('c',), ('a',)])
 
 class TestDestination(unittest.TestCase):
     """Test 'get_destination' method of the 'Directive' class."""
@@ -646,4 +753,400 @@ class TestInfo(unittest.TestCase):
         self.assertEquals(output_info[organize.Directive.NAME_TAG], expected_author_name)
         self.assertEquals(output_info[organize.Directive.EMAIL_TAG], expected_author_email)
         self.assertEquals(output_info[organize.Directive.DESCRIPTION_TAG], expected_description)
-        self.assertEquals(output_info[organize.Directive.FORMAT_ATTRIBUTE], expected_format)
\ No newline at end of file
+        self.assertEquals(output_info[organize.Directive.FORMAT_ATTRIBUTE], expected_format)
+
+class TestCompile(unittest.TestCase):
+    """Test 'compile' method of the 'Directive' class."""
+    
+    def setUp(self):
+        self.directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestCompile.xml"))
+        
+        self.context = {}
+        self.context[organize.Filer.CURRENT_DATETIME] = datetime.now()
+        self.context[organize.Filer.FILE_COUNT] = 10
+        self.context[organize.Filer.FILE_EXTENSION] = 'txt'
+        self.context[organize.Filer.FILE_DATE_ACCESSED] = datetime.now()
+        self.context[organize.Filer.FILE_DATE_CREATED] = datetime.now()
+        self.context[organize.Filer.FILE_DATE_MODIFIED] = datetime.now()
+        self.context[organize.Filer.FILE_INDEX] = 5
+        self.context[organize.Filer.FILE_NAME] = 'file name'
+        self.context[organize.Filer.FILE_PATH] = 'file_path'
+        self.context[organize.Filer.FILE_SIZE] = 0
+        self.context[organize.Filer.FILE_SOURCE_PATH] = 'file_source_path'
+    
+    def tearDown(self):
+        pass
+    
+    def test_cached(self):
+        
+        self.assertIs(self.directive.compile(), self.directive.compile())
+    
+    def test_rule_order(self):
+        
+        program = self.directive.compile()
+        rule_names = [rule.name for rule, path in program.rules]  # @UnusedVariable
+        self.assertEqual(rule_names, ['text-rule', 'default'])
+    
+    def test_destination(self):
+        
+        folder_names, file_name = self.directive.get_destination(self.context)
+        self.assertEqual(folder_names, ['Text'])
+        self.assertEqual(file_name, 'file_name.txt')
+    
+    def test_destination_fallback(self):
+        
+        self.context[organize.Filer.FILE_EXTENSION] = 'doc'
+        folder_names, file_name = self.directive.get_destination(self.context)
+        self.assertEqual(folder_names, ['Unknown'])
+        self.assertEqual(file_name, 'file_name.doc')
+    
+    def test_shared_macro(self):
+        
+        program = self.directive.compile()
+        self.assertIs(program.rules[0][1].file, program.rules[1][1].file)
+    
+    def test_variables(self):
+        
+        self.assertEqual(self.directive.get_variables(), {organize.Filer.FILE_EXTENSION, organize.Filer.FILE_NAME})
+    
+    def test_macro_recursive(self):
+        
+        self.assertRaises(organize.DirectiveError, self.directive._compile_macro, 'recursive-macro')
+    
+    def test_concurrent(self):
+        
+        def get_file_name(index):
+            context = dict(self.context)
+            context[organize.Filer.FILE_NAME] = 'file ' + str(index)
+            context[organize.Filer.FILE_EXTENSION] = ('txt', 'md', 'doc')[index % 3]
+            return self.directive.get_destination(context)
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            destinations = list(executor.map(get_file_name, range(300)))
+        
+        for index, (folder_names, file_name) in enumerate(destinations):
+            self.assertEqual(folder_names, [('Text', 'Text', 'Unknown')[index % 3]])
+            self.assertEqual(file_name, 'file_' + str(index) + '.' + ('txt', 'md', 'doc')[index % 3])
+    
+    def test_error_up_front(self):
+        
+        directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestCompile_error.xml"))
+        self.assertRaises(organize.DirectiveError, directive.get_destination, self.context)
+
+class TestRuleIndex(unittest.TestCase):
+    """Test selecting rules with the equality index of a compiled directive."""
+    
+    def setUp(self):
+        self.directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestRuleIndex.xml"))
+        
+        self.context = {}
+        self.context[organize.Filer.FILE_EXTENSION] = 'txt'
+        self.context[organize.Filer.FILE_NAME] = 'file_name'
+    
+    def tearDown(self):
+        pass
+    
+    def test_indexed_count(self):
+        
+        self.assertEqual(self.directive.compile().get_indexed_count(), 3)
+    
+    def test_indexed(self):
+        
+        self.context[organize.Filer.FILE_EXTENSION] = 'pdf'
+        self.assertEqual(self.directive.get_destination(self.context)[1], 'document')
+    
+    def test_plan_candidate_variables(self):
+        
+        class RecordingContext(dict):
+            def __getitem__(self, name):
+                self.read.add(name)
+                return dict.__getitem__(self, name)
+        
+        contexts = []
+        
+        for extension in ('txt', 'pdf'):
+            context = RecordingContext(self.context)
+            context.read = set()
+            context[organize.Filer.FILE_EXTENSION] = extension
+            contexts.append(context)
+        
+        output_value = list(self.directive.compile().plan(contexts))
+        self.assertEqual([planned[0] for planned in output_value], ['text-rule', 'document-rule'])
+        self.assertEqual(contexts[0].read, {organize.Filer.FILE_EXTENSION})
+        self.assertEqual(contexts[1].read, {organize.Filer.FILE_EXTENSION, organize.Filer.FILE_NAME})
+    
+    def test_indexed_first_match(self):
+        
+        self.context[organize.Filer.FILE_NAME] = 'report'
+        self.assertEqual(self.directive.get_destination(self.context)[1], 'text')
+    
+    def test_unindexed_before_indexed(self):
+        
+        self.context[organize.Filer.FILE_EXTENSION] = 'doc'
+        self.context[organize.Filer.FILE_NAME] = 'report'
+        self.assertEqual(self.directive.get_destination(self.context)[1], 'report')
+    
+    def test_case_sensitive(self):
+        
+        self.context[organize.Filer.FILE_EXTENSION] = 'md'
+        self.assertEqual(self.directive.get_destination(self.context)[1], 'markdown')
+        self.context[organize.Filer.FILE_EXTENSION] = 'MD'
+        self.assertEqual(self.directive.get_destination(self.context)[1], 'default')
+    
+    def test_fallback(self):
+        
+        self.context[organize.Filer.FILE_EXTENSION] = 'unknown'
+        self.assertEqual(self.directive.get_destination(self.context)[1], 'default')
+    
+    def test_variable_unknown(self):
+        
+        del self.context[organize.Filer.FILE_EXTENSION]
+        self.assertRaises(organize.DirectiveError, self.directive.get_destination, self.context)
+
+class TestPatternIndex(unittest.TestCase):
+    """Test selecting rules with the combined 'matches' and 'glob' patterns of a compiled directive."""
+    
+    def setUp(self):
+        self.directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestPatternIndex.xml"))
+        
+        self.context = {}
+        self.context[organize.Filer.FILE_EXTENSION] = 'jpg'
+        self.context[organize.Filer.FILE_NAME] = 'file_name'
+    
+    def tearDown(self):
+        pass
+    
+    def get_file_name(self, file_name, file_extension='jpg'):
+        
+        self.context[organize.Filer.FILE_NAME] = file_name
+        self.context[organize.Filer.FILE_EXTENSION] = file_extension
+        
+        return self.directive.get_destination(self.context)[1]
+    
+    def test_indexed_count(self):
+        
+        self.assertEqual(self.directive.compile().get_indexed_count(), 4)
+    
+    def test_glob(self):
+        
+        self.assertEqual(self.get_file_name('img_0042'), 'photo')
+    
+    def test_matches(self):
+        
+        self.assertEqual(self.get_file_name('DSC1234'), 'photo')
+        self.assertEqual(self.get_file_name('DSC12345'), 'default')
+        self.assertEqual(self.get_file_name('my screen shot'), 'screenshot')
+    
+    def test_case_sensitive(self):
+        
+        self.assertEqual(self.get_file_name('scan1'), 'scan')
+        self.assertEqual(self.get_file_name('Scan1'), 'default')
+    
+    def test_first_match(self):
+        
+        self.assertEqual(self.get_file_name('IMG_draft'), 'photo')
+        self.assertEqual(self.get_file_name('draft screenshot'), 'draft')
+        self.assertEqual(self.get_file_name('screenshot', 'txt'), 'screenshot')
+        self.assertEqual(self.get_file_name('notes', 'txt'), 'text')
+    
+    def test_linear(self):
+        
+        program = self.directive.compile()
+        
+        for file_name in ('IMG_1', 'DSC0001', 'draft', 'scan2', 'SCAN2', 'screenshot', 'other'):
+            for file_extension in ('jpg', 'txt'):
+                self.context[organize.Filer.FILE_NAME] = file_name
+                self.context[organize.Filer.FILE_EXTENSION] = file_extension
+                self.assertEqual(program._select(self.context), program._select_linear(self.context))
+
+class TestDestinations(unittest.TestCase):
+    """Test 'get_destinations' method of the 'Directive' class."""
+    
+    def setUp(self):
+        self.directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestCompile.xml"))
+        
+        self.contexts = []
+        
+        for index in range(30):
+            context = {}
+            context[organize.Filer.FILE_EXTENSION] = ('txt', 'MD', 'doc')[index % 3]
+            context[organize.Filer.FILE_NAME] = 'file ' + str(index % 5)
+            self.contexts.append(context)
+    
+    def tearDown(self):
+        pass
+    
+    def test_destinations(self):
+        
+        expected_destinations = [self.directive.get_destination(context) for context in self.contexts]
+        output_value = list(self.directive.get_destinations(self.contexts))
+        self.assertEqual(output_value, expected_destinations)
+    
+    def test_not_shared(self):
+        
+        output_value = list(self.directive.get_destinations(self.contexts[:1] * 2))
+        output_value[0][0].append('changed')
+        self.assertEqual(output_value[1][0], ['Text'])
+    
+    def test_variable_unknown(self):
+        
+        del self.contexts[5][organize.Filer.FILE_EXTENSION]
+        destinations = self.directive.get_destinations(self.contexts)
+        self.assertEqual(len([next(destinations) for index in range(5)]), 5)  # @UnusedVariable
+        self.assertRaises(organize.DirectiveError, next, destinations)
+
+class TestDirectiveCache(unittest.TestCase):
+    """Tests for the organize.DirectiveCache class."""
+    
+    def setUp(self):
+        self.test_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestDirectiveCache_", dir=None)
+        self.test_directive_paths = []
+        
+        for file_name in ('a.xml', 'b.xml', 'c.xml'):
+            test_directive_path = os.path.join(self.test_folder_path, file_name)
+            shutil.copyfile(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml"), test_directive_path)
+            self.test_directive_paths.append(test_directive_path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_folder_path)
+    
+    def test_cached(self):
+        test_cache = organize.DirectiveCache()
+        first_value = test_cache.get(self.test_directive_paths[0])
+        relative_path = os.path.relpath(self.test_directive_paths[0])
+        
+        self.assertIs(test_cache.get(relative_path), first_value)
+        self.assertEqual(first_value.get_name(), 'TestFileFile')
+    
+    def test_changed(self):
+        test_cache = organize.DirectiveCache()
+        first_value = test_cache.get(self.test_directive_paths[0])
+        
+        with open(self.test_directive_paths[0], 'a') as test_file:
+            test_file.write(' ')
+        
+        self.assertIsNot(test_cache.get(self.test_directive_paths[0]), first_value)
+    
+    def test_bounded(self):
+        test_cache = organize.DirectiveCache(2)
+        first_value = test_cache.get(self.test_directive_paths[0])
+        second_value = test_cache.get(self.test_directive_paths[1])
+        test_cache.get(self.test_directive_paths[0])
+        test_cache.get(self.test_directive_paths[2])
+        
+        self.assertIs(test_cache.get(self.test_directive_paths[0]), first_value)
+        self.assertIsNot(test_cache.get(self.test_directive_paths[1]), second_value)
+    
+    def test_missing(self):
+        self.assertRaises(OSError, organize.DirectiveCache().get, os.path.join(self.test_folder_path, 'missing.xml'))
+
+class TestCompiledDirectiveCache(unittest.TestCase):
+    """Tests for the organize.CompiledDirectiveCache class."""
+    
+    def setUp(self):
+        self.test_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestCompiledDirectiveCache_", dir=None)
+        self.test_cache_folder_path = os.path.join(self.test_folder_path, 'cache')
+        self.test_directive_path = os.path.join(self.test_folder_path, 'directive.xml')
+        shutil.copyfile(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestDestination.xml"), self.test_directive_path)
+        self.context = {}
+        self.context[organize.Filer.CURRENT_DATETIME] = datetime.now()
+        self.context[organize.Filer.FILE_COUNT] = str(10)
+        self.context[organize.Filer.FILE_EXTENSION] = 'file_extension'
+        self.context[organize.Filer.FILE_DATE_ACCESSED] = datetime.now()
+        self.context[organize.Filer.FILE_DATE_CREATED] = datetime.now()
+        self.context[organize.Filer.FILE_DATE_MODIFIED] = datetime.now()
+        self.context[organize.Filer.FILE_INDEX] = str(5)
+        self.context[organize.Filer.FILE_NAME] = 'file name'
+        self.context[organize.Filer.FILE_PATH] = 'file_path'
+        self.context[organize.Filer.FILE_SIZE] = str(0)
+        self.context[organize.Filer.FILE_SOURCE_PATH] = 'file_source_path'
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_folder_path)
+    
+    def test_cached(self):
+        first_value = organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)
+        second_value = organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)
+        
+        self.assertIsNone(second_value._xml_root)
+        self.assertEqual(second_value.get_name(), first_value.get_name())
+        self.assertEqual(second_value.get_destination(self.context), first_value.get_destination(self.context))
+    
+    def test_changed(self):
+        organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)
+        
+        with open(self.test_directive_path, 'a') as test_file:
+            test_file.write(' ')
+        
+        self.assertIsNotNone(organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)._xml_root)
+    
+    def test_touched(self):
+        organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)
+        os.utime(self.test_directive_path, ns=(0, 0))
+        
+        self.assertIsNone(organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)._xml_root)
+    
+    def test_corrupt(self):
+        test_cache = organize.CompiledDirectiveCache(self.test_cache_folder_path)
+        test_cache.get(self.test_directive_path)
+        
+        with open(test_cache.get_cache_file_path(self.test_directive_path), 'wb') as test_file:
+            test_file.write(b'corrupt')
+        
+        test_value = organize.CompiledDirectiveCache(self.test_cache_folder_path).get(self.test_directive_path)
+        
+        self.assertIsNotNone(test_value._xml_root)
+        self.assertEqual(test_value.get_name(), 'TestDestination')
+    
+    def test_directive_cache(self):
+        organize.DirectiveCache(compiled_cache=organize.CompiledDirectiveCache(self.test_cache_folder_path)).get(self.test_directive_path)
+        test_cache = organize.DirectiveCache(compiled_cache=organize.CompiledDirectiveCache(self.test_cache_folder_path))
+        
+        self.assertIsNone(test_cache.get(self.test_directive_path)._xml_root)
+
+class TestDirectiveIndex(unittest.TestCase):
+    """Tests for the organize.DirectiveIndex class and the organize.read_directive_name function."""
+    
+    def setUp(self):
+        self.test_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestDirectiveIndex_", dir=None)
+        os.mkdir(os.path.join(self.test_folder_path, 'subfolder'))
+        
+        for file_name in ('test_directive_TestFileFile.xml', os.path.join('subfolder', 'test_directive_TestFileList.xml')):
+            shutil.copyfile(os.path.join(tests_constants.DATA_FOLDER_PATH, os.path.basename(file_name)), os.path.join(self.test_folder_path, file_name))
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_folder_path)
+    
+    def test_names(self):
+        test_cache = organize.DirectiveCache()
+        test_index = organize.DirectiveIndex(self.test_folder_path, test_cache)
+        
+        self.assertEqual(sorted(test_index), ['TestFileFile', 'TestFileList'])
+        self.assertTrue('TestFileList' in test_index)
+        self.assertFalse('missing' in test_index)
+        self.assertEqual(test_cache._directives, {})
+    
+    def test_parsed_on_use(self):
+        test_index = organize.DirectiveIndex(self.test_folder_path)
+        output_value = test_index['TestFileList']
+        
+        self.assertEqual(output_value.get_name(), 'TestFileList')
+        self.assertEqual(output_value.file_path, os.path.join(self.test_folder_path, 'subfolder', 'test_directive_TestFileList.xml'))
+        self.assertIs(test_index['TestFileList'], output_value)
+        self.assertRaises(KeyError, test_index.__getitem__, 'missing')
+    
+    def test_read_name(self):
+        test_directive_path = os.path.join(self.test_folder_path, 'header.xml')
+        
+        with open(test_directive_path, 'w') as test_file:
+            test_file.write('<?xml version="1.0" encoding="UTF-8"?>\n<!-- <directive name="comment"> -->\n<directive xmlns="descatter/filer/schema/1.0" name="header"><unclosed></directive>')
+        
+        self.assertEqual(organize.read_directive_name(test_directive_path), 'header')
+    
+    def test_read_name_malformed(self):
+        test_directive_path = os.path.join(self.test_folder_path, 'malformed.xml')
+        
+        with open(test_directive_path, 'w') as test_file:
+            test_file.write('not xml')
+        
+        self.assertRaises(organize.DirectiveError, organize.read_directive_name, test_directive_path)
\ No newline at end of file
@@ -17,6 +17,7 @@
 # along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import stat
 import unittest
 import tempfile
 import shutil
@@ -24,6 +25,8 @@ import shutil
 import organize
 import tests_constants
 
+from datetime import datetime
+
 class TestFileFile(unittest.TestCase):
     """Tests for the organize.Filer.file_file function."""
     
@@ -60,6 +63,15 @@ class TestFileFile(unittest.TestCase):
         
         self.assertEquals(output_value, expected_filed_path)
         self.assertTrue(os.path.exists(expected_filed_path))
+    
+    def test_malformed_directive(self):
+        test_source_file_path = os.path.join(self.test_source_folder_path, 'malformed.txt')
+        open(test_source_file_path, 'w').close()
+        test_filer = organize.Filer(organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestCompile_error.xml")))
+        
+        self.assertRaises(organize.DirectiveError, test_filer.file_file, test_source_file_path, self.test_destination_folder_path)
+        self.assertRaises(organize.DirectiveError, test_filer.file_list, [test_source_file_path], self.test_destination_folder_path)
+        self.assertEqual(os.listdir(self.test_destination_folder_path), [])
 
 class TestFileList(unittest.TestCase):
     """Tests for the organize.Filer.file_list function."""
@@ -205,4 +217,760 @@ class TestFileFolder(unittest.TestCase):
             expected_filed_paths.append(os.path.join(self.test_destination_folder_path, os.path.basename(file_path)))
         
         for index in range(len(output_value)):
-            self.assertTrue(os.path.exists(expected_filed_paths[index]))
\ No newline at end of file
+            self.assertTrue(os.path.exists(expected_filed_paths[index]))
+    
+    def test_malformed_directive(self):
+        test_filer = organize.Filer(organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestCompile_error.xml")))
+        
+        self.assertRaises(organize.DirectiveError, test_filer.file_folder, self.test_source_folder_path, self.test_destination_folder_path)
+        self.assertEqual(os.listdir(self.test_destination_folder_path), [])
+
+class TestCreateContext(unittest.TestCase):
+    """Tests for the organize.Filer._create_context function."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestCreateContext_src_", dir=None)
+        directive_path_TestFileFile = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestFileFile))
+        
+        test_file_handle, self.test_source_file_path = tempfile.mkstemp(suffix='.TXT', prefix='descatter_TestCreateContext_', dir=self.test_source_folder_path, text=False)
+        test_file = os.fdopen(test_file_handle, 'w')
+        test_file.write('content')
+        test_file.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+    
+    def test_stat(self):
+        context = self.test_filer._create_context(self.test_source_file_path, 2, 3)
+        
+        self.assertEqual(context[organize.Filer.FILE_SIZE], 7)
+        self.assertEqual(context[organize.Filer.FILE_EXTENSION], 'txt')
+        self.assertEqual(context[organize.Filer.FILE_INDEX], 2)
+        self.assertEqual(context[organize.Filer.FILE_COUNT], 3)
+    
+    def test_cached_stat(self):
+        file_stat = list(os.stat(self.test_source_file_path))
+        file_stat[stat.ST_SIZE] = 1024
+        file_stat[stat.ST_MTIME] = 0
+        file_stat = os.stat_result(file_stat)
+        
+        context = self.test_filer._create_context(self.test_source_file_path, file_stat=file_stat)
+        
+        self.assertEqual(context[organize.Filer.FILE_SIZE], 1024)
+        self.assertEqual(context[organize.Filer.FILE_DATE_MODIFIED], datetime.fromtimestamp(0))
+    
+    def test_not_file(self):
+        
+        self.assertRaises(organize.FilerError, self.test_filer._create_context, self.test_source_folder_path)
+    
+    def test_lazy(self):
+        missing_file_path = os.path.join(self.test_source_folder_path, 'missing file.doc')
+        context = organize.FilerContext(missing_file_path)
+        
+        self.assertEqual(context[organize.Filer.FILE_NAME], 'missing file')
+        self.assertEqual(context[organize.Filer.FILE_EXTENSION], 'doc')
+        self.assertRaises(OSError, context.__getitem__, organize.Filer.FILE_SIZE)
+        self.assertRaises(KeyError, context.__getitem__, 'unknown')
+    
+    def test_dir_entry(self):
+        folder_entry = list(os.scandir(self.test_source_folder_path))[0]
+        context = self.test_filer._create_context(folder_entry.path, file_stat=folder_entry)
+        
+        self.assertEqual(context[organize.Filer.FILE_SIZE], 7)
+        self.assertIn(organize.Filer.CURRENT_DATETIME, context)
+class TestFileConcurrently(unittest.TestCase):
+    """Tests for filing with a pool of workers."""
+    
+    class Listener(object):
+        
+        def __init__(self):
+            self.events = []
+        
+        def file_started(self, *args):
+            self.events.append(('started', args[0][0]))
+        
+        def file_completed(self, *args):
+            self.events.append(('completed', args[0][0]))
+        
+        def file_failed(self, *args):
+            self.events.append(('failed', args[0][0]))
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestFileConcurrently_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestFileConcurrently_dst_', dir=None)
+        directive_path_TestFileFolder = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFolder.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestFileFolder), workers=4)
+        self.listener = self.Listener()
+        self.test_filer.subscribe(self.listener)
+        
+        self.test_source_file_paths = []
+        
+        for index in range(50):
+            test_source_file_path = os.path.join(self.test_source_folder_path, 'descatter_TestFileConcurrently_' + str(index) + '.txt')
+            
+            with open(test_source_file_path, 'w') as test_file:
+                test_file.write(str(index))
+            
+            self.test_source_file_paths.append(test_source_file_path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def test_order(self):
+        output_value = self.test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path)
+        
+        expected_filed_paths = []
+        expected_events = []
+        for file_path in self.test_source_file_paths:
+            expected_filed_paths.append(os.path.join(self.test_destination_folder_path, os.path.basename(file_path)))
+            expected_events.append(('started', file_path))
+            expected_events.append(('completed', file_path))
+        
+        self.assertEqual(output_value, expected_filed_paths)
+        self.assertEqual(self.listener.events, expected_events)
+        
+        for index in range(len(expected_filed_paths)):
+            with open(expected_filed_paths[index]) as filed_file:
+                self.assertEqual(filed_file.read(), str(index))
+    
+    def test_failed(self):
+        failed_source_path = self.test_source_file_paths[10]
+        transfer = self.test_filer._transfer
+        
+        def failing_transfer(source_path, destination_file_path, move):
+            if source_path == failed_source_path:
+                raise OSError("Failed")
+            
+            return transfer(source_path, destination_file_path, move)
+        
+        self.test_filer._transfer = failing_transfer
+        output_value = self.test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path)
+        
+        self.assertEqual(len(output_value), 50)
+        self.assertIsNone(output_value[10])
+        self.assertEqual(self.listener.events[20:22], [('started', failed_source_path), ('failed', failed_source_path)])
+    
+    def test_workers_invalid(self):
+        
+        self.assertRaises(organize.FilerError, organize.Filer, self.test_filer.directive, 0)
+
+class TestIterFileFolder(unittest.TestCase):
+    """Tests for the organize.Filer.iter_file_folder function."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestIterFileFolder_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestIterFileFolder_dst_', dir=None)
+        directive_path_TestIterFileFolder = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestIterFileFolder.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestIterFileFolder))
+        
+        for folder_path in (self.test_source_folder_path, os.path.join(self.test_source_folder_path, 'subFolder')):
+            if not os.path.isdir(folder_path):
+                os.mkdir(folder_path)
+            
+            for index in range(3):
+                prefix = 'descatter_TestIterFileFolder_' + str(index) + '_'
+                test_file_handle, test_source_file_path = tempfile.mkstemp(suffix='.txt', prefix=prefix, dir=folder_path, text=True)  # @UnusedVariable
+                os.close(test_file_handle)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def test_lazy(self):
+        filed_paths = self.test_filer.iter_file_folder(self.test_source_folder_path, self.test_destination_folder_path, True)
+        
+        self.assertEqual(os.listdir(self.test_destination_folder_path), [])
+        self.assertIsNotNone(next(filed_paths))
+        self.assertEqual(len(list(filed_paths)), 5)
+    
+    def test_count(self):
+        output_value = list(self.test_filer.iter_file_folder(self.test_source_folder_path, self.test_destination_folder_path))
+        
+        self.assertEqual(len(output_value), 3)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_destination_folder_path, 'counted'))), 3)
+    
+    def test_count_recursive(self):
+        output_value = list(self.test_filer.iter_file_folder(self.test_source_folder_path, self.test_destination_folder_path, True))
+        
+        self.assertEqual(len(output_value), 6)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_destination_folder_path, 'uncounted'))), 6)
+    
+    def test_not_folder(self):
+        
+        self.assertRaises(organize.FilerError, self.test_filer.iter_file_folder, os.path.join(self.test_source_folder_path, 'missing'), self.test_destination_folder_path)
+    
+    def test_malformed_directive(self):
+        test_filer = organize.Filer(organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestCompile_error.xml")))
+        
+        self.assertRaises(organize.DirectiveError, test_filer.iter_file_folder, self.test_source_folder_path, self.test_destination_folder_path)
+        self.assertRaises(organize.DirectiveError, test_filer.iter_file_list, [], self.test_destination_folder_path)
+
+class TestPlan(unittest.TestCase):
+    """Tests for the organize.Filer.plan function."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestPlan_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestPlan_dst_', dir=None)
+        directive_path_TestPlan = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestPlan.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestPlan))
+        self.test_source_file_paths = []
+        
+        for file_name in ('a.txt', 'b.md', 'c.txt'):
+            test_source_file_path = os.path.join(self.test_source_folder_path, file_name)
+            open(test_source_file_path, 'w').close()
+            self.test_source_file_paths.append(test_source_file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def test_list(self):
+        output_value = list(self.test_filer.plan(','.join(self.test_source_file_paths), self.test_destination_folder_path))
+        
+        expected_value = [(self.test_source_file_paths[0], os.path.join(self.test_destination_folder_path, 'Text', '?', 'a.txt'), 'text-rule'),
+                          (self.test_source_file_paths[1], None, None),
+                          (self.test_source_file_paths[2], os.path.join(self.test_destination_folder_path, 'Text', '?', 'c.txt'), 'text-rule')]
+        self.assertEqual(output_value, expected_value)
+    
+    def test_folder(self):
+        output_value = sorted(self.test_filer.plan(self.test_source_folder_path, self.test_destination_folder_path), key=lambda planned: planned[0])
+        
+        self.assertEqual([planned[0] for planned in output_value], self.test_source_file_paths)
+        self.assertEqual([planned[2] for planned in output_value], ['text-rule', None, 'text-rule'])
+    
+    def test_error_resumed(self):
+        
+        class UnreadableContext(dict):
+            def __getitem__(self, name):
+                if name != organize.Filer.FILE_SOURCE_PATH:
+                    raise OSError("The source could not be read")
+                
+                return dict.__getitem__(self, name)
+        
+        class UnreadableFiler(organize.Filer):
+            def _create_context(self, source, index=1, count=1, file_stat=None):
+                if source.endswith('a.txt'):
+                    return UnreadableContext({organize.Filer.FILE_SOURCE_PATH: source})
+                
+                return organize.Filer._create_context(self, source, index, count, file_stat)
+        
+        test_filer = UnreadableFiler(self.test_filer.directive)
+        output_value = list(test_filer.plan(','.join(self.test_source_file_paths), self.test_destination_folder_path))
+        
+        expected_value = [(self.test_source_file_paths[0], None, None),
+                          (self.test_source_file_paths[1], None, None),
+                          (self.test_source_file_paths[2], os.path.join(self.test_destination_folder_path, 'Text', '?', 'c.txt'), 'text-rule')]
+        self.assertEqual(output_value, expected_value)
+    
+    def test_no_io(self):
+        list(self.test_filer.plan(self.test_source_folder_path, self.test_destination_folder_path))
+        
+        self.assertEqual(os.listdir(self.test_destination_folder_path), [])
+        self.assertEqual(sorted(os.listdir(self.test_source_folder_path)), ['a.txt', 'b.md', 'c.txt'])
+
+class TestFolderCache(unittest.TestCase):
+    """Tests for the destination folder cache of the organize.Filer class."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestFolderCache_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestFolderCache_dst_', dir=None)
+        directive_path_TestFolderCache = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFolderCache.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestFolderCache))
+        self.test_source_file_paths = []
+        
+        for index in range(3):
+            test_source_file_path = os.path.join(self.test_source_folder_path, 'file' + str(index) + '.txt')
+            open(test_source_file_path, 'w').close()
+            self.test_source_file_paths.append(test_source_file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def test_reused(self):
+        self.test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path)
+        
+        expected_value = {organize.Filer.FILED_STATISTIC: 3,
+                          organize.Filer.FOLDER_CACHE_MISSES_STATISTIC: 1,
+                          organize.Filer.FOLDER_CACHE_HITS_STATISTIC: 2}
+        self.assertEqual(self.test_filer.get_statistics(), expected_value)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_destination_folder_path, 'Shared', 'Nested'))), 3)
+    
+    def test_per_filing(self):
+        self.test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path)
+        shutil.rmtree(os.path.join(self.test_destination_folder_path, 'Shared'))
+        self.test_filer.file_file(self.test_source_file_paths[0], self.test_destination_folder_path)
+        
+        expected_value = {organize.Filer.FILED_STATISTIC: 1,
+                          organize.Filer.FOLDER_CACHE_MISSES_STATISTIC: 1}
+        self.assertEqual(self.test_filer.get_statistics(), expected_value)
+    
+    def test_invalidated(self):
+        transfer = self.test_filer._transfer
+        
+        def remove_and_fail(source_path, destination_file_path, move, same_device=False):
+            self.test_filer._transfer = transfer
+            shutil.rmtree(os.path.join(self.test_destination_folder_path, 'Shared'))
+            raise OSError("Failed")
+        
+        self.test_filer._transfer = remove_and_fail
+        output_value = self.test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path)
+        
+        self.assertIsNone(output_value[0])
+        self.assertIsNotNone(output_value[1])
+        self.assertIsNotNone(output_value[2])
+        expected_value = {organize.Filer.FILED_STATISTIC: 2,
+                          organize.Filer.FAILED_STATISTIC: 1,
+                          organize.Filer.FOLDER_CACHE_MISSES_STATISTIC: 2,
+                          organize.Filer.FOLDER_CACHE_HITS_STATISTIC: 1}
+        self.assertEqual(self.test_filer.get_statistics(), expected_value)
+
+class TestDedup(unittest.TestCase):
+    """Tests for filing with the deduplication index of the organize.Filer class."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestDedup_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestDedup_dst_', dir=None)
+        self.directive_path_TestDedup = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestDedup.xml")
+        
+        for file_name, content in (('a.txt', b'same'), ('b.txt', b'same'), ('c.txt', b'other')):
+            with open(os.path.join(self.test_source_folder_path, file_name), 'wb') as test_file:
+                test_file.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def create_filer(self, dedup, workers=1):
+        
+        return organize.Filer(organize.Directive(self.directive_path_TestDedup), workers, dedup=dedup)
+    
+    def get_source(self, *file_names):
+        
+        return [os.path.join(self.test_source_folder_path, file_name) for file_name in file_names]
+    
+    def test_skip(self):
+        test_filer = self.create_filer(organize.Filer.DEDUP_SKIP)
+        output_value = test_filer.file_list(self.get_source('a.txt', 'b.txt', 'c.txt'), self.test_destination_folder_path)
+        
+        self.assertEqual(output_value[1], output_value[0])
+        self.assertNotEqual(output_value[2], output_value[0])
+        self.assertEqual(len(os.listdir(self.test_destination_folder_path)), 3)
+        self.assertEqual(test_filer.get_statistics()[organize.Filer.DUPLICATES_STATISTIC], 1)
+    
+    def test_skip_move(self):
+        test_filer = self.create_filer(organize.Filer.DEDUP_SKIP)
+        test_filer.file_list(self.get_source('a.txt', 'b.txt'), self.test_destination_folder_path, True)
+        
+        self.assertEqual(os.listdir(self.test_source_folder_path), ['c.txt'])
+    
+    def test_link(self):
+        test_filer = self.create_filer(organize.Filer.DEDUP_LINK)
+        output_value = test_filer.file_list(self.get_source('a.txt', 'b.txt'), self.test_destination_folder_path)
+        
+        self.assertNotEqual(output_value[1], output_value[0])
+        self.assertTrue(os.path.samefile(output_value[1], output_value[0]))
+        self.assertEqual(os.path.basename(output_value[1]), 'b.txt')
+    
+    def test_persistent(self):
+        self.create_filer(organize.Filer.DEDUP_SKIP).file_file(self.get_source('a.txt')[0], self.test_destination_folder_path)
+        test_filer = self.create_filer(organize.Filer.DEDUP_SKIP)
+        test_filer.file_list(self.get_source('b.txt'), self.test_destination_folder_path)
+        
+        self.assertEqual(test_filer.get_statistics()[organize.Filer.DUPLICATES_STATISTIC], 1)
+    
+    def test_modified(self):
+        test_filer = self.create_filer(organize.Filer.DEDUP_SKIP)
+        filed_path = test_filer.file_file(self.get_source('a.txt')[0], self.test_destination_folder_path)
+        
+        with open(filed_path, 'wb') as test_file:
+            test_file.write(b'diff')
+        
+        output_value = test_filer.file_list(self.get_source('b.txt'), self.test_destination_folder_path)
+        
+        self.assertNotEqual(output_value[0], filed_path)
+        self.assertNotIn(organize.Filer.DUPLICATES_STATISTIC, test_filer.get_statistics())
+    
+    def test_staged(self):
+        size = 4 * organize.DedupIndex.PARTIAL_SIZE
+        
+        for file_name, middle in (('large_a.bin', b'a'), ('large_b.bin', b'b')):
+            with open(os.path.join(self.test_source_folder_path, file_name), 'wb') as test_file:
+                test_file.write(b'0' * (size // 2) + middle + b'0' * (size // 2))
+        
+        test_filer = self.create_filer(organize.Filer.DEDUP_SKIP)
+        output_value = test_filer.file_list(self.get_source('large_a.bin', 'large_b.bin', 'large_a.bin'), self.test_destination_folder_path)
+        
+        self.assertNotEqual(output_value[1], output_value[0])
+        self.assertEqual(output_value[2], output_value[0])
+    
+    def test_concurrent(self):
+        
+        for index in range(8):
+            with open(os.path.join(self.test_source_folder_path, 'copy' + str(index) + '.txt'), 'wb') as test_file:
+                test_file.write(b'same')
+        
+        test_filer = self.create_filer(organize.Filer.DEDUP_SKIP, 4)
+        output_value = test_filer.file_list(self.get_source(*['copy' + str(index) + '.txt' for index in range(8)]), self.test_destination_folder_path)
+        
+        self.assertEqual(set(output_value), {output_value[0]})
+        self.assertEqual(len(os.listdir(self.test_destination_folder_path)), 2)
+        self.assertEqual(test_filer.get_statistics()[organize.Filer.DUPLICATES_STATISTIC], 7)
+    
+    def test_dedup_invalid(self):
+        
+        self.assertRaises(organize.FilerError, self.create_filer, 'unknown')
+
+class TestIncremental(unittest.TestCase):
+    """Tests for incremental filing with the journal of the organize.Filer class."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestIncremental_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestIncremental_dst_', dir=None)
+        directive_path_TestIncremental = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFolder.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestIncremental), incremental=True)
+        
+        for file_name in ('a.txt', 'b.txt', 'c.txt'):
+            with open(os.path.join(self.test_source_folder_path, file_name), 'w') as test_file:
+                test_file.write(file_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def test_unchanged(self):
+        first_value = self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        second_value = self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        
+        self.assertEqual(len(first_value), 3)
+        self.assertEqual(second_value, [])
+        self.assertEqual(self.test_filer.get_statistics(), {organize.Filer.UNCHANGED_STATISTIC: 3})
+    
+    def test_changed(self):
+        self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        test_source_file_path = os.path.join(self.test_source_folder_path, 'b.txt')
+        
+        with open(test_source_file_path, 'a') as test_file:
+            test_file.write('changed')
+        
+        output_value = self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        
+        self.assertEqual(output_value, [os.path.join(self.test_destination_folder_path, 'b.txt')])
+        
+        with open(output_value[0]) as test_file:
+            self.assertEqual(test_file.read(), 'b.txtchanged')
+    
+    def test_concurrently(self):
+        self.test_filer.workers = 2
+        self.test_filer.file_list([os.path.join(self.test_source_folder_path, 'a.txt')], self.test_destination_folder_path)
+        output_value = self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        
+        self.assertEqual(sorted(os.path.basename(filed_path) for filed_path in output_value), ['b.txt', 'c.txt'])
+    
+    def test_not_incremental(self):
+        self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        self.test_filer.incremental = False
+        output_value = self.test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        
+        self.assertEqual(len(output_value), 3)
+class TestCopyStrategy(unittest.TestCase):
+    """Tests for the copy strategies of the organize.Filer class."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestCopyStrategy_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestCopyStrategy_dst_', dir=None)
+        self.test_directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml"))
+        self.test_source_file_path = os.path.join(self.test_source_folder_path, 'strategy.txt')
+        self.expected_filed_path = os.path.join(self.test_destination_folder_path, 'strategy.txt')
+        
+        with open(self.test_source_file_path, 'w') as test_file:
+            test_file.write('strategy')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def _assert_copied(self, output_value):
+        self.assertEqual(output_value, self.expected_filed_path)
+        self.assertTrue(os.path.exists(self.test_source_file_path))
+        self.assertEqual(os.stat(output_value).st_mtime, os.stat(self.test_source_file_path).st_mtime)
+        
+        with open(output_value) as test_file:
+            self.assertEqual(test_file.read(), 'strategy')
+    
+    def test_link(self):
+        test_filer = organize.Filer(self.test_directive, strategy=organize.Filer.STRATEGY_LINK)
+        output_value = test_filer.file_file(self.test_source_file_path, self.test_destination_folder_path)
+        
+        self._assert_copied(output_value)
+        self.assertTrue(os.path.samefile(output_value, self.test_source_file_path))
+    
+    def test_link_existing(self):
+        with open(self.expected_filed_path, 'w') as test_file:
+            test_file.write('existing')
+        
+        test_filer = organize.Filer(self.test_directive, strategy=organize.Filer.STRATEGY_LINK)
+        output_value = test_filer.file_file(self.test_source_file_path, self.test_destination_folder_path)
+        
+        self._assert_copied(output_value)
+    
+    def test_reflink(self):
+        # A file system that cannot clone falls back to a kernel copy or 'shutil.copy2'.
+        test_filer = organize.Filer(self.test_directive, strategy=organize.Filer.STRATEGY_REFLINK)
+        output_value = test_filer.file_file(self.test_source_file_path, self.test_destination_folder_path)
+        
+        self._assert_copied(output_value)
+        self.assertFalse(os.path.samefile(output_value, self.test_source_file_path))
+    
+    def test_kernel(self):
+        test_filer = organize.Filer(self.test_directive, strategy=organize.Filer.STRATEGY_KERNEL)
+        output_value = test_filer.file_file(self.test_source_file_path, self.test_destination_folder_path)
+        
+        self._assert_copied(output_value)
+        self.assertFalse(os.path.samefile(output_value, self.test_source_file_path))
+    
+    def test_move(self):
+        test_filer = organize.Filer(self.test_directive, strategy=organize.Filer.STRATEGY_KERNEL)
+        output_value = test_filer.file_file(self.test_source_file_path, self.test_destination_folder_path, True)
+        
+        self.assertEqual(output_value, self.expected_filed_path)
+        self.assertFalse(os.path.exists(self.test_source_file_path))
+    
+    def test_unknown(self):
+        self.assertRaises(organize.FilerError, organize.Filer, self.test_directive, strategy='unknown')
+OTHER_DEVICE_FOLDER_PATH = '/dev/shm'
+
+def is_other_device(folder_path):
+    try:
+        return os.stat(folder_path).st_dev != os.stat(tempfile.gettempdir()).st_dev and os.access(folder_path, os.W_OK)
+    except OSError:
+        return False
+
+class TestMove(unittest.TestCase):
+    """Tests for moving files with the organize.Filer class."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestMove_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestMove_dst_', dir=None)
+        self.test_filer = organize.Filer(organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml")))
+        self.test_source_file_paths = []
+        
+        for file_name in ('a.txt', 'b.txt', 'c.txt'):
+            test_source_file_path = os.path.join(self.test_source_folder_path, file_name)
+            self.test_source_file_paths.append(test_source_file_path)
+            
+            with open(test_source_file_path, 'w') as test_file:
+                test_file.write(file_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def test_same_device(self):
+        test_inodes = [os.stat(test_source_file_path).st_ino for test_source_file_path in self.test_source_file_paths]
+        output_value = self.test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path, True)
+        
+        self.assertEqual([os.stat(filed_path).st_ino for filed_path in output_value], test_inodes)
+        self.assertEqual(os.listdir(self.test_source_folder_path), [])
+    
+    @unittest.skipUnless(is_other_device(OTHER_DEVICE_FOLDER_PATH), "Requires a writable folder on another device")
+    def test_other_device(self):
+        test_other_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestMove_other_', dir=OTHER_DEVICE_FOLDER_PATH)
+        
+        try:
+            output_value = self.test_filer.file_list(self.test_source_file_paths, test_other_folder_path, True)
+            
+            self.assertEqual(sorted(os.listdir(test_other_folder_path)), ['a.txt', 'b.txt', 'c.txt'])
+            self.assertEqual(os.listdir(self.test_source_folder_path), [])
+            
+            with open(output_value[1]) as test_file:
+                self.assertEqual(test_file.read(), 'b.txt')
+        finally:
+            shutil.rmtree(test_other_folder_path)
+    
+    @unittest.skipUnless(is_other_device(OTHER_DEVICE_FOLDER_PATH), "Requires a writable folder on another device")
+    def test_other_device_synced_in_groups(self):
+        test_other_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestMove_other_', dir=OTHER_DEVICE_FOLDER_PATH)
+        self.test_filer.MOVE_SYNC_SIZE = 2
+        
+        try:
+            filed_paths = self.test_filer.iter_file_list(self.test_source_file_paths, test_other_folder_path, True)
+            next(filed_paths)
+            
+            self.assertTrue(os.path.exists(self.test_source_file_paths[0]))
+            
+            next(filed_paths)
+            
+            self.assertFalse(os.path.exists(self.test_source_file_paths[0]))
+            self.assertFalse(os.path.exists(self.test_source_file_paths[1]))
+            
+            next(filed_paths)
+            
+            self.assertTrue(os.path.exists(self.test_source_file_paths[2]))
+            self.assertRaises(StopIteration, next, filed_paths)
+            self.assertFalse(os.path.exists(self.test_source_file_paths[2]))
+        finally:
+            shutil.rmtree(test_other_folder_path)
+class TestRandomNames(unittest.TestCase):
+    """Tests for the organize.RandomNames class and filing to random names."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestRandomNames_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestRandomNames_dst_', dir=None)
+        self.test_directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestRandomNames.xml"))
+        self.test_source_file_paths = []
+        
+        for file_name in ('a.txt', 'b.txt', 'c.txt'):
+            test_source_file_path = os.path.join(self.test_source_folder_path, file_name)
+            self.test_source_file_paths.append(test_source_file_path)
+            
+            with open(test_source_file_path, 'w') as test_file:
+                test_file.write(file_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def create_names(self, *ids):
+        test_names = organize.RandomNames()
+        test_ids = iter(ids)
+        test_names.get_id = lambda: next(test_ids)
+        
+        return test_names
+    
+    def test_claim_file(self):
+        test_file_descriptor, output_value = organize.RandomNames().claim_file(self.test_destination_folder_path, 'file-', '.txt')
+        os.write(test_file_descriptor, b'claimed')
+        os.close(test_file_descriptor)
+        
+        file_name = os.path.basename(output_value)
+        
+        self.assertEqual(os.path.dirname(output_value), self.test_destination_folder_path)
+        self.assertTrue(file_name.startswith('file-') and file_name.endswith('.txt'))
+        self.assertEqual(len(file_name), len('file-.txt') + 8)
+        
+        with open(output_value, 'rb') as test_file:
+            self.assertEqual(test_file.read(), b'claimed')
+    
+    def test_claim_taken(self):
+        os.mkdir(os.path.join(self.test_destination_folder_path, 'taken'))
+        output_value = self.create_names('taken', 'free').claim_folder(self.test_destination_folder_path)
+        
+        self.assertEqual(output_value, os.path.join(self.test_destination_folder_path, 'free'))
+        self.assertTrue(os.path.isdir(output_value))
+    
+    def test_claim_exhausted(self):
+        open(os.path.join(self.test_destination_folder_path, 'taken'), 'w').close()
+        test_names = self.create_names(*(['taken'] * organize.RandomNames.ATTEMPTS))
+        
+        self.assertRaises(FileExistsError, test_names.claim_file, self.test_destination_folder_path)
+    
+    def test_unique(self):
+        test_names = organize.RandomNames()
+        
+        self.assertEqual(len(set(test_names.get_id() for index in range(1000))), 1000)  # @UnusedVariable
+    
+    def test_file_strategies(self):
+        for strategy in (organize.Filer.STRATEGY_COPY, organize.Filer.STRATEGY_KERNEL, organize.Filer.STRATEGY_REFLINK, organize.Filer.STRATEGY_LINK):
+            test_filer = organize.Filer(self.test_directive, strategy=strategy)
+            output_value = test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path)
+            
+            for test_source_file_path, filed_path in zip(self.test_source_file_paths, output_value):
+                self.assertTrue(os.path.basename(filed_path).startswith('file-'))
+                self.assertEqual(os.stat(filed_path).st_mode, os.stat(test_source_file_path).st_mode)
+                
+                with open(filed_path) as test_file:
+                    self.assertEqual(test_file.read(), os.path.basename(test_source_file_path))
+            
+            self.assertEqual(test_filer._claimed, {})
+    
+    def test_move(self):
+        test_filer = organize.Filer(self.test_directive)
+        output_value = test_filer.file_list(self.test_source_file_paths, self.test_destination_folder_path, True)
+        
+        self.assertEqual(len(set(output_value)), 3)
+        self.assertEqual(os.listdir(self.test_source_folder_path), [])
+        self.assertEqual(test_filer._claimed, {})
+class TestFilingTimings(unittest.TestCase):
+    """Tests for the organize.FilingTimings class and the timings of the organize.Filer class."""
+    
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestFilingTimings_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestFilingTimings_dst_', dir=None)
+        self.test_directive = organize.Directive(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml"))
+        self.test_file_count = 5
+        
+        for index in range(self.test_file_count):
+            with open(os.path.join(self.test_source_folder_path, 'timed{}.txt'.format(index)), 'w') as test_file:
+                test_file.write('x' * index)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+    
+    def _assert_stages(self, test_timings):
+        for stage in (organize.FilingTimings.WALK_STAGE, 
+                      organize.FilingTimings.CONTEXT_STAGE, 
+                      organize.FilingTimings.EVALUATE_STAGE, 
+                      organize.FilingTimings.FOLDERS_STAGE, 
+                      organize.FilingTimings.TRANSFER_STAGE):
+            self.assertEqual(test_timings.get_count(stage), self.test_file_count)
+            self.assertGreater(test_timings.get_total(stage), 0)
+        
+        self.assertEqual(test_timings.get_count(organize.FilingTimings.SYNC_STAGE), 0)
+        self.assertEqual(test_timings.files, self.test_file_count)
+        self.assertEqual(test_timings.bytes, sum(range(self.test_file_count)))
+        self.assertGreater(test_timings.get_files_per_second(), 0)
+    
+    def test_file_folder(self):
+        test_filer = organize.Filer(self.test_directive)
+        test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        
+        self._assert_stages(test_filer.get_timings())
+    
+    def test_iter_file_folder_concurrently(self):
+        test_filer = organize.Filer(self.test_directive, workers=3)
+        list(test_filer.iter_file_folder(self.test_source_folder_path, self.test_destination_folder_path, move=True))
+        
+        self._assert_stages(test_filer.get_timings())
+        self.assertEqual(os.listdir(self.test_source_folder_path), [])
+    
+    def test_reset(self):
+        test_filer = organize.Filer(self.test_directive)
+        test_filer.file_folder(self.test_source_folder_path, self.test_destination_folder_path)
+        test_filer.file_file(os.path.join(self.test_source_folder_path, 'timed1.txt'), self.test_destination_folder_path)
+        test_timings = test_filer.get_timings()
+        
+        self.assertEqual(test_timings.files, 1)
+        self.assertEqual(test_timings.get_count(organize.FilingTimings.WALK_STAGE), 0)
+        self.assertEqual(test_timings.get_count(organize.FilingTimings.TRANSFER_STAGE), 1)
+    
+    def test_percentile(self):
+        test_timings = organize.FilingTimings()
+        
+        for nanoseconds in range(1000, 101000, 1000):
+            test_timings.record(organize.FilingTimings.EVALUATE_STAGE, nanoseconds)
+        
+        self.assertEqual(test_timings.get_count(organize.FilingTimings.EVALUATE_STAGE), 100)
+        self.assertAlmostEqual(test_timings.get_total(organize.FilingTimings.EVALUATE_STAGE), 0.00505)
+        self.assertAlmostEqual(test_timings.get_percentile(organize.FilingTimings.EVALUATE_STAGE, 50), 50e-6, delta=50e-6 * 0.125)
+        self.assertAlmostEqual(test_timings.get_percentile(organize.FilingTimings.EVALUATE_STAGE, 99), 99e-6, delta=99e-6 * 0.125)
+        self.assertLessEqual(test_timings.get_percentile(organize.FilingTimings.EVALUATE_STAGE, 100), 100e-6)
+        self.assertEqual(test_timings.get_maximum(organize.FilingTimings.EVALUATE_STAGE), 100e-6)
+        self.assertIsNone(test_timings.get_percentile(organize.FilingTimings.WALK_STAGE, 50))
+    
+    def test_to_dict(self):
+        test_timings = organize.FilingTimings()
+        test_timings.record(organize.FilingTimings.TRANSFER_STAGE, 2000)
+        test_timings.add_file(10)
+        test_timings.finish()
+        output_value = test_timings.to_dict()
+        
+        self.assertEqual(list(output_value['stages']), [organize.FilingTimings.TRANSFER_STAGE])
+        self.assertEqual(output_value['stages'][organize.FilingTimings.TRANSFER_STAGE]['count'], 1)
+        self.assertEqual(sum(bucket_count for upper, bucket_count in output_value['stages'][organize.FilingTimings.TRANSFER_STAGE]['histogram']), 1)  # @UnusedVariable
+        self.assertEqual(output_value['files'], 1)
+        self.assertEqual(output_value['bytes'], 10)
+        self.assertEqual(output_value['elapsed'], test_timings.get_elapsed())
\ No newline at end of file
@@ -0,0 +1,49 @@
+# tests/test_imports.py
+# Copyright (C) 2013 the Descatter authors and contributers <see AUTHORS file>
+#
+# This module is part of Descatter.
+#
+# Descatter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Descatter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+import unittest
+
+import tests_constants
+
+class TestDeferredImports(unittest.TestCase):
+    """Tests that the entry point modules do not import modules only needed on some code paths."""
+
+    # The modules that must only be imported on the code path that needs them
+    DEFERRED_MODULES = ('lxml', 'prettytable', 'sqlite3', 'concurrent.futures', 'descatter.watch')
+
+    def _get_imported(self, *statements):
+        root_folder_path = os.path.dirname(os.path.dirname(tests_constants.DATA_FOLDER_PATH))
+        code = '\n'.join(statements + ("import sys", "print(' '.join(name for name in {!r} if name in sys.modules))".format(self.DEFERRED_MODULES)))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root_folder_path, universal_newlines=True)
+
+        return output.split()
+
+    def test_application(self):
+        self.assertEqual(self._get_imported("from descatter import application"), [])
+
+    def test_directive_index(self):
+        self.assertEqual(self._get_imported("from descatter import organize",
+                                            "organize.DirectiveIndex(r'{}')".format(tests_constants.DATA_FOLDER_PATH)), [])
+
+    def test_directive_parsed(self):
+        self.assertEqual(self._get_imported("from descatter import organize",
+                                            "organize.Directive(r'{}')".format(os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml"))),
+                         ['lxml'])
\ No newline at end of file
@@ -0,0 +1,114 @@
+# tests/test_watch.py
+# Copyright (C) 2013 the Descatter authors and contributers <see AUTHORS file>
+#
+# This module is part of Descatter.
+#
+# Descatter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Descatter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Descatter.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import unittest
+import tempfile
+import shutil
+
+import organize
+import tests_constants
+import watch
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "Watching a folder requires Linux inotify")
+class TestWatcher(unittest.TestCase):
+    """Tests for the watch.Watcher class."""
+
+    # The longest seconds to wait for a file to be filed
+    TIMEOUT = 5.0
+
+    def setUp(self):
+        self.test_source_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestWatcher_src_", dir=None)
+        self.test_destination_folder_path = tempfile.mkdtemp(suffix='', prefix='descatter_TestWatcher_dst_', dir=None)
+        directive_path_TestFileFile = os.path.join(tests_constants.DATA_FOLDER_PATH, "test_directive_TestFileFile.xml")
+        self.test_filer = organize.Filer(organize.Directive(directive_path_TestFileFile))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_source_folder_path)
+        shutil.rmtree(self.test_destination_folder_path)
+
+    def _poll_until_filed(self, test_watcher):
+        filed_paths = []
+        end_time = time.monotonic() + self.TIMEOUT
+
+        while not filed_paths and time.monotonic() < end_time:
+            filed_paths = test_watcher.poll(0.1)
+
+        return filed_paths
+
+    def test_written(self):
+        test_watcher = watch.Watcher(self.test_filer, self.test_source_folder_path, self.test_destination_folder_path, debounce=0.05)
+
+        with open(os.path.join(self.test_source_folder_path, 'written.txt'), 'w') as test_file:
+            test_file.write('written')
+
+        filed_paths = self._poll_until_filed(test_watcher)
+        test_watcher.close()
+
+        self.assertEqual(filed_paths, [os.path.join(self.test_destination_folder_path, 'written.txt')])
+
+    def test_moved(self):
+        test_watcher = watch.Watcher(self.test_filer, self.test_source_folder_path, self.test_destination_folder_path, move=True, debounce=0.05)
+        test_staging_folder_path = tempfile.mkdtemp(suffix='', prefix="descatter_TestWatcher_tmp_", dir=self.test_source_folder_path)
+        test_staged_file_path = os.path.join(test_staging_folder_path, 'moved.txt')
+
+        with open(test_staged_file_path, 'w') as test_file:
+            test_file.write('moved')
+
+        test_source_file_path = os.path.join(self.test_source_folder_path, 'moved.txt')
+        os.rename(test_staged_file_path, test_source_file_path)
+
+        filed_paths = self._poll_until_filed(test_watcher)
+        test_watcher.close()
+
+        self.assertEqual(filed_paths, [os.path.join(self.test_destination_folder_path, 'moved.txt')])
+        self.assertFalse(os.path.exists(test_source_file_path))
+
+    def test_debounce(self):
+        test_watcher = watch.Watcher(self.test_filer, self.test_source_folder_path, self.test_destination_folder_path, debounce=60)
+
+        with open(os.path.join(self.test_source_folder_path, 'partial.txt'), 'w') as test_file:
+            test_file.write('partial')
+
+        filed_paths = test_watcher.poll(0.2)
+        test_watcher.close()
+
+        self.assertEqual(filed_paths, [])
+        self.assertEqual(os.listdir(self.test_destination_folder_path), [])
+
+    def test_recursive_new_folder(self):
+        test_watcher = watch.Watcher(self.test_filer, self.test_source_folder_path, self.test_destination_folder_path, recursive=True, debounce=0.05)
+        test_subfolder_path = os.path.join(self.test_source_folder_path, 'subfolder')
+        os.mkdir(test_subfolder_path)
+        test_watcher.poll(0.1)
+
+        with open(os.path.join(test_subfolder_path, 'nested.txt'), 'w') as test_file:
+            test_file.write('nested')
+
+        filed_paths = self._poll_until_filed(test_watcher)
+        test_watcher.close()
+
+        self.assertEqual(filed_paths, [os.path.join(self.test_destination_folder_path, 'nested.txt')])
+
+    def test_source_not_folder(self):
+        test_file_path = os.path.join(self.test_source_folder_path, 'file.txt')
+        open(test_file_path, 'w').close()
+
+        self.assertRaises(watch.WatchError, watch.Watcher, self.test_filer, test_file_path, self.test_destination_folder_path)
\ No newline at end of file